@@ -0,0 +1,114 @@
+import asyncio
+import logging
+from collections import namedtuple
+
+# Setup logging with rich handler
+log = logging.getLogger(__name__)
+
+# Default concurrency of the read and write stages, queue bound and write batch size
+DEFAULT_READERS = 8
+DEFAULT_WRITERS = 2
+DEFAULT_QUEUE_SIZE = 64
+DEFAULT_WRITE_BATCH = 32
+
+# Concurrency of each stage and bounds of the queues between them:
+# - readers: items read at the same time
+# - analyzers: items submitted to the analysis pool at the same time
+# - writers: batches written at the same time
+# - queue_size: items waiting between two stages; a full queue makes the stage before it wait
+# - write_batch: maximum number of results written per batch
+StageSettings = namedtuple(
+    "StageSettings",
+    ["readers", "analyzers", "writers", "queue_size", "write_batch"],
+    defaults=(DEFAULT_READERS, 4, DEFAULT_WRITERS, DEFAULT_QUEUE_SIZE, DEFAULT_WRITE_BATCH),
+)
+
+# Put in a queue after its last item
+DONE = object()
+
+
+async def feed(items, outbox, executor):
+    """
+    Move items from a blocking iterable, such as directory discovery, into the first queue.
+    Each next() call runs in executor so the event loop is never blocked by it.
+    """
+    loop = asyncio.get_running_loop()
+    iterator = iter(items)
+    while (item := await loop.run_in_executor(executor, next, iterator, DONE)) is not DONE:
+        await outbox.put(item)
+    await outbox.put(DONE)
+
+
+async def run_stage(inbox, outbox, handle, executor, concurrency):
+    """
+    Call handle on every item of inbox in executor, with at most concurrency calls at a time,
+    and put the results in outbox. Results are put in completion order.
+    """
+    loop = asyncio.get_running_loop()
+
+    async def worker():
+        while (item := await inbox.get()) is not DONE:
+            await outbox.put(await loop.run_in_executor(executor, handle, item))
+        await inbox.put(DONE)  # Let the other workers of the stage see the end too
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    await outbox.put(DONE)
+
+
+async def run_writer(inbox, write, on_written, executor, concurrency, batch_size):
+    """
+    Write the items of inbox in batches: each batch holds the items already waiting, up to
+    batch_size, so a busy stage writes many items per call and an idle one writes at once.
+    on_written is called in the event loop for each item once its batch is written.
+    """
+    loop = asyncio.get_running_loop()
+
+    async def worker():
+        done = False
+        while not done:
+            batch = [await inbox.get()]
+            while len(batch) < batch_size and not inbox.empty():
+                batch.append(inbox.get_nowait())
+            if batch[-1] is DONE:
+                batch.pop()
+                done = True
+                await inbox.put(DONE)
+            if batch:
+                await loop.run_in_executor(executor, write, batch)
+                for item in batch:
+                    on_written(item)
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+
+
+async def run_pipeline(items, read, analyze, write, on_written, io_executor, cpu_executor, settings=StageSettings()):
+    """
+    Run items through read, analyze and write stages connected by bounded queues.
+
+    Reading and writing run in io_executor and analysis in cpu_executor, so blocking I/O
+    never holds an analysis slot. Each queue holds at most settings.queue_size items, so
+    a slow stage makes the stages before it wait instead of buffering the whole corpus.
+    If a stage raises, the other stages are cancelled and the exception propagates.
+
+    Args:
+    - items (iterable): The items to process, pulled lazily.
+    - read (function): read(item) -> read item, blocking I/O.
+    - analyze (function): analyze(read item) -> result, CPU work; picklable for a process pool.
+    - write (function): write(list of results), blocking I/O.
+    - on_written (function): Called in the event loop with each result once it is written.
+    - io_executor (concurrent.futures.Executor): Thread pool of the feed, read and write stages.
+    - cpu_executor (concurrent.futures.Executor): Process or thread pool of the analysis stage.
+    - settings (StageSettings): Concurrency of each stage, queue bound and write batch size.
+    """
+    to_read, to_analyze, to_write = (asyncio.Queue(settings.queue_size) for _ in range(3))
+    async with asyncio.TaskGroup() as group:
+        group.create_task(feed(items, to_read, io_executor))
+        group.create_task(run_stage(to_read, to_analyze, read, io_executor, settings.readers))
+        group.create_task(run_stage(to_analyze, to_write, analyze, cpu_executor, settings.analyzers))
+        group.create_task(run_writer(to_write, write, on_written, io_executor, settings.writers, settings.write_batch))
+    log.info("Pipeline drained.")
+
+
+def io_threads(settings):
+    """Number of threads the feed, read and write stages can keep busy at once."""
+    return 1 + settings.readers + settings.writers
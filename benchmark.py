@@ -0,0 +1,284 @@
+import os
+import sys
+import json
+import time
+import shutil
+import logging
+import platform
+import tempfile
+import subprocess
+
+from file_loader import discover_sol_files, load_sol_file
+from remove_comments import remove_comments
+from detector_engine import detect_all
+from timestamp_dependence import detect_timestamp_dependence
+from reentrance_detection import detect_reentrancy_vulnerability
+from integer_overflow_underflow import detect_integer_overflow_underflow
+from delegatecall_detection import detect_delegatecall_vulnerability
+from synthetic_corpus import generate_corpus
+import labeler
+
+# Setup logging with rich handler
+log = logging.getLogger(__name__)
+
+# Directory of the stored benchmark results
+RESULTS_DIRECTORY = "benchmark_results"
+
+# A benchmark regresses when its files/sec drops by more than this fraction of the baseline
+DEFAULT_THRESHOLD = 0.10
+
+# In-memory stages measured on the cleaned corpus
+DETECTOR_BENCHMARKS = (
+    ("detect_timestamp_dependence", detect_timestamp_dependence),
+    ("detect_reentrancy_vulnerability", detect_reentrancy_vulnerability),
+    ("detect_integer_overflow_underflow", detect_integer_overflow_underflow),
+    ("detect_delegatecall_vulnerability", detect_delegatecall_vulnerability),
+    ("detect_all", detect_all),
+)
+
+PIPELINE_MODES = ("thread", "process")
+
+
+def best_time(function, repeat):
+    """Run function repeat times and return the shortest wall time in seconds."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def throughput(seconds, num_files, num_bytes):
+    """Express a timing as files/sec and MB/sec."""
+    return {
+        "seconds": seconds,
+        "files_per_s": num_files / seconds if seconds else 0.0,
+        "mb_per_s": num_bytes / 1e6 / seconds if seconds else 0.0,
+    }
+
+
+# Runs a command and prints its peak RSS. The command is started from this small process
+# because exec records the memory of the process it replaces in ru_maxrss, which would
+# otherwise report the benchmark's own in-memory corpus.
+RSS_WRAPPER = """
+import os, subprocess, sys
+process = subprocess.Popen(sys.argv[1:], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+_, status, usage = os.wait4(process.pid, 0)
+print(usage.ru_maxrss)
+sys.exit(os.waitstatus_to_exitcode(status))
+"""
+
+
+def run_measured(command, cwd):
+    """
+    Run a command to completion and return its peak resident set size.
+
+    Returns:
+    - (float): Peak RSS in megabytes of the command and the child processes it waited for.
+    """
+    output = subprocess.run([sys.executable, "-c", RSS_WRAPPER, *command], cwd=cwd, check=True,
+                            stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True).stdout
+    max_rss = int(output.split()[-1])
+    # ru_maxrss is in bytes on macOS and in KiB elsewhere
+    return max_rss / 1e6 if platform.system() == "Darwin" else max_rss * 1024 / 1e6
+
+
+def label_all(sol_files, load_mode):
+    """Label every file with label_file, starting from an empty deduplication table."""
+    labeler.labels_by_hash.clear()
+    options = labeler.LabelOptions(load_mode=load_mode)
+    return [labeler.label_file(path, options=options) for path in sol_files]
+
+
+def benchmark_stages(corpus_dir, repeat):
+    """
+    Measure remove_comments and each detector on the corpus held in memory, and the
+    load-and-label path of each load mode on the files on disk.
+
+    Returns:
+    - (dict): {benchmark_name: throughput}, with logging disabled so only the work itself is timed.
+    """
+    sol_files = discover_sol_files(corpus_dir)
+    contents = [content for content in map(load_sol_file, sol_files) if content is not None]
+    raw_bytes = sum(len(content.encode("utf-8")) for content in contents)
+
+    logging.disable(logging.CRITICAL)
+    try:
+        results = {}
+        seconds = best_time(lambda: [remove_comments(content) for content in contents], repeat)
+        results["remove_comments"] = throughput(seconds, len(contents), raw_bytes)
+
+        cleaned_contents = [remove_comments(content) for content in contents]
+        cleaned_bytes = sum(len(content.encode("utf-8")) for content in cleaned_contents)
+        for name, detector in DETECTOR_BENCHMARKS:
+            seconds = best_time(lambda: [detector(content) for content in cleaned_contents], repeat)
+            results[name] = throughput(seconds, len(cleaned_contents), cleaned_bytes)
+
+        file_bytes = sum(os.path.getsize(path) for path in sol_files)
+        for load_mode in labeler.LOAD_MODES:
+            seconds = best_time(lambda: label_all(sol_files, load_mode), repeat)
+            results[f"label_file_{load_mode}"] = throughput(seconds, len(sol_files), file_bytes)
+    finally:
+        logging.disable(logging.NOTSET)
+
+    return results
+
+
+def benchmark_pipeline(corpus_dir, modes, repeat, workers=None, load_modes=("text",)):
+    """
+    Measure the full main.py labeling run, in a scratch directory where datast points to the corpus.
+
+    Every run uses --force so the label manifest does not skip files.
+
+    Returns:
+    - (dict): {"pipeline_<mode>": throughput} for each executor mode, with "_mmap" appended
+      for the runs with --load mmap. Each throughput also holds the peak RSS of the run.
+    """
+    sol_files = discover_sol_files(corpus_dir)
+    num_bytes = sum(os.path.getsize(path) for path in sol_files)
+    main_script = os.path.join(os.path.dirname(os.path.abspath(__file__)), "main.py")
+
+    results = {}
+    with tempfile.TemporaryDirectory() as work_dir:
+        os.symlink(os.path.abspath(corpus_dir), os.path.join(work_dir, "datast"))
+        for mode in modes:
+            for load_mode in load_modes:
+                command = [sys.executable, main_script, "-q", "--force", "--executor", mode, "--load", load_mode]
+                if workers:
+                    command += ["--workers", str(workers)]
+                peak_rss = []
+
+                def run():
+                    shutil.rmtree(os.path.join(work_dir, "json_out"), ignore_errors=True)
+                    peak_rss.append(run_measured(command, work_dir))
+
+                name = f"pipeline_{mode}" if load_mode == "text" else f"pipeline_{mode}_{load_mode}"
+                results[name] = throughput(best_time(run, repeat), len(sol_files), num_bytes)
+                results[name]["peak_rss_mb"] = max(peak_rss)
+    return results
+
+
+def compare_results(results, baseline, threshold=DEFAULT_THRESHOLD):
+    """
+    Compare benchmark results against a baseline run.
+
+    Returns:
+    - (list): (name, baseline files/sec, current files/sec, relative change, regressed) tuples
+      for the benchmarks present in both runs.
+    """
+    comparison = []
+    for name, current in results["benchmarks"].items():
+        previous = baseline["benchmarks"].get(name)
+        if not previous or not previous["files_per_s"]:
+            continue
+        change = current["files_per_s"] / previous["files_per_s"] - 1
+        comparison.append((name, previous["files_per_s"], current["files_per_s"], change, change < -threshold))
+    return comparison
+
+
+def print_results(results, comparison=None):
+    """Print the benchmark results, and the comparison against the baseline if there is one."""
+    from rich.console import Console
+    from rich.table import Table
+
+    changes = {name: (change, regressed) for name, _, _, change, regressed in comparison or []}
+    table = Table(title=f"Benchmark ({results['corpus']['files']} files, {results['corpus']['bytes'] / 1e6:.1f} MB)")
+    table.add_column("Benchmark", no_wrap=True)
+    for column in ("Seconds", "Files/s", "MB/s", "Peak RSS MB", "vs baseline"):
+        table.add_column(column, justify="right")
+
+    for name, stats in results["benchmarks"].items():
+        change = ""
+        if name in changes:
+            value, regressed = changes[name]
+            change = f"[{'red' if regressed else 'green'}]{value:+.1%}[/]"
+        peak_rss = f"{stats['peak_rss_mb']:.1f}" if "peak_rss_mb" in stats else ""
+        table.add_row(name, f"{stats['seconds']:.3f}", f"{stats['files_per_s']:.1f}", f"{stats['mb_per_s']:.2f}",
+                      peak_rss, change)
+
+    Console().print(table)
+
+
+def run_benchmarks(corpus_dir=None, num_files=2000, seed=0, repeat=3, modes=PIPELINE_MODES, workers=None,
+                   skip_pipeline=False, load_modes=labeler.LOAD_MODES):
+    """
+    Run the benchmark suite on an existing corpus, or on a synthetic one generated with seed.
+
+    Returns:
+    - (dict): Environment, corpus description and {benchmark_name: throughput} results.
+    """
+    generated_dir = None
+    if corpus_dir is None:
+        generated_dir = tempfile.mkdtemp(prefix="synthetic_corpus_")
+        generate_corpus(generated_dir, num_files=num_files, seed=seed)
+        corpus_dir = generated_dir
+
+    try:
+        sol_files = discover_sol_files(corpus_dir)
+        num_bytes = sum(os.path.getsize(path) for path in sol_files)
+        benchmarks = benchmark_stages(corpus_dir, repeat)
+        if not skip_pipeline:
+            benchmarks.update(benchmark_pipeline(corpus_dir, modes, repeat, workers, load_modes))
+    finally:
+        if generated_dir:
+            shutil.rmtree(generated_dir, ignore_errors=True)
+
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+        },
+        "corpus": {
+            "source": "synthetic" if generated_dir else os.path.abspath(corpus_dir),
+            "seed": seed if generated_dir else None,
+            "files": len(sol_files),
+            "bytes": num_bytes,
+        },
+        "benchmarks": benchmarks,
+    }
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark comment removal, the detectors and the labeling pipeline.")
+    parser.add_argument("--corpus", default=None, help="Existing corpus directory (default: generate a synthetic corpus).")
+    parser.add_argument("--files", type=int, default=2000, help="Number of files of the synthetic corpus.")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the synthetic corpus.")
+    parser.add_argument("--repeat", type=int, default=3, help="Number of runs per benchmark; the fastest is kept.")
+    parser.add_argument("--modes", nargs="+", choices=PIPELINE_MODES, default=list(PIPELINE_MODES),
+                        help="Executor modes of the full pipeline benchmark.")
+    parser.add_argument("--load-modes", nargs="+", choices=labeler.LOAD_MODES, default=list(labeler.LOAD_MODES),
+                        help="Load modes of the full pipeline benchmark; peak RSS is reported for each run.")
+    parser.add_argument("--workers", type=int, default=None, help="Number of pipeline workers (default: CPU count).")
+    parser.add_argument("--skip-pipeline", action="store_true", help="Only run the in-memory stage benchmarks.")
+    parser.add_argument("--output", default=None,
+                        help=f"File to store the results in (default: {RESULTS_DIRECTORY}/<timestamp>.json).")
+    parser.add_argument("--baseline", default=None, help="Results file of an earlier run to compare against.")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="Maximum allowed drop in files/sec relative to the baseline (default: 0.10).")
+    args = parser.parse_args()
+
+    results = run_benchmarks(args.corpus, args.files, args.seed, args.repeat, args.modes, args.workers, args.skip_pipeline,
+                             args.load_modes)
+
+    output = args.output or os.path.join(RESULTS_DIRECTORY, f"{results['timestamp'].replace(':', '')}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(results, f, indent=4)
+
+    comparison = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            comparison = compare_results(results, json.load(f), args.threshold)
+
+    print_results(results, comparison)
+    print(f"Results saved to {output}")
+
+    regressions = [name for name, _, _, _, regressed in comparison or [] if regressed]
+    if regressions:
+        print(f"Regressions beyond {args.threshold:.0%}: {', '.join(regressions)}")
+        sys.exit(1)
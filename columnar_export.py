@@ -0,0 +1,113 @@
+import os
+import logging
+
+from labeler import LABEL_KEYS
+
+# Setup logging with rich handler
+log = logging.getLogger(__name__)
+
+# Default directory of the exported shards and number of contracts per shard
+SHARD_DIRECTORY = "shards_out"
+DEFAULT_ROWS_PER_SHARD = 10_000
+
+# File extension of each supported shard format
+SHARD_EXTENSIONS = {"parquet": ".parquet", "arrow": ".arrow"}
+
+
+def shard_schema():
+    """Return the Arrow schema of an exported shard: path, content hash, cleaned source and the four labels."""
+    import pyarrow as pa
+
+    return pa.schema(
+        [
+            ("path", pa.string()),
+            ("content_hash", pa.string()),
+            # Flattened contracts can be large, so use 64-bit offsets for the source column
+            ("source", pa.large_string()),
+        ]
+        + [(key, pa.bool_()) for key in LABEL_KEYS]
+    )
+
+
+class ShardWriter:
+    """
+    Buffer labeled contracts and write them as sharded Parquet or Arrow IPC files.
+
+    Shards are named labels-00000.parquet, labels-00001.parquet, ... and each holds
+    at most rows_per_shard contracts.
+    """
+
+    def __init__(self, output_dir=SHARD_DIRECTORY, shard_format="parquet", rows_per_shard=DEFAULT_ROWS_PER_SHARD):
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError as e:
+            raise ImportError("Exporting shards requires the pyarrow package (pip install pyarrow).") from e
+
+        if shard_format not in SHARD_EXTENSIONS:
+            raise ValueError(f"Unsupported shard format: {shard_format}")
+
+        self.output_dir = output_dir
+        self.shard_format = shard_format
+        self.rows_per_shard = rows_per_shard
+        self.schema = shard_schema()
+        self.columns = {name: [] for name in self.schema.names}
+        self.shard_index = 0
+        self.rows_written = 0
+
+        os.makedirs(output_dir, exist_ok=True)
+
+        # Remove the shards of a previous export so stale contracts are not read back
+        for name in os.listdir(output_dir):
+            if name.startswith("labels-") and name.endswith(tuple(SHARD_EXTENSIONS.values())):
+                os.remove(os.path.join(output_dir, name))
+
+    def add(self, relative_path, content_hash, source, labels):
+        """
+        Add one labeled contract, writing a shard when the buffer is full.
+
+        Args:
+        - relative_path (str): Path of the contract relative to the dataset root.
+        - content_hash (str): SHA-256 digest of the contract source.
+        - source (str): The contract source with comments removed.
+        - labels (tuple): The detection labels, ordered as LABEL_KEYS.
+        """
+        self.columns["path"].append(relative_path)
+        self.columns["content_hash"].append(content_hash)
+        self.columns["source"].append(source)
+        for key, label in zip(LABEL_KEYS, labels):
+            self.columns[key].append(bool(label))
+
+        if len(self.columns["path"]) >= self.rows_per_shard:
+            self.flush()
+
+    def flush(self):
+        """Write the buffered contracts to a new shard file."""
+        row_count = len(self.columns["path"])
+        if not row_count:
+            return
+
+        import pyarrow as pa
+
+        table = pa.Table.from_pydict(self.columns, schema=self.schema)
+        shard_file = os.path.join(
+            self.output_dir, f"labels-{self.shard_index:05d}{SHARD_EXTENSIONS[self.shard_format]}"
+        )
+
+        if self.shard_format == "parquet":
+            import pyarrow.parquet as pq
+
+            pq.write_table(table, shard_file)
+        else:
+            with pa.OSFile(shard_file, "wb") as sink:
+                with pa.ipc.new_file(sink, self.schema) as writer:
+                    writer.write_table(table)
+
+        log.info(f"Wrote {row_count} contracts to {shard_file}")
+        self.shard_index += 1
+        self.rows_written += row_count
+        self.columns = {name: [] for name in self.schema.names}
+
+    def close(self):
+        """Write any remaining buffered contracts."""
+        self.flush()
+        log.info(f"Exported {self.rows_written} contracts in {self.shard_index} shards to {self.output_dir}")
@@ -0,0 +1,540 @@
+import re
+import time
+import logging
+from collections import namedtuple
+from collections.abc import Sequence
+
+import regex
+
+# Setup logging with rich handler
+log = logging.getLogger(__name__)
+
+# Patterns shared by several detectors, compiled once at import time.
+# `\bmodifier\s+onlyOwner\b|\bonlyOwner\b` matches exactly where `\bonlyOwner\b` does,
+# so reentrancy and delegatecall detection share the shorter form.
+# The confirmation patterns can backtrack for a long time on minified or generated
+# sources, so they are compiled with the regex package, whose searches accept a timeout.
+TIMESTAMP_ASSIGN = regex.compile(r'\b\w+\s*=\s*block\.timestamp\b')
+TIMESTAMP_CONTAMINATION = (
+    regex.compile(r'\b(block\.timestamp\s*<[^;]+)\b'),
+    regex.compile(r'\b(while\s*\([^)]*block\.timestamp[^)]*\))\b'),
+    regex.compile(r'\b(if\s*\([^)]*block\.timestamp[^)]*\))\b'),
+    regex.compile(r'\breturn\s+[^;]*block\.timestamp\b'),
+)
+CALL_VALUE_ZERO = regex.compile(r'call\.value\s*\(\s*0\s*\)\s*')
+BALANCE_DEDUCTION = regex.compile(r'\b\w+\s*=\s*\w+\s*-\s*\w+\s*;')
+CONDITION_STATEMENT = regex.compile(r'\b(assert|require)\b\s*\(.*[\+\-\*]')
+
+# Label recorded for a detector that ran out of its time budget
+TIMEOUT_LABEL = "timeout"
+
+# A literal looked up by the keyword scan. The word boundaries of the original
+# `\bkeyword\b` patterns are checked on each match at the ends of the literal that are
+# word characters; leading_boundary is False for patterns without a leading `\b`
+# (`SafeMath\b`). A file_scope keyword applies to the whole file even when the
+# detectors run on a single function (see detect_functions).
+Keyword = namedtuple("Keyword", ["literal", "leading_boundary", "file_scope"], defaults=(True, False))
+
+# A registered detector:
+# - name: key of its label in the per-contract JSON
+# - check: check(sol_content, tokens, deadline) returning the label, only called when one
+#   of the triggers occurs in the content
+# - triggers: literals of which at least one must occur for the label to be positive
+# - keywords: other literals the check looks up in the tokens
+# - patterns: the confirmation patterns the check passes to search
+Detector = namedtuple("Detector", ["name", "check", "triggers", "keywords", "patterns"])
+
+ARITHMETIC_OPERATORS = ("+", "-", "*")
+
+
+def is_word_char(char):
+    """Return True if char is matched by the `\\w` class of str patterns."""
+    return char.isalnum() or char == "_"
+
+
+WORD_BYTES = frozenset(b'abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789_')
+
+
+def is_word_byte(byte):
+    """Return True if byte (an int, as given by indexing bytes) is matched by `\\w` in bytes patterns."""
+    return byte in WORD_BYTES
+
+
+def needs_boundary_check(keyword):
+    """Return True if a match of the keyword's literal must be checked for word boundaries."""
+    literal = keyword.literal
+    return (keyword.leading_boundary and is_word_char(literal[0])) or is_word_char(literal[-1])
+
+
+def overlaps(keyword, other):
+    """
+    Return True if an occurrence of keyword's literal that passes its boundary checks can
+    start inside an occurrence of the other literal, where a single scan would miss it.
+    """
+    literal = keyword.literal
+    for offset in range(1, len(other)):
+        if not (other.startswith(literal, offset) or literal.startswith(other[offset:])):
+            continue
+        # Inside a word, a literal with a leading boundary cannot match
+        if not (keyword.leading_boundary and is_word_char(literal[0]) and is_word_char(other[offset - 1])):
+            return True
+    return False
+
+
+class DetectorRegistry:
+    """
+    The detectors run by detect_all, in the order of their labels.
+
+    Each detector declares the literals its check depends on. The literals of all
+    detectors are matched by a single scanner, so one pass over a file finds every
+    token, and detectors whose triggers are absent are not called at all. A new
+    detector is a check function decorated with register_detector, from any module;
+    the label keys, the JSON output, the columnar schema, the bytes and streamed
+    searches of its patterns and the label cache fingerprint follow the registry.
+    """
+
+    def __init__(self):
+        self.detectors = []
+        self.keywords = {}
+        self.scanners = {}
+        self.pattern_triggers = {}  # str pattern -> bytes literals, one of which every match contains
+        self.bytes_patterns = {}  # str pattern -> bytes-compiled twin
+
+    @property
+    def names(self):
+        """Label keys of the registered detectors, in registration order."""
+        return tuple(detector.name for detector in self.detectors)
+
+    @property
+    def triggers(self):
+        """Literals of which at least one must occur for any detector to run."""
+        return frozenset(trigger for detector in self.detectors for trigger in detector.triggers)
+
+    @property
+    def file_scope_keywords(self):
+        """Literals that apply to the whole file, see Keyword."""
+        return frozenset(keyword.literal for keyword in self.keywords.values() if keyword.file_scope)
+
+    def add_keyword(self, keyword):
+        """Add a literal to the scanner, raising ValueError if it is already declared differently."""
+        if isinstance(keyword, str):
+            keyword = Keyword(keyword)
+        declared = self.keywords.get(keyword.literal)
+        if declared is not None and declared != keyword:
+            raise ValueError(f"Keyword {keyword.literal!r} is already declared as {declared}")
+        keyword.literal.encode('ascii')  # The bytes scanner needs ASCII literals
+        self.keywords[keyword.literal] = keyword
+        self.scanners.clear()
+        return keyword.literal
+
+    def add_pattern(self, pattern, triggers):
+        """
+        Declare a confirmation pattern with the literals of which every match contains at
+        least one, so a streamed window without any of them is not searched for it. Its
+        bytes-compiled twin is compiled here, for content loaded with map_sol_file. On bytes
+        `\\w` and `\\b` only know ASCII word characters; Solidity identifiers are ASCII, so
+        this only matters next to non-ASCII text in string literals.
+        """
+        if not triggers:
+            raise ValueError(f"Pattern {pattern.pattern!r} needs at least one trigger")
+        triggers = tuple(trigger.encode('ascii') for trigger in triggers)
+        declared = self.pattern_triggers.get(pattern)
+        if declared is not None and declared != triggers:
+            raise ValueError(f"Pattern {pattern.pattern!r} is already declared with triggers {declared}")
+        self.pattern_triggers[pattern] = triggers
+        self.bytes_patterns[pattern] = regex.compile(pattern.pattern.encode('ascii'), pattern.flags & ~regex.UNICODE)
+        return pattern
+
+    def register(self, name, triggers, keywords=(), patterns=None):
+        """
+        Decorator registering a check function as a detector.
+
+        Args:
+        - name (str): Key of the label in the per-contract JSON.
+        - triggers (tuple): Literals (str or Keyword) of which at least one must occur.
+        - keywords (tuple): Other literals (str or Keyword) the check looks up in its tokens.
+        - patterns (dict | None): The confirmation patterns (compiled str regex.Pattern) the
+          check passes to search, each mapped to a tuple of literals of which every match
+          contains at least one.
+
+        Returns:
+        - (function): The decorator, which returns the check unchanged.
+        """
+        if name in self.names:
+            raise ValueError(f"Detector {name!r} is already registered")
+        if not triggers:
+            raise ValueError(f"Detector {name!r} needs at least one trigger")
+
+        def decorator(check):
+            self.detectors.append(Detector(
+                name,
+                check,
+                tuple(self.add_keyword(trigger) for trigger in triggers),
+                tuple(self.add_keyword(keyword) for keyword in keywords),
+                tuple(self.add_pattern(pattern, literals) for pattern, literals in (patterns or {}).items()),
+            ))
+            return check
+        return decorator
+
+    def scanner(self, binary=False):
+        """
+        Compile the scanner for all declared literals, for str or bytes content.
+
+        The scanner is an alternation of plain literals, longest first, which the regex
+        engine matches in one pass. If a literal can start inside another one, a
+        lookahead form is used instead so that overlapping occurrences are also reported.
+        Literals without a word boundary to check, such as the arithmetic operators, are
+        frequent and need no per-match work, so they are left to a substring search.
+
+        Returns:
+        - (tuple): The compiled pattern, whose group 1 is the literal matched, a
+          dictionary mapping each literal as matched (str or bytes) to its Keyword, and
+          the (matched, literal) pairs of the literals left to a substring search.
+        """
+        if binary not in self.scanners:
+            literals = sorted(
+                (literal for literal, keyword in self.keywords.items() if needs_boundary_check(keyword)),
+                key=len, reverse=True,
+            )
+            plain = [literal for literal, keyword in self.keywords.items() if not needs_boundary_check(keyword)]
+            alternation = "|".join(re.escape(literal) for literal in literals)
+            if any(overlaps(self.keywords[literal], other) for literal in literals for other in literals if literal != other):
+                pattern = f"(?=({alternation}))"
+            else:
+                pattern = f"({alternation})"
+            keywords = self.keywords
+            plain = [(literal, literal) for literal in plain]
+            if binary:
+                pattern = pattern.encode('ascii')
+                keywords = {literal.encode('ascii'): keyword for literal, keyword in keywords.items()}
+                plain = [(literal.encode('ascii'), literal) for literal, _ in plain]
+            self.scanners[binary] = (re.compile(pattern), keywords, plain)
+        return self.scanners[binary]
+
+
+class LabelKeys(Sequence):
+    """
+    Label keys of the registered detectors, read from the registry on every use, so
+    modules that import the keys also see detectors registered after they were imported.
+    """
+
+    def __init__(self, registry):
+        self.registry = registry
+
+    def __getitem__(self, index):
+        return self.registry.names[index]
+
+    def __len__(self):
+        return len(self.registry.detectors)
+
+    def __eq__(self, other):
+        return tuple(self) == (tuple(other) if isinstance(other, (tuple, list, LabelKeys)) else other)
+
+    def __hash__(self):
+        return hash(tuple(self))
+
+    def __repr__(self):
+        return repr(self.registry.names)
+
+
+REGISTRY = DetectorRegistry()
+register_detector = REGISTRY.register
+
+
+def scan_tokens(sol_content):
+    """
+    Find which detector keywords occur in Solidity content with a single pass.
+
+    Args:
+    - sol_content (str | bytes | StreamSummary): The cleaned content of the Solidity source code,
+      or the summary of its streamed windows.
+
+    Returns:
+    - (set): The literals of the registered detectors that occur in the content.
+    """
+    if isinstance(sol_content, StreamSummary):
+        return sol_content.tokens
+    binary = not isinstance(sol_content, str)
+    scanner, keywords, plain = REGISTRY.scanner(binary)
+    is_word = is_word_byte if binary else is_word_char
+
+    # find rather than `in`, which only looks for single bytes in an mmap
+    found = {literal for matched, literal in plain if sol_content.find(matched) != -1}
+    content_length = len(sol_content)
+    for match in scanner.finditer(sol_content):
+        keyword = keywords[match.group(1)]
+        if keyword.literal in found:
+            continue
+        start, end = match.span(1)
+        if start > 0 and keyword.leading_boundary and is_word(sol_content[start]) and is_word(sol_content[start - 1]):
+            continue
+        if end < content_length and is_word(sol_content[end - 1]) and is_word(sol_content[end]):
+            continue
+        found.add(keyword.literal)
+    return found
+
+
+def search(pattern, sol_content, deadline=None):
+    """
+    Search a confirmation pattern, giving up at deadline. Bytes content is searched
+    with the bytes-compiled twin of the pattern, and a StreamSummary answers from the
+    matches found in its windows.
+
+    Args:
+    - pattern (regex.Pattern): The compiled str pattern.
+    - sol_content (str | bytes | StreamSummary): The cleaned content of the Solidity source code.
+    - deadline (float | None): time.perf_counter() value after which the search is abandoned.
+
+    Returns:
+    - (regex.Match | bool | None): The first match, if any (a bool for a StreamSummary).
+
+    Raises:
+    - TimeoutError: If the deadline has passed or passes during the search.
+    - ValueError: If no registered detector declares the pattern, whose bytes twin and
+      stream triggers are then unknown.
+    """
+    if pattern not in REGISTRY.pattern_triggers:
+        raise ValueError(f"Pattern {pattern.pattern!r} is not declared in the patterns of a registered detector")
+    if isinstance(sol_content, StreamSummary):
+        if pattern not in sol_content.matched and pattern in sol_content.timed_out:
+            raise TimeoutError("pattern timed out in a streamed window")
+        return pattern in sol_content.matched
+    if not isinstance(sol_content, str):
+        pattern = REGISTRY.bytes_patterns[pattern]
+    if deadline is None:
+        return pattern.search(sol_content)
+    remaining = deadline - time.perf_counter()
+    if remaining <= 0:
+        raise TimeoutError("time budget exhausted")
+    return pattern.search(sol_content, timeout=remaining)
+
+
+class StreamSummary:
+    """
+    Tokens and confirmation patterns found in the windows of a streamed file.
+
+    detect_all accepts a summary in place of the content, so the checks are shared by
+    whole-file and streamed detection.
+    """
+
+    def __init__(self):
+        self.tokens = set()
+        self.matched = set()
+        self.timed_out = set()
+
+    def scan(self, window, deadline=None, detector_timeout=None):
+        """
+        Record the tokens and confirmation patterns found in one window of cleaned bytes.
+
+        The window must start and end right after a non-word byte (or at the start and
+        end of the file). `\\b` then holds at the same positions as in the whole file,
+        so every match in the window is also a match in the whole file.
+
+        Args:
+        - window (bytes): Cleaned content of the window.
+        - deadline (float | None): time.perf_counter() value after which searches are abandoned.
+        - detector_timeout (float | None): Time budget of each pattern search in seconds.
+        """
+        self.tokens |= scan_tokens(window)
+        for pattern, triggers in REGISTRY.pattern_triggers.items():
+            if pattern in self.matched or not any(trigger in window for trigger in triggers):
+                continue
+            search_deadline = deadline
+            if detector_timeout is not None:
+                search_deadline = min(deadline or float("inf"), time.perf_counter() + detector_timeout)
+            try:
+                if search(pattern, window, search_deadline):
+                    self.matched.add(pattern)
+            except TimeoutError:
+                self.timed_out.add(pattern)
+
+
+@register_detector("timestamp_dependence", triggers=("block.timestamp",),
+                   patterns={pattern: ("block.timestamp",) for pattern in (TIMESTAMP_ASSIGN, *TIMESTAMP_CONTAMINATION)})
+def check_timestamp_dependence(sol_content, tokens, deadline=None):
+    """TDInvocation ∧ (TDAssign ∨ TDContaminate)."""
+    return bool(
+        search(TIMESTAMP_ASSIGN, sol_content, deadline)
+        or any(search(pattern, sol_content, deadline) for pattern in TIMESTAMP_CONTAMINATION)
+    )
+
+
+@register_detector("reentrancy", triggers=("call.value",), keywords=("onlyOwner",),
+                   patterns={CALL_VALUE_ZERO: ("call.value",), BALANCE_DEDUCTION: ("-",)})
+def check_reentrancy(sol_content, tokens, deadline=None):
+    """call.value with a non-zero value and either no balance deduction or no owner check."""
+    return (
+        not search(CALL_VALUE_ZERO, sol_content, deadline)
+        and (not search(BALANCE_DEDUCTION, sol_content, deadline) or "onlyOwner" not in tokens)
+    )
+
+
+# SafeMath is declared once and used everywhere, so it clears the whole file
+@register_detector("integer_overflow", triggers=ARITHMETIC_OPERATORS,
+                   keywords=(Keyword("SafeMath", leading_boundary=False, file_scope=True),),
+                   patterns={CONDITION_STATEMENT: ("assert", "require")})
+def check_integer_overflow(sol_content, tokens, deadline=None):
+    """Arithmetic without SafeMath and without an assert/require guard."""
+    return "SafeMath" not in tokens and not search(CONDITION_STATEMENT, sol_content, deadline)
+
+
+@register_detector("delegatecall", triggers=("delegatecall",), keywords=("onlyOwner",))
+def check_delegatecall(sol_content, tokens, deadline=None):
+    """delegatecall without an owner check."""
+    return "onlyOwner" not in tokens
+
+
+def run_check(check, sol_content, tokens, detector_timeout=None, deadline=None):
+    """
+    Run one detector check within its time budget.
+
+    Returns:
+    - (bool | str): The label, or TIMEOUT_LABEL if the check ran past detector_timeout
+      seconds or past the deadline of the whole file.
+    """
+    if detector_timeout is not None:
+        detector_deadline = time.perf_counter() + detector_timeout
+        deadline = detector_deadline if deadline is None else min(deadline, detector_deadline)
+    try:
+        return check(sol_content, tokens, deadline)
+    except TimeoutError:
+        return TIMEOUT_LABEL
+
+
+def run_detectors(sol_content, tokens, detector_timeout=None, deadline=None, timings=None):
+    """
+    Dispatch the content to the registered detectors whose triggers occur in tokens.
+    The others are labeled False without being called.
+
+    Returns:
+    - (tuple): The labels, in registration order.
+    """
+    labels = []
+    for detector in REGISTRY.detectors:
+        if tokens.isdisjoint(detector.triggers):
+            labels.append(False)
+            continue
+        start = time.perf_counter() if timings is not None else None
+        labels.append(run_check(detector.check, sol_content, tokens, detector_timeout, deadline))
+        if timings is not None:
+            timings.append((f"detect.{detector.name}", time.perf_counter() - start))
+    return tuple(labels)
+
+
+def detect_all(sol_content, timings=None, detector_timeout=None, deadline=None, tokens=None):
+    """
+    Run all registered vulnerability detections with one token scan over the content.
+
+    The labels of the four built-in detectors are identical to those of
+    detect_timestamp_dependence, detect_reentrancy_vulnerability,
+    detect_integer_overflow_underflow and detect_delegatecall_vulnerability; a detector
+    is only called when the token scan finds one of its triggers, and its confirmation
+    patterns only run when the tokens show they can change its label.
+
+    Args:
+    - sol_content (str | bytes | StreamSummary): The cleaned content of the Solidity source code,
+      decoded or raw, or the summary of its streamed windows.
+    - timings (list | None): If given, ("detect.<stage>", seconds) pairs are appended
+      for the token scan and each detector that runs.
+    - detector_timeout (float | None): Time budget of each detector in seconds.
+    - deadline (float | None): time.perf_counter() value by which the whole file must be done.
+    - tokens (set | None): The tokens of the content if it was already scanned with scan_tokens.
+
+    Returns:
+    - (tuple): The labels, ordered as REGISTRY.names (timestamp dependence, reentrancy,
+      integer overflow and delegatecall, then any other registered detector).
+      A detector that runs out of time gets TIMEOUT_LABEL instead of a boolean.
+    """
+    if tokens is None and timings is None:
+        tokens = scan_tokens(sol_content)
+    elif tokens is None:
+        start = time.perf_counter()
+        tokens = scan_tokens(sol_content)
+        timings.append(("detect.scan", time.perf_counter() - start))
+    labels = run_detectors(sol_content, tokens, detector_timeout, deadline, timings)
+
+    if log.isEnabledFor(logging.INFO):
+        log.info("Labels: " + ", ".join(f"{name}={label}" for name, label in zip(REGISTRY.names, labels)))
+
+    return labels
+
+
+def detect_functions(sol_content, index, file_tokens, detector_timeout=None, deadline=None):
+    """
+    Run the registered detections on each function body of an indexed source instead of the whole file.
+
+    The detectors see the body of a function, and the modifiers the index found in its
+    header, so an onlyOwner modifier only clears the function it is applied to. File-scope
+    keywords such as SafeMath are taken from the tokens of the whole file. The rest of the
+    header, such as the arguments of a base constructor, is not checked. Only the bodies
+    of files with a detector trigger are scanned, and functions without any trigger are
+    not checked.
+
+    Args:
+    - sol_content (str): The cleaned content of the Solidity source code.
+    - index (solidity_index.SourceIndex): The index of sol_content.
+    - file_tokens (set): The tokens of sol_content, as found by scan_tokens for detect_all.
+    - detector_timeout (float | None): Time budget of each detector and function in seconds.
+    - deadline (float | None): time.perf_counter() value by which the whole file must be done.
+
+    Returns:
+    - (list): (span, labels) pairs, in source order, for the functions with at least one
+      positive or timed-out label.
+    """
+    # A function body holds no token that the whole file does not
+    triggers = REGISTRY.triggers
+    if file_tokens.isdisjoint(triggers):
+        return []
+    scope_tokens = file_tokens & REGISTRY.file_scope_keywords
+    keywords = REGISTRY.keywords.keys()
+    findings = []
+    for span in index.functions:
+        body = sol_content[span.body_start:span.end]
+        tokens = scan_tokens(body)
+        if tokens.isdisjoint(triggers):
+            continue
+        tokens |= scope_tokens | keywords & set(span.modifiers)
+        labels = run_detectors(body, tokens, detector_timeout, deadline)
+        if any(label is not False for label in labels):
+            findings.append((span, labels))
+    return findings
+
+
+def legacy_detect_all(sol_content):
+    """Run the four detector functions one after another, as main.py did before the fused engine."""
+    from timestamp_dependence import detect_timestamp_dependence
+    from reentrance_detection import detect_reentrancy_vulnerability
+    from integer_overflow_underflow import detect_integer_overflow_underflow
+    from delegatecall_detection import detect_delegatecall_vulnerability
+
+    return (
+        detect_timestamp_dependence(sol_content),
+        detect_reentrancy_vulnerability(sol_content),
+        detect_integer_overflow_underflow(sol_content),
+        detect_delegatecall_vulnerability(sol_content),
+    )
+
+
+# Example usage: check parity with the individual detectors and measure the speedup
+if __name__ == "__main__":
+    import sys
+    from file_loader import discover_sol_files, load_sol_file
+    from remove_comments import remove_comments
+
+    root_directory = sys.argv[1] if len(sys.argv) > 1 else "datast"
+    logging.disable(logging.CRITICAL)  # Keep detector logging out of the measurement
+
+    contents = [load_sol_file(path) for path in discover_sol_files(root_directory)]
+    cleaned_contents = [remove_comments(content) for content in contents if content is not None]
+
+    start = time.perf_counter()
+    legacy_labels = [legacy_detect_all(content) for content in cleaned_contents]
+    legacy_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    fused_labels = [detect_all(content) for content in cleaned_contents]
+    fused_time = time.perf_counter() - start
+
+    mismatches = sum(1 for legacy, fused in zip(legacy_labels, fused_labels) if legacy != fused)
+    print(f"Files: {len(cleaned_contents)}, label mismatches: {mismatches}")
+    print(f"Separate detectors: {legacy_time:.3f}s, fused engine: {fused_time:.3f}s, speedup: {legacy_time / fused_time:.2f}x")
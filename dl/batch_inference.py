@@ -0,0 +1,150 @@
+# batch_inference.py
+
+import os
+import json
+import time
+import torch
+import logging
+from itertools import islice
+from rich.progress import Progress
+from data_loader import LABEL_KEYS, decode_sol_text, load_solidity_files
+from inference import load_inference_model
+from windowing import DEFAULT_MAX_WINDOWS, pool_window_logits
+
+# Configure logging with Rich for better readability
+logging.getLogger(__name__)
+
+# Default directory of the predictions, laid out like the labeler's json_out
+PREDICTION_DIR = "json_predictions"
+
+# Default number of sequences per forward pass, and of contracts read and tokenized at a time per batch
+DEFAULT_INFERENCE_BATCH_SIZE = 32
+READ_AHEAD_BATCHES = 8
+
+def prediction_file(rel_path: str, output_root: str):
+    """
+    Maps a contract path relative to the dataset root to the path of its JSON prediction,
+    mirroring the directory structure like the labeler does under json_out.
+    :param rel_path: Path of the .sol file relative to the dataset root.
+    :param output_root: Root directory of the predictions.
+    :return: Path of the .json file.
+    """
+    return os.path.join(output_root, os.path.splitext(rel_path)[0] + ".json")
+
+def write_prediction(output_file: str, vulnerabilities: dict):
+    """
+    Writes a prediction as JSON through a temporary file in the same directory and a rename,
+    like the labeler's results, so an interrupted run never leaves a truncated file.
+    :param output_file: Path of the .json file.
+    :param vulnerabilities: Dictionary {vulnerability: bool}.
+    """
+    output_dir, file_name = os.path.split(output_file)
+    temp_path = os.path.join(output_dir, f".{file_name}.{os.getpid()}.tmp")
+    try:
+        with open(temp_path, 'w') as f:
+            json.dump(vulnerabilities, f, indent=4)
+        os.replace(temp_path, output_file)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+def predict_windows(model, tokenizer, contract_windows, batch_size: int = DEFAULT_INFERENCE_BATCH_SIZE, pooling: str = "max"):
+    """
+    Scores tokenized contracts: their windows are sorted by length and run through the model
+    in batches of batch_size, each padded to its longest window, then pooled per contract.
+    :param model: The model in evaluation mode.
+    :param tokenizer: The SolidityTokenizer the windows were encoded with.
+    :param contract_windows: For each contract, its list of window token id lists.
+    :param batch_size: Number of windows per forward pass.
+    :param pooling: How the logits of a contract's windows are combined, "max" or "mean".
+    :return: Tensor of probabilities of shape (contracts, labels).
+    """
+    device = next(model.parameters()).device
+    rows = [ids for windows in contract_windows for ids in windows]
+    contract_index = torch.repeat_interleave(torch.arange(len(contract_windows)),
+                                             torch.tensor([len(windows) for windows in contract_windows], dtype=torch.long))
+    logits = torch.empty(len(rows), model.config.num_labels)
+
+    # Windows of similar length share a batch, so little of each forward pass is padding
+    order = sorted(range(len(rows)), key=lambda row: len(rows[row]))
+    with torch.no_grad():
+        for start in range(0, len(order), batch_size):
+            batch_rows = order[start:start + batch_size]
+            tokens = tokenizer.tokenizer.pad({"input_ids": [rows[row] for row in batch_rows]}, padding="longest",
+                                             return_tensors="pt")
+            tokens = {k: v.to(device) for k, v in tokens.items()}
+            logits[batch_rows] = model(**tokens).logits.float().cpu()
+
+    return torch.sigmoid(pool_window_logits(logits, contract_index, len(contract_windows), pooling))
+
+def run_batch_inference(model_checkpoint, solidity_root: str, output_root: str = PREDICTION_DIR,
+                        batch_size: int = DEFAULT_INFERENCE_BATCH_SIZE, threshold: float = 0.5, stride: int = None,
+                        max_windows: int = DEFAULT_MAX_WINDOWS, pooling: str = "max",
+                        model_name: str = "microsoft/codebert-base"):
+    """
+    Runs inference on every Solidity file under a directory, loading the model and tokenizer once.
+    Files are streamed from the directory and read, tokenized and scored a few batches at a
+    time, and each prediction is written as {vulnerability: bool} JSON to the mirrored path
+    under output_root, the layout the labeler uses under json_out.
+    :param model_checkpoint: Path to the saved model checkpoint.
+    :param solidity_root: Directory of the Solidity files to score.
+    :param output_root: Root directory of the JSON predictions.
+    :param batch_size: Number of sequences per forward pass.
+    :param threshold: Threshold to classify probabilities into binary predictions (default 0.5).
+    :param stride: Step in tokens between overlapping windows of a contract, None to truncate contracts to 512 tokens.
+    :param max_windows: Maximum number of windows per contract in windowed mode.
+    :param pooling: How the logits of a contract's windows are combined, "max" or "mean".
+    :param model_name: Pretrained Code-BERT model the checkpoint was trained from.
+    :return: Dictionary with the number of contracts scored and failed, and the positives per vulnerability.
+    """
+    model, tokenizer = load_inference_model(model_checkpoint, model_name)
+    device = torch.device("cuda") if torch.cuda.is_available() else torch.device("cpu")
+    model.to(device)
+
+    summary = {"scored": 0, "failed": 0, "positives": dict.fromkeys(LABEL_KEYS, 0)}
+    files = load_solidity_files(solidity_root)
+    start = time.perf_counter()
+
+    with Progress() as progress:
+        inference_task = progress.add_task("Scoring Solidity files...", total=None)
+
+        while chunk := list(islice(files, batch_size * READ_AHEAD_BATCHES)):
+            codes, rel_paths = [], []
+            for solidity_file, rel_path in chunk:
+                try:
+                    # Decoded like the labeler and the training data, so a contract is scored on the same text
+                    with open(solidity_file, 'rb') as f:
+                        codes.append(decode_sol_text(f.read()))
+                    rel_paths.append(rel_path)
+                except OSError as e:
+                    logging.error(f"Error loading {solidity_file}: {e}, skipping this file.")
+                    summary["failed"] += 1
+            if not codes:
+                progress.update(inference_task, advance=len(chunk))
+                continue
+
+            if stride:
+                contract_windows = tokenizer.tokenize_windows(codes, stride=stride, max_windows=max_windows)
+            else:
+                contract_windows = [[ids] for ids in tokenizer.tokenize_batch(codes)]
+            probabilities = predict_windows(model, tokenizer, contract_windows, batch_size, pooling)
+
+            for rel_path, contract_probabilities in zip(rel_paths, probabilities.tolist()):
+                vulnerabilities = {key: probability > threshold for key, probability in zip(LABEL_KEYS, contract_probabilities)}
+                output_file = prediction_file(rel_path, output_root)
+                os.makedirs(os.path.dirname(output_file), exist_ok=True)
+                write_prediction(output_file, vulnerabilities)
+                for key in LABEL_KEYS:
+                    summary["positives"][key] += vulnerabilities[key]
+            summary["scored"] += len(rel_paths)
+            progress.update(inference_task, advance=len(chunk))
+
+    elapsed = time.perf_counter() - start
+    logging.info(f"Scored {summary['scored']} contracts in {elapsed:.1f}s ({summary['scored'] / max(elapsed, 1e-9):.1f} contracts/s), "
+                 f"predictions written to {output_root}")
+    return summary
+
+# Example usage in main.py
+# from batch_inference import run_batch_inference
+# summary = run_batch_inference("checkpoint_epoch_3.pth", "path/to/solidity_dir", output_root="json_predictions")
@@ -3,6 +3,25 @@ import json
 import logging
 from rich.progress import Progress
 
+# Label columns shared by the per-contract JSON files and the exported shards
+LABEL_KEYS = ["timestamp_dependence", "reentrancy", "integer_overflow", "delegatecall"]
+
+# Encodings the labeler tries in order for files that are not valid UTF-8 (see file_loader.py)
+FALLBACK_ENCODINGS = ("cp1252", "latin-1")
+
+def decode_sol_text(raw: bytes):
+    """
+    Decodes a Solidity file the way the labeler does: as UTF-8 if possible and with the
+    fallback encodings otherwise, line endings normalized to LF.
+    :param raw: Raw content of the file.
+    :return: The decoded text.
+    """
+    for encoding in ('utf-8', *FALLBACK_ENCODINGS):
+        try:
+            return raw.decode(encoding).replace('\r\n', '\n').replace('\r', '\n')
+        except UnicodeDecodeError:
+            continue
+
 def load_solidity_files(solidity_root: str):
     """
     Generator that yields Solidity files from the dataset.
@@ -46,10 +65,15 @@ def load_solidity_and_labels(solidity_root: str, json_root: str):
                     labels = json.load(json_file_obj)
                     
                 # Ensure that the JSON labels follow the expected structure
-                if not all(k in labels for k in ["timestamp_dependence", "reentrancy", "integer_overflow", "delegatecall"]):
+                if not all(k in labels for k in LABEL_KEYS):
                     logging.error(f"Incorrect label format in {json_file}, skipping this file.")
                     continue
 
+                # Files quarantined by the labeler carry "timeout" instead of a boolean label
+                if not all(isinstance(labels[k], bool) for k in LABEL_KEYS):
+                    logging.warning(f"Skipping {solidity_file}: labeling timed out ({json_file})")
+                    continue
+
                 # Add the solidity code and corresponding labels to the data list
                 data.append((solidity_code, labels))
                 
@@ -62,3 +86,104 @@ def load_solidity_and_labels(solidity_root: str, json_root: str):
 
     logging.info(f"Loaded {len(data)} Solidity files with corresponding labels.")
     return data
+
+def load_labeled_shards(shard_root: str):
+    """
+    Loads Solidity code and vulnerability labels from the Parquet or Arrow IPC shards
+    written by the labeler with --export, reading each shard with a single columnar read.
+
+    Returns a list of tuples containing:
+    (solidity_code, labels_dict)
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    shard_files = sorted(
+        os.path.join(shard_root, name) for name in os.listdir(shard_root)
+        if name.startswith("labels-") and name.endswith((".parquet", ".arrow"))
+    )
+    if not shard_files:
+        raise FileNotFoundError(f"No label shards found in {shard_root}")
+
+    columns = ["source"] + LABEL_KEYS
+    data = []
+
+    with Progress() as progress:
+        shard_task = progress.add_task("Loading label shards...", total=len(shard_files))
+
+        for shard_file in shard_files:
+            if shard_file.endswith(".parquet"):
+                table = pq.read_table(shard_file, columns=columns)
+            else:
+                with pa.memory_map(shard_file, "r") as source:
+                    table = pa.ipc.open_file(source).read_all().select(columns)
+
+            shard = table.to_pydict()
+            for i, solidity_code in enumerate(shard["source"]):
+                data.append((solidity_code, {k: shard[k][i] for k in LABEL_KEYS}))
+
+            progress.update(shard_task, advance=1)
+
+    logging.info(f"Loaded {len(data)} Solidity files with corresponding labels from {len(shard_files)} shards.")
+    return data
+
+def load_label_index(index_path: str, solidity_root: str = None, flags=(), no_flags=()):
+    """
+    Loads Solidity code and vulnerability labels through the SQLite label index kept by
+    the labeler, optionally only the contracts with the given labels positive or negative.
+    Contracts whose source changed since they were labeled are skipped.
+
+    Returns a list of tuples containing:
+    (solidity_code, labels_dict)
+    """
+    import sqlite3
+    import hashlib
+
+    unknown = [k for k in (*flags, *no_flags) if k not in LABEL_KEYS]
+    if unknown:
+        raise ValueError(f"Unknown labels {unknown}, expected some of {LABEL_KEYS}")
+
+    connection = sqlite3.connect(f"file:{index_path}?mode=ro", uri=True)
+    try:
+        if solidity_root is None:
+            # Paths are stored relative to the corpus root the labeler ran on
+            row = connection.execute("SELECT value FROM meta WHERE key = 'root_directory'").fetchone()
+            solidity_root = row[0] if row else "."
+
+        conditions = [f"{k} = 1" for k in flags] + [f"{k} = 0" for k in no_flags]
+        where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+        rows = connection.execute(f"SELECT path, sha256, {', '.join(LABEL_KEYS)} FROM labels{where} ORDER BY path").fetchall()
+    finally:
+        connection.close()
+
+    data = []
+    stale = 0
+
+    with Progress() as progress:
+        file_task = progress.add_task("Loading Solidity files from the label index...", total=len(rows))
+
+        for rel_path, sha256, *labels in rows:
+            solidity_file = os.path.join(solidity_root, rel_path)
+            try:
+                with open(solidity_file, 'rb') as sol_file:
+                    raw = sol_file.read()
+            except OSError as e:
+                logging.error(f"Error loading {solidity_file}: {e}, skipping this file.")
+                progress.update(file_task, advance=1)
+                continue
+
+            # The labeler hashes the raw bytes when memory-mapping or streaming, and the decoded
+            # text otherwise, both with LF line endings
+            solidity_code = decode_sol_text(raw)
+            normalized = raw.replace(b'\r\n', b'\n').replace(b'\r', b'\n')
+            if sha256 not in (hashlib.sha256(normalized).hexdigest(), hashlib.sha256(solidity_code.encode('utf-8')).hexdigest()):
+                stale += 1
+            else:
+                data.append((solidity_code, {k: bool(v) for k, v in zip(LABEL_KEYS, labels)}))
+
+            progress.update(file_task, advance=1)
+
+    if stale:
+        logging.warning(f"Skipped {stale} files that changed since they were labeled; rerun the labeler to index them.")
+    logging.info(f"Loaded {len(data)} Solidity files with corresponding labels from {index_path}.")
+    return data
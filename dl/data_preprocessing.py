@@ -1,20 +1,34 @@
 # data_preprocessing.py
 
+import math
 import torch
-from torch.utils.data import Dataset, DataLoader
+from functools import partial
+from torch.utils.data import Dataset, DataLoader, Sampler
 from tokenizer import SolidityTokenizer
+from token_cache import TOKEN_CACHE_DIR, build_token_cache
+from windowing import DEFAULT_MAX_WINDOWS
 
 class SolidityDataset(Dataset):
-    def __init__(self, data, tokenizer: SolidityTokenizer, max_length: int = 512):
+    def __init__(self, data, tokenizer: SolidityTokenizer, max_length: int = 512, cache_dir: str = TOKEN_CACHE_DIR,
+                 stride: int = None, max_windows: int = DEFAULT_MAX_WINDOWS):
         """
         Custom dataset class for Solidity code and vulnerability labels.
         :param data: List of tuples (solidity_code, labels)
         :param tokenizer: Instance of SolidityTokenizer for tokenizing the code.
         :param max_length: Maximum length for tokenized input.
+        :param cache_dir: Directory of the pre-tokenized cache, None to tokenize every sample on access.
+        :param stride: Step in tokens between overlapping windows of a contract, None to truncate contracts to max_length.
+        :param max_windows: Maximum number of windows per contract in windowed mode.
         """
         self.data = data
         self.tokenizer = tokenizer
         self.max_length = max_length
+        self.stride = stride
+        self.max_windows = max_windows
+        # Tokenize the whole dataset once; samples are then read from memory-mapped arrays
+        self.token_cache = None
+        if cache_dir:
+            self.token_cache = build_token_cache(data, tokenizer, max_length, cache_dir, stride=stride, max_windows=max_windows)
     
     def __len__(self):
         return len(self.data)
@@ -22,8 +36,18 @@ class SolidityDataset(Dataset):
     def __getitem__(self, idx):
         solidity_code, labels = self.data[idx]
         
-        # Tokenize the Solidity code correctly
-        tokens = self.tokenizer.tokenize_code(solidity_code, max_length=self.max_length)
+        if self.token_cache is not None:
+            # Same tensors as tokenize_code: ids padded to max_length and the matching attention mask, one row per window
+            input_ids, lengths = self.token_cache.windows(idx)
+            input_ids = torch.from_numpy(input_ids.astype("int64"))
+            attention_mask = (torch.arange(self.max_length) < torch.from_numpy(lengths.astype("int64")).unsqueeze(1)).long()
+            tokens = {"input_ids": input_ids, "attention_mask": attention_mask}
+        elif self.stride:
+            tokens = self.tokenizer.tokenize_code_windows(solidity_code, max_length=self.max_length, stride=self.stride,
+                                                          max_windows=self.max_windows)
+        else:
+            # Tokenize the Solidity code correctly
+            tokens = self.tokenizer.tokenize_code(solidity_code, max_length=self.max_length)
         
         # Convert labels (True/False) into integers (1/0) for model training
         label_tensor = torch.tensor([
@@ -35,7 +59,89 @@ class SolidityDataset(Dataset):
         
         return tokens, label_tensor
 
-def create_data_loader(data, tokenizer: SolidityTokenizer, batch_size: int = 16, max_length: int = 512, num_workers: int = 0):
+    def lengths(self):
+        """
+        Returns the number of real tokens of every sample, special tokens included, summed over its windows.
+        :return: List of ints, one per sample.
+        """
+        if self.token_cache is not None:
+            return self.token_cache.contract_lengths().tolist()
+        if self.stride:
+            windows = self.tokenizer.tokenize_windows([code for code, _ in self.data], max_length=self.max_length,
+                                                      stride=self.stride, max_windows=self.max_windows)
+            return [sum(len(ids) for ids in contract_windows) for contract_windows in windows]
+        return [len(ids) for ids in self.tokenizer.tokenize_batch([code for code, _ in self.data], max_length=self.max_length)]
+
+def dynamic_padding_collate(batch, trim: bool = True):
+    """
+    Collates (tokens, labels) samples into one batch padded only to its longest sequence.
+    Samples are padded on the right, so the columns past the longest attention mask are
+    padding in every row and are cut off. The windows of all contracts are packed into the
+    same batch; when a contract has several, a "contract_index" tensor maps each window to
+    its contract so the logits can be pooled back (see windowing.pool_window_logits).
+    :param batch: List of (tokens, label_tensor) from SolidityDataset.
+    :param trim: Cut the padding columns (default True); False keeps every window at max_length.
+    :return: Tuple of ({"input_ids", "attention_mask"} tensors of shape (windows, longest), labels).
+    """
+    input_ids = torch.cat([tokens["input_ids"] for tokens, _ in batch])
+    attention_mask = torch.cat([tokens["attention_mask"] for tokens, _ in batch])
+    if trim:
+        longest = int(attention_mask.sum(dim=1).max())
+        input_ids, attention_mask = input_ids[:, :longest], attention_mask[:, :longest]
+    labels = torch.stack([label_tensor for _, label_tensor in batch])
+    tokens = {"input_ids": input_ids, "attention_mask": attention_mask}
+    if len(input_ids) != len(batch):
+        window_counts = torch.tensor([len(sample_tokens["input_ids"]) for sample_tokens, _ in batch])
+        tokens["contract_index"] = torch.repeat_interleave(torch.arange(len(batch)), window_counts)
+    return tokens, labels
+
+class LengthBucketBatchSampler(Sampler):
+    def __init__(self, lengths, batch_size: int = 16, bucket_batches: int = 50, shuffle: bool = True, seed: int = 42):
+        """
+        Batch sampler that groups samples of similar length, so dynamic padding adds few pad tokens.
+        Each epoch shuffles the samples, sorts them by length within buckets of
+        bucket_batches * batch_size samples, cuts the buckets into batches and shuffles the
+        batches, so every epoch still sees different batches in a different order.
+        :param lengths: Number of tokens of every sample.
+        :param batch_size: Number of samples per batch.
+        :param bucket_batches: Number of batches per bucket; larger buckets pad less but mix less.
+        :param shuffle: Shuffle samples and batches (default True); False yields batches sorted by length.
+        :param seed: Seed of the shuffling, advanced every epoch.
+        """
+        self.lengths = list(lengths)
+        self.batch_size = batch_size
+        self.bucket_size = batch_size * bucket_batches
+        self.shuffle = shuffle
+        self.seed = seed
+        self.epoch = 0
+
+    def __len__(self):
+        return math.ceil(len(self.lengths) / self.batch_size)
+
+    def __iter__(self):
+        generator = torch.Generator()
+        generator.manual_seed(self.seed + self.epoch)
+        self.epoch += 1
+
+        if self.shuffle:
+            indices = torch.randperm(len(self.lengths), generator=generator).tolist()
+            bucket_size = self.bucket_size
+        else:
+            indices = list(range(len(self.lengths)))
+            bucket_size = max(len(indices), 1)
+
+        batches = []
+        for start in range(0, len(indices), bucket_size):
+            bucket = sorted(indices[start:start + bucket_size], key=lambda idx: self.lengths[idx])
+            batches.extend(bucket[i:i + self.batch_size] for i in range(0, len(bucket), self.batch_size))
+
+        if self.shuffle:
+            batches = [batches[i] for i in torch.randperm(len(batches), generator=generator).tolist()]
+        return iter(batches)
+
+def create_data_loader(data, tokenizer: SolidityTokenizer, batch_size: int = 16, max_length: int = 512, num_workers: int = 0,
+                       cache_dir: str = TOKEN_CACHE_DIR, dynamic_padding: bool = True, shuffle: bool = True,
+                       stride: int = None, max_windows: int = DEFAULT_MAX_WINDOWS):
     """
     Creates a PyTorch DataLoader for batching the Solidity data.
     :param data: The list of tuples (solidity_code, labels).
@@ -43,7 +149,21 @@ def create_data_loader(data, tokenizer: SolidityTokenizer, batch_size: int = 16,
     :param batch_size: Size of each batch for training (default 16).
     :param max_length: Maximum length for tokenized input.
     :param num_workers: Number of workers for data loading (default 0 for CPU-only training).
+    :param cache_dir: Directory of the pre-tokenized cache, None to tokenize every sample on access.
+    :param dynamic_padding: Pad each batch to its longest sequence and batch similar lengths together (default True);
+                            False pads every sample to max_length.
+    :param shuffle: Shuffle the samples every epoch (default True).
+    :param stride: Step in tokens between overlapping windows of a contract, None to truncate contracts to max_length.
+    :param max_windows: Maximum number of windows per contract in windowed mode.
     :return: DataLoader object for PyTorch.
     """
-    dataset = SolidityDataset(data, tokenizer, max_length=max_length)
-    return DataLoader(dataset, batch_size=batch_size, shuffle=True, num_workers=num_workers)
+    dataset = SolidityDataset(data, tokenizer, max_length=max_length, cache_dir=cache_dir, stride=stride,
+                              max_windows=max_windows)
+    if dynamic_padding:
+        batch_sampler = LengthBucketBatchSampler(dataset.lengths(), batch_size=batch_size, shuffle=shuffle)
+        return DataLoader(dataset, batch_sampler=batch_sampler, collate_fn=dynamic_padding_collate, num_workers=num_workers)
+    if stride:
+        # Contracts have different numbers of windows, which the default collate cannot stack
+        return DataLoader(dataset, batch_size=batch_size, shuffle=shuffle, num_workers=num_workers,
+                          collate_fn=partial(dynamic_padding_collate, trim=False))
+    return DataLoader(dataset, batch_size=batch_size, shuffle=shuffle, num_workers=num_workers)
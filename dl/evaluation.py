@@ -1,16 +1,20 @@
 # evaluation.py
 
+import time
 import torch
+from rich.progress import Progress
 from metrics import calculate_metrics
+from windowing import pool_window_logits
 import logging
 
 logging.getLogger(__name__)
 
-def evaluate_model(model, data_loader):
+def evaluate_model(model, data_loader, pooling: str = "max"):
     """
     Evaluates the Code-BERT model on the validation set.
     :param model: The trained Code-BERT model.
     :param data_loader: DataLoader for the validation set.
+    :param pooling: How the logits of a contract's windows are combined, "max" or "mean" (windowed batches only).
     :return: None
     """
     try:
@@ -21,18 +25,23 @@ def evaluate_model(model, data_loader):
         model.eval()  # Set model to evaluation mode
         all_labels = []
         all_predictions = []
+        start = time.perf_counter()
 
         with torch.no_grad():  # Disable gradient calculation for evaluation
             with Progress() as progress:
                 eval_task = progress.add_task("Evaluating...", total=len(data_loader))
 
                 for batch_idx, (tokens, labels) in enumerate(data_loader):
-                    tokens = {k: v.to(device) for k, v in tokens.items()}
+                    # Remove the extra dimension of inputs padded to max_length; dynamically padded batches have none
+                    contract_index = tokens.pop("contract_index", None)
+                    tokens = {k: v.squeeze(1).to(device) for k, v in tokens.items()}
                     labels = labels.to(device)
 
-                    # Forward pass
+                    # Forward pass over the windows of every contract in the batch
                     outputs = model(**tokens)
                     logits = outputs.logits
+                    if contract_index is not None:
+                        logits = pool_window_logits(logits, contract_index, labels.size(0), pooling)
 
                     # Apply sigmoid to logits to get predictions between 0 and 1
                     predictions = torch.sigmoid(logits)
@@ -48,6 +57,8 @@ def evaluate_model(model, data_loader):
         # Stack all the batch predictions and labels
         all_labels = torch.cat(all_labels, dim=0)
         all_predictions = torch.cat(all_predictions, dim=0)
+        elapsed = time.perf_counter() - start
+        logging.info(f"Evaluation throughput: {len(all_labels) / elapsed:.1f} samples/s")
 
         # Calculate evaluation metrics
         calculate_metrics(all_labels, all_predictions)
@@ -2,36 +2,57 @@
 
 import torch
 from tokenizer import SolidityTokenizer
+from model import VulnerabilityDetectionModel
 from model_saving import load_model_checkpoint
+from windowing import DEFAULT_MAX_WINDOWS, pool_window_logits
 import logging
 
 # Configure logging with Rich for better readability
 logging.getLogger(__name__)
 
-def run_inference(model_checkpoint, solidity_file, threshold=0.5):
+def load_inference_model(model_checkpoint, model_name: str = "microsoft/codebert-base"):
+    """
+    Builds the model and tokenizer and loads the trained weights, once per process.
+    :param model_checkpoint: Path to the saved model checkpoint, None to keep the weights of model_name as they are.
+    :param model_name: Pretrained Code-BERT model the checkpoint was trained from.
+    :return: Tuple of (model in evaluation mode, SolidityTokenizer).
+    """
+    model_instance = VulnerabilityDetectionModel(model_name)
+    model = model_instance.get_model()
+    if model_checkpoint:
+        logging.info(f"Loading model from checkpoint: {model_checkpoint}")
+        _, model, _ = load_model_checkpoint(model_checkpoint, model)
+
+    # Set the model to evaluation mode
+    model.eval()
+    return model, SolidityTokenizer(model_name)
+
+def run_inference(model_checkpoint, solidity_file, threshold=0.5, stride=None, max_windows=DEFAULT_MAX_WINDOWS, pooling="max",
+                  model_name="microsoft/codebert-base"):
     """
     Runs inference on a new Solidity file to predict vulnerabilities.
     :param model_checkpoint: Path to the saved model checkpoint.
     :param solidity_file: Path to the Solidity file to analyze.
     :param threshold: Threshold to classify probabilities into binary predictions (default 0.5).
+    :param stride: Step in tokens between overlapping windows of the contract, None to truncate it to 512 tokens.
+    :param max_windows: Maximum number of windows in windowed mode.
+    :param pooling: How the logits of the windows are combined, "max" or "mean".
+    :param model_name: Pretrained Code-BERT model the checkpoint was trained from.
     :return: Dictionary containing predictions for each vulnerability type.
     """
     try:
         # Step 1: Load the trained model from checkpoint
-        logging.info(f"Loading model from checkpoint: {model_checkpoint}")
-        model_instance = VulnerabilityDetectionModel()
-        model = model_instance.get_model()
-        _, model, _ = load_model_checkpoint(model_checkpoint, model)
-
-        # Set the model to evaluation mode
-        model.eval()
+        model, tokenizer = load_inference_model(model_checkpoint, model_name)
 
         # Step 2: Tokenize the new Solidity code
-        tokenizer = SolidityTokenizer()
         with open(solidity_file, 'r') as f:
             solidity_code = f.read()
         
-        tokens = tokenizer.tokenize_code(solidity_code)
+        if stride:
+            # All windows of the contract go through the model as one batch
+            tokens = tokenizer.tokenize_code_windows(solidity_code, stride=stride, max_windows=max_windows)
+        else:
+            tokens = tokenizer.tokenize_code(solidity_code)
 
         # Step 3: Run inference
         logging.info("Running inference on the Solidity file...")
@@ -39,6 +60,8 @@ def run_inference(model_checkpoint, solidity_file, threshold=0.5):
             # Model expects inputs to be on CPU
             outputs = model(**tokens)
             logits = outputs.logits
+            if stride:
+                logits = pool_window_logits(logits, torch.zeros(len(logits), dtype=torch.long), 1, pooling)
 
             # Apply sigmoid to convert logits to probabilities
             probabilities = torch.sigmoid(logits)
@@ -0,0 +1,64 @@
+# inference_client.py
+
+import sys
+import json
+import argparse
+import urllib.error
+import urllib.request
+
+# Default address of inference_server.py, repeated here so the client runs without torch
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+DEFAULT_URL = f"http://{DEFAULT_HOST}:{DEFAULT_PORT}"
+
+def request_json(url: str, body=None, timeout: float = 60.0):
+    """
+    Sends a GET request, or a POST request with a JSON body, and decodes the JSON response.
+    :param url: Full URL of the endpoint.
+    :param body: JSON-serializable body, None for a GET request.
+    :param timeout: Seconds to wait for the response.
+    :return: The decoded response.
+    """
+    data = json.dumps(body).encode("utf-8") if body is not None else None
+    request = urllib.request.Request(url, data=data, headers={"Content-Type": "application/json"})
+    with urllib.request.urlopen(request, timeout=timeout) as response:
+        return json.load(response)
+
+def predict_files(solidity_files, url: str = DEFAULT_URL, timeout: float = 60.0):
+    """
+    Scores Solidity files with a running inference server, in a single request.
+    :param solidity_files: Paths of the files.
+    :param url: Base URL of the server.
+    :param timeout: Seconds to wait for the response.
+    :return: Dictionary {path: {"predictions", "probabilities"}}.
+    """
+    sources = []
+    for solidity_file in solidity_files:
+        with open(solidity_file, 'r', errors='replace') as f:
+            sources.append(f.read())
+    results = request_json(f"{url}/predict", {"sources": sources}, timeout)["results"]
+    return dict(zip(solidity_files, results))
+
+# Example usage: python inference_client.py contracts/Token.sol contracts/Vault.sol --fail_on_positive
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Score Solidity files with a running inference server")
+    parser.add_argument("solidity_files", nargs="*", help="Solidity files to score")
+    parser.add_argument("--url", type=str, default=DEFAULT_URL, help=f"Base URL of the server (default: {DEFAULT_URL})")
+    parser.add_argument("--timeout", type=float, default=60.0, help="Seconds to wait for the server")
+    parser.add_argument("--stats", action="store_true", help="Print the latency and throughput statistics of the server")
+    parser.add_argument("--fail_on_positive", action="store_true", help="Exit with status 1 if any file is predicted vulnerable")
+    args = parser.parse_args()
+
+    try:
+        if args.stats:
+            print(json.dumps(request_json(f"{args.url}/stats", timeout=args.timeout), indent=4))
+        if not args.solidity_files:
+            sys.exit(0)
+        results = predict_files(args.solidity_files, args.url, args.timeout)
+    except (urllib.error.URLError, OSError) as e:
+        print(f"Could not reach the inference server at {args.url}: {e}", file=sys.stderr)
+        sys.exit(2)
+
+    print(json.dumps(results, indent=4))
+    if args.fail_on_positive and any(any(result["predictions"].values()) for result in results.values()):
+        sys.exit(1)
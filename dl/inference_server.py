@@ -0,0 +1,313 @@
+# inference_server.py
+
+import json
+import time
+import queue
+import logging
+import torch
+import argparse
+import threading
+from collections import deque
+from concurrent.futures import Future
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from rich.logging import RichHandler
+from data_loader import LABEL_KEYS
+from inference import load_inference_model
+from batch_inference import predict_windows
+from windowing import DEFAULT_MAX_WINDOWS, POOLING_MODES
+
+# Configure logging with Rich for better readability
+logging.getLogger(__name__)
+
+# Default address of the server, and micro-batching limits: contracts per batch and
+# milliseconds the first request of a batch waits for others to join it
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+DEFAULT_MAX_BATCH_SIZE = 16
+DEFAULT_MAX_WAIT_MS = 10.0
+
+# Number of recent contracts the latency percentiles are computed over
+LATENCY_SAMPLES = 1000
+
+# Largest request body accepted, in bytes
+MAX_REQUEST_BYTES = 32 * 1024 * 1024
+
+def percentiles(samples, points=(50, 95, 99)):
+    """
+    Computes percentiles of a list of numbers by nearest rank.
+    :param samples: The numbers.
+    :param points: The percentiles to compute.
+    :return: Dictionary {"p50": value, ...}, values None if there are no samples.
+    """
+    ordered = sorted(samples)
+    if not ordered:
+        return {f"p{point}": None for point in points}
+    return {f"p{point}": round(ordered[min(len(ordered) - 1, int(len(ordered) * point / 100))], 3) for point in points}
+
+class ServerStats:
+    def __init__(self, max_batch_size: int):
+        """
+        Latency and throughput counters of the server, shared by the request threads and the batcher.
+        :param max_batch_size: Largest batch the batcher forms, for the batch size histogram.
+        """
+        self.lock = threading.Lock()
+        self.started = time.time()
+        self.requests = 0
+        self.contracts = 0
+        self.errors = 0
+        self.batches = 0
+        self.forward_seconds = 0.0
+        self.batch_sizes = [0] * (max_batch_size + 1)
+        self.latencies_ms = deque(maxlen=LATENCY_SAMPLES)
+        self.queue_waits_ms = deque(maxlen=LATENCY_SAMPLES)
+
+    def record_request(self, contracts: int, failed: bool = False):
+        with self.lock:
+            self.requests += 1
+            self.contracts += contracts
+            self.errors += failed
+
+    def record_batch(self, size: int, forward_seconds: float, queue_waits_ms, latencies_ms):
+        with self.lock:
+            self.batches += 1
+            self.batch_sizes[size] += 1
+            self.forward_seconds += forward_seconds
+            self.queue_waits_ms.extend(queue_waits_ms)
+            self.latencies_ms.extend(latencies_ms)
+
+    def snapshot(self):
+        """
+        Returns the current statistics.
+        :return: Dictionary of counters, throughput, batch sizes and latency percentiles in milliseconds.
+        """
+        with self.lock:
+            uptime = time.time() - self.started
+            scored = sum(size * count for size, count in enumerate(self.batch_sizes))
+            return {
+                "uptime_s": round(uptime, 1),
+                "requests": self.requests,
+                "contracts": self.contracts,
+                "errors": self.errors,
+                "batches": self.batches,
+                "mean_batch_size": round(scored / self.batches, 2) if self.batches else None,
+                "batch_sizes": {size: count for size, count in enumerate(self.batch_sizes) if count},
+                "throughput_contracts_per_s": round(scored / uptime, 2) if uptime else None,
+                "model_contracts_per_s": round(scored / self.forward_seconds, 2) if self.forward_seconds else None,
+                "latency_ms": percentiles(self.latencies_ms),
+                "queue_wait_ms": percentiles(self.queue_waits_ms),
+            }
+
+class MicroBatcher:
+    def __init__(self, model, tokenizer, max_batch_size: int = DEFAULT_MAX_BATCH_SIZE, max_wait_ms: float = DEFAULT_MAX_WAIT_MS,
+                 threshold: float = 0.5, stride: int = None, max_windows: int = DEFAULT_MAX_WINDOWS, pooling: str = "max"):
+        """
+        Gathers the contracts of concurrent requests into micro-batches scored by a single thread.
+        A batch closes when it holds max_batch_size contracts or its first contract has waited
+        max_wait_ms, so a lone request pays at most max_wait_ms of extra latency and a burst
+        of requests shares forward passes.
+        :param model: The model in evaluation mode.
+        :param tokenizer: Instance of SolidityTokenizer.
+        :param max_batch_size: Maximum number of contracts per batch.
+        :param max_wait_ms: Maximum time the first contract of a batch waits for others, in milliseconds.
+        :param threshold: Threshold to classify probabilities into binary predictions (default 0.5).
+        :param stride: Step in tokens between overlapping windows of a contract, None to truncate contracts to 512 tokens.
+        :param max_windows: Maximum number of windows per contract in windowed mode.
+        :param pooling: How the logits of a contract's windows are combined, "max" or "mean".
+        """
+        self.model = model
+        self.tokenizer = tokenizer
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.threshold = threshold
+        self.stride = stride
+        self.max_windows = max_windows
+        self.pooling = pooling
+        self.stats = ServerStats(max_batch_size)
+        self.pending = queue.Queue()
+        self.thread = threading.Thread(target=self.run, name="micro-batcher", daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        """Scores the contracts already queued, then stops the batching thread."""
+        self.pending.put(None)
+        self.thread.join()
+
+    def submit(self, sources):
+        """
+        Queues contracts for scoring.
+        :param sources: List of Solidity source strings.
+        :return: List of Futures, each resolving to {"predictions", "probabilities"} for one contract.
+        """
+        futures = []
+        for source in sources:
+            future = Future()
+            self.pending.put((source, future, time.perf_counter()))
+            futures.append(future)
+        return futures
+
+    def run(self):
+        stopping = False
+        while not stopping:
+            item = self.pending.get()
+            if item is None:
+                break
+            batch = [item]
+            deadline = time.perf_counter() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                try:
+                    item = self.pending.get(timeout=max(deadline - time.perf_counter(), 0))
+                except queue.Empty:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+            self.score(batch)
+
+    def score(self, batch):
+        """Scores one micro-batch and resolves its Futures."""
+        started = time.perf_counter()
+        sources = [source for source, _, _ in batch]
+        try:
+            if self.stride:
+                contract_windows = self.tokenizer.tokenize_windows(sources, stride=self.stride, max_windows=self.max_windows)
+            else:
+                contract_windows = [[ids] for ids in self.tokenizer.tokenize_batch(sources)]
+            # One forward pass per micro-batch
+            rows = sum(len(windows) for windows in contract_windows)
+            probabilities = predict_windows(self.model, self.tokenizer, contract_windows, batch_size=rows, pooling=self.pooling)
+        except Exception as e:
+            logging.error(f"Error scoring a batch of {len(batch)} contracts: {e}")
+            for _, future, _ in batch:
+                future.set_exception(e)
+            return
+
+        finished = time.perf_counter()
+        for (_, future, enqueued), contract_probabilities in zip(batch, probabilities.tolist()):
+            future.set_result({
+                "predictions": {key: p > self.threshold for key, p in zip(LABEL_KEYS, contract_probabilities)},
+                "probabilities": {key: round(p, 6) for key, p in zip(LABEL_KEYS, contract_probabilities)},
+            })
+        self.stats.record_batch(
+            len(batch),
+            finished - started,
+            [(started - enqueued) * 1000 for _, _, enqueued in batch],
+            [(finished - enqueued) * 1000 for _, _, enqueued in batch],
+        )
+
+class InferenceRequestHandler(BaseHTTPRequestHandler):
+    """
+    HTTP endpoints of the server:
+    POST /predict with {"source": "..."} or {"sources": ["...", ...]} returns {"results": [...]},
+    GET /stats returns ServerStats.snapshot(), GET /health returns {"status": "ok"}.
+    """
+    batcher = None
+
+    def send_json(self, status, body):
+        payload = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_GET(self):
+        if self.path == "/stats":
+            self.send_json(200, self.batcher.stats.snapshot())
+        elif self.path == "/health":
+            self.send_json(200, {"status": "ok"})
+        else:
+            self.send_json(404, {"error": f"Unknown endpoint {self.path}"})
+
+    def do_POST(self):
+        if self.path != "/predict":
+            self.send_json(404, {"error": f"Unknown endpoint {self.path}"})
+            return
+
+        if "Content-Length" not in self.headers:
+            self.send_json(411, {"error": "Content-Length required"})
+            return
+        try:
+            length = int(self.headers["Content-Length"])
+            if length < 0:
+                raise ValueError(length)
+        except ValueError:
+            self.send_json(400, {"error": f"Invalid Content-Length {self.headers['Content-Length']}"})
+            return
+        if length > MAX_REQUEST_BYTES:
+            self.send_json(413, {"error": f"Request larger than {MAX_REQUEST_BYTES} bytes"})
+            return
+        try:
+            body = json.loads(self.rfile.read(length))
+            if not isinstance(body, dict):
+                raise TypeError("body must be a JSON object")
+            # A string is iterable too: without this check each of its characters would be scored
+            sources = body["sources"] if "sources" in body else [body["source"]]
+            if not isinstance(sources, list):
+                raise TypeError("sources must be a list")
+            if not all(isinstance(source, str) for source in sources):
+                raise ValueError("sources must be strings")
+        except (ValueError, KeyError, TypeError) as e:
+            self.send_json(400, {"error": f"Expected {{\"source\": str}} or {{\"sources\": [str]}}: {e}"})
+            return
+
+        try:
+            results = [future.result() for future in self.batcher.submit(sources)]
+        except Exception as e:
+            self.batcher.stats.record_request(len(sources), failed=True)
+            self.send_json(500, {"error": str(e)})
+            return
+        self.batcher.stats.record_request(len(sources))
+        self.send_json(200, {"results": results})
+
+    def log_message(self, format, *args):
+        # Per-request access lines only in debug mode
+        logging.debug(format % args)
+
+def serve(batcher: MicroBatcher, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT):
+    """
+    Serves predictions over HTTP until interrupted.
+    :param batcher: The MicroBatcher that scores the contracts.
+    :param host: Address to listen on (default: localhost only).
+    :param port: Port to listen on.
+    """
+    handler = type("BoundInferenceRequestHandler", (InferenceRequestHandler,), {"batcher": batcher})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    batcher.start()
+    logging.info(f"Inference server listening on http://{host}:{server.server_address[1]}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        logging.info("Stopping the inference server...")
+    finally:
+        server.server_close()
+        batcher.stop()
+
+# Example usage: python inference_server.py --checkpoint checkpoint_epoch_3.pth --max_batch_size 16 --max_wait_ms 10
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local inference server with dynamic micro-batching")
+    parser.add_argument("--checkpoint", type=str, default=None, help="Path to model checkpoint (default: the weights of --model_name as they are)")
+    parser.add_argument("--model_name", type=str, default="microsoft/codebert-base", help="Pretrained Code-BERT model or local directory")
+    parser.add_argument("--host", type=str, default=DEFAULT_HOST, help=f"Address to listen on (default: {DEFAULT_HOST})")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help=f"Port to listen on (default: {DEFAULT_PORT})")
+    parser.add_argument("--max_batch_size", type=int, default=DEFAULT_MAX_BATCH_SIZE, help="Maximum number of contracts per micro-batch")
+    parser.add_argument("--max_wait_ms", type=float, default=DEFAULT_MAX_WAIT_MS, help="Maximum time a contract waits for others to join its batch")
+    parser.add_argument("--threshold", type=float, default=0.5, help="Threshold to classify probabilities into binary predictions")
+    parser.add_argument("--window_stride", type=int, default=None, help="Split contracts into 512-token windows starting every STRIDE tokens (default: truncate)")
+    parser.add_argument("--max_windows", type=int, default=DEFAULT_MAX_WINDOWS, help="Maximum number of windows per contract")
+    parser.add_argument("--pooling", choices=POOLING_MODES, default="max", help="How the logits of a contract's windows are combined")
+    parser.add_argument("-v", "--verbose", action="store_true", help="Log every request")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.DEBUG if args.verbose else logging.INFO, format="%(message)s",
+                        handlers=[RichHandler(show_time=False, show_level=False, show_path=False)])
+
+    model, tokenizer = load_inference_model(args.checkpoint, args.model_name)
+    model.to(torch.device("cuda") if torch.cuda.is_available() else torch.device("cpu"))
+    batcher = MicroBatcher(model, tokenizer, max_batch_size=args.max_batch_size, max_wait_ms=args.max_wait_ms,
+                           threshold=args.threshold, stride=args.window_stride, max_windows=args.max_windows,
+                           pooling=args.pooling)
+    serve(batcher, args.host, args.port)
@@ -1,14 +1,17 @@
 import logging
 from rich.logging import RichHandler
 from directory_setup import setup_directories, verify_dataset
-from data_loader import load_solidity_and_labels
+from data_loader import load_solidity_and_labels, load_labeled_shards, load_label_index
 from tokenizer import SolidityTokenizer
 from data_preprocessing import create_data_loader
+from token_cache import TOKEN_CACHE_DIR
+from windowing import DEFAULT_MAX_WINDOWS, POOLING_MODES
 from model import VulnerabilityDetectionModel
 from train import train_model
 from evaluation import evaluate_model
 from model_saving import save_model_checkpoint, load_model_checkpoint
 from inference import run_inference
+from batch_inference import PREDICTION_DIR, DEFAULT_INFERENCE_BATCH_SIZE, run_batch_inference
 
 from sklearn.model_selection import train_test_split
 import torch.optim as optim
@@ -34,14 +37,39 @@ def parse_args():
     parser.add_argument("--inference", action="store_true", help="Run inference mode with a trained model")
     parser.add_argument("--checkpoint", type=str, default=None, help="Path to model checkpoint (required for inference)")
     parser.add_argument("--solidity_file", type=str, default=None, help="Path to Solidity file (required for inference)")
+
+    # Add arguments to score a whole directory with one model load instead of a single file
+    parser.add_argument("--solidity_dir", type=str, default=None, help="Directory of Solidity files to score in batches (instead of --solidity_file)")
+    parser.add_argument("--output_dir", type=str, default=PREDICTION_DIR, help="Directory of the per-contract JSON predictions, laid out like json_out")
+    parser.add_argument("--batch_size", type=int, default=DEFAULT_INFERENCE_BATCH_SIZE, help="Number of sequences per forward pass in directory inference")
+    parser.add_argument("--model_name", type=str, default="microsoft/codebert-base", help="Pretrained Code-BERT model the checkpoint was trained from")
     
     # Add arguments for resuming training or running the full training pipeline
     parser.add_argument("--resume_training", action="store_true", help="Resume training from a checkpoint")
     parser.add_argument("--checkpoint_file", type=str, default=None, help="Path to checkpoint file (required for resuming training)")
+
+    # Add an argument to train from the labeler's columnar export instead of the datast/json_out trees
+    parser.add_argument("--shards", type=str, default=None, help="Directory of Parquet/Arrow label shards written by the labeler with --export")
+
+    # Add an argument to train from the labeler's SQLite label index
+    parser.add_argument("--index", type=str, default=None, help="SQLite label index written by the labeler (json_out/label_index.sqlite)")
+
+    # Add an argument to choose where the pre-tokenized dataset is cached
+    parser.add_argument("--token_cache", type=str, default=TOKEN_CACHE_DIR, help="Directory of the pre-tokenized dataset cache ('' to tokenize on the fly)")
+
+    # Add an argument to choose how batches are padded
+    parser.add_argument("--padding", choices=["dynamic", "max_length"], default="dynamic",
+                        help="Pad each length-bucketed batch to its longest contract (dynamic) or every contract to 512 tokens (max_length)")
+
+    # Add arguments to encode long contracts as overlapping windows instead of truncating them
+    parser.add_argument("--window_stride", type=int, default=None, help="Split contracts into 512-token windows starting every STRIDE tokens (default: truncate)")
+    parser.add_argument("--max_windows", type=int, default=DEFAULT_MAX_WINDOWS, help="Maximum number of windows per contract, spread evenly over longer ones")
+    parser.add_argument("--pooling", choices=POOLING_MODES, default="max", help="How the logits of a contract's windows are combined")
     
     return parser.parse_args()
 
-def run_training_pipeline(resume_training=False, checkpoint_file=None):
+def run_training_pipeline(resume_training=False, checkpoint_file=None, shard_dir=None, index_path=None, token_cache_dir=TOKEN_CACHE_DIR,
+                          dynamic_padding=True, stride=None, max_windows=DEFAULT_MAX_WINDOWS, pooling="max"):
     """
     Runs the full training and evaluation pipeline.
     """
@@ -50,17 +78,26 @@ def run_training_pipeline(resume_training=False, checkpoint_file=None):
         SOLIDITY_DIR = 'datast'
         JSON_DIR = 'json_out'
 
-        # Step 1: Setup directories
-        logging.info("Setting up directories...")
-        setup_directories(SOLIDITY_DIR, JSON_DIR)
+        if shard_dir:
+            # Steps 1-3: Load code and labels from the columnar shards, which are complete by construction
+            logging.info(f"Loading Solidity code and labels from shards in {shard_dir}...")
+            solidity_data = load_labeled_shards(shard_dir)
+        elif index_path:
+            # Steps 1-3: Load the indexed contracts, whose labels are complete by construction
+            logging.info(f"Loading Solidity code and labels through the label index {index_path}...")
+            solidity_data = load_label_index(index_path)
+        else:
+            # Step 1: Setup directories
+            logging.info("Setting up directories...")
+            setup_directories(SOLIDITY_DIR, JSON_DIR)
 
-        # Step 2: Verify dataset integrity
-        logging.info("Verifying dataset...")
-        verify_dataset(SOLIDITY_DIR, JSON_DIR)
+            # Step 2: Verify dataset integrity
+            logging.info("Verifying dataset...")
+            verify_dataset(SOLIDITY_DIR, JSON_DIR)
 
-        # Step 3: Load Solidity files and corresponding vulnerability labels
-        logging.info("Loading Solidity files and labels...")
-        solidity_data = load_solidity_and_labels(SOLIDITY_DIR, JSON_DIR)
+            # Step 3: Load Solidity files and corresponding vulnerability labels
+            logging.info("Loading Solidity files and labels...")
+            solidity_data = load_solidity_and_labels(SOLIDITY_DIR, JSON_DIR)
 
         # Step 4: Split the dataset into training and validation sets
         train_data, val_data = train_test_split(solidity_data, test_size=0.2, random_state=42)
@@ -71,8 +108,11 @@ def run_training_pipeline(resume_training=False, checkpoint_file=None):
 
         # Step 6: Create data loaders for training and validation
         logging.info("Creating data loaders...")
-        train_loader = create_data_loader(train_data, tokenizer, batch_size=16)
-        validation_loader = create_data_loader(val_data, tokenizer, batch_size=16)
+        train_loader = create_data_loader(train_data, tokenizer, batch_size=16, cache_dir=token_cache_dir,
+                                          dynamic_padding=dynamic_padding, stride=stride, max_windows=max_windows)
+        validation_loader = create_data_loader(val_data, tokenizer, batch_size=16, cache_dir=token_cache_dir,
+                                               dynamic_padding=dynamic_padding, shuffle=False, stride=stride,
+                                               max_windows=max_windows)
 
         # Step 7: Initialize model
         logging.info("Initializing the vulnerability detection model...")
@@ -91,12 +131,12 @@ def run_training_pipeline(resume_training=False, checkpoint_file=None):
         # Step 10: Train the model
         logging.info(f"Starting training from epoch {epoch}...")
         for e in range(epoch, epoch + 3):  # Train for 3 epochs (or more if needed)
-            train_model(model, train_loader, epochs=1)  # Train for one epoch at a time
+            train_model(model, train_loader, epochs=1, pooling=pooling)  # Train for one epoch at a time
             save_model_checkpoint(model, optimizer, e+1, file_path=f"checkpoint_epoch_{e+1}.pth")
 
         # Step 11: Evaluate the model
         logging.info("Starting evaluation...")
-        evaluate_model(model, validation_loader)
+        evaluate_model(model, validation_loader, pooling=pooling)
 
     except Exception as e:
         logging.error(f"An error occurred during training: {e}")
@@ -110,16 +150,27 @@ def main():
 
     if args.inference:
         # Run inference mode
-        if not args.checkpoint or not args.solidity_file:
-            logging.error("For inference, you must specify both --checkpoint and --solidity_file.")
+        if not args.checkpoint or not (args.solidity_file or args.solidity_dir):
+            logging.error("For inference, you must specify both --checkpoint and --solidity_file (or --solidity_dir).")
             return
         
+        if args.solidity_dir:
+            logging.info(f"Running batch inference on {args.solidity_dir}...")
+            summary = run_batch_inference(args.checkpoint, args.solidity_dir, output_root=args.output_dir,
+                                          batch_size=args.batch_size, stride=args.window_stride,
+                                          max_windows=args.max_windows, pooling=args.pooling, model_name=args.model_name)
+            logging.info(f"Batch inference results: {summary}")
+            return
+
         logging.info("Running inference...")
-        predictions = run_inference(args.checkpoint, args.solidity_file)
+        predictions = run_inference(args.checkpoint, args.solidity_file, stride=args.window_stride,
+                                    max_windows=args.max_windows, pooling=args.pooling, model_name=args.model_name)
         logging.info(f"Inference results: {predictions}")
     else:
         # Run the training pipeline (with optional resuming from checkpoint)
-        run_training_pipeline(resume_training=args.resume_training, checkpoint_file=args.checkpoint_file)
+        run_training_pipeline(resume_training=args.resume_training, checkpoint_file=args.checkpoint_file, shard_dir=args.shards, index_path=args.index, token_cache_dir=args.token_cache,
+                              dynamic_padding=args.padding == "dynamic", stride=args.window_stride,
+                              max_windows=args.max_windows, pooling=args.pooling)
 
 if __name__ == "__main__":
     main()
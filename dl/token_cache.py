@@ -0,0 +1,181 @@
+# token_cache.py
+
+import os
+import json
+import shutil
+import hashlib
+import logging
+import numpy as np
+from rich.progress import Progress
+from tokenizer import SolidityTokenizer
+from windowing import DEFAULT_MAX_WINDOWS
+
+# Configure logging with Rich for better readability
+logging.getLogger(__name__)
+
+# Default directory of the token caches and number of contracts encoded per tokenizer call
+TOKEN_CACHE_DIR = "token_cache"
+TOKENIZE_BATCH_SIZE = 256
+
+# Number of rows copied at a time from the staging file into the final array
+COPY_ROWS = 4096
+
+def token_cache_key(data, tokenizer: SolidityTokenizer, max_length: int = 512, stride: int = None,
+                    max_windows: int = DEFAULT_MAX_WINDOWS):
+    """
+    Computes the key of the token cache of a dataset: the tokenizer/max-length fingerprint,
+    the window settings if any, and a digest of the contract sources, in order.
+    :param data: List of tuples (solidity_code, labels).
+    :param tokenizer: Instance of SolidityTokenizer.
+    :param max_length: Maximum length of tokens per window.
+    :param stride: Step between windows, None for one truncated window per contract.
+    :param max_windows: Maximum number of windows per contract.
+    :return: Key string, used as the name of the cache directory.
+    """
+    digest = hashlib.sha256()
+    for solidity_code, _ in data:
+        digest.update(hashlib.sha256(solidity_code.encode("utf-8", errors="replace")).digest())
+    windows = f"-w{stride}x{max_windows}" if stride else ""
+    return f"{tokenizer.fingerprint(max_length)}{windows}-{digest.hexdigest()[:16]}"
+
+class TokenCache:
+    def __init__(self, cache_path: str):
+        """
+        Read-only view of a token cache, as memory-mapped NumPy arrays: one row of input ids
+        padded to max_length per window, the number of real tokens of each window, and the
+        first window of each contract. Without windows, each contract has a single window.
+        The arrays are only mapped on first access, so the cache can be handed to DataLoader
+        worker processes.
+        :param cache_path: Directory written by build_token_cache.
+        """
+        self.cache_path = cache_path
+        self._input_ids = None
+        self._lengths = None
+        self._window_offsets = None
+
+    @property
+    def input_ids(self):
+        if self._input_ids is None:
+            self._input_ids = np.load(os.path.join(self.cache_path, "input_ids.npy"), mmap_mode="r")
+        return self._input_ids
+
+    @property
+    def lengths(self):
+        if self._lengths is None:
+            self._lengths = np.load(os.path.join(self.cache_path, "lengths.npy"), mmap_mode="r")
+        return self._lengths
+
+    @property
+    def window_offsets(self):
+        if self._window_offsets is None:
+            offsets_file = os.path.join(self.cache_path, "window_offsets.npy")
+            if os.path.exists(offsets_file):
+                self._window_offsets = np.load(offsets_file, mmap_mode="r")
+            else:
+                # Caches written before windowing hold one window per contract
+                self._window_offsets = np.arange(len(self.lengths) + 1)
+        return self._window_offsets
+
+    def __len__(self):
+        return len(self.window_offsets) - 1
+
+    def windows(self, idx: int):
+        """
+        Returns the rows of a contract's windows.
+        :param idx: Index of the contract in the dataset.
+        :return: Tuple of (input ids of shape (windows, max_length), lengths of shape (windows,)).
+        """
+        start, end = int(self.window_offsets[idx]), int(self.window_offsets[idx + 1])
+        return self.input_ids[start:end], self.lengths[start:end]
+
+    def contract_lengths(self):
+        """
+        Returns the number of real tokens of each contract, summed over its windows.
+        :return: NumPy array with one entry per contract.
+        """
+        return np.add.reduceat(self.lengths, self.window_offsets[:-1]) if len(self) else np.zeros(0, dtype=np.int64)
+
+    def __getstate__(self):
+        # Worker processes map the files again instead of receiving a copy of the arrays
+        return {"cache_path": self.cache_path, "_input_ids": None, "_lengths": None, "_window_offsets": None}
+
+def build_token_cache(data, tokenizer: SolidityTokenizer, max_length: int = 512, cache_dir: str = TOKEN_CACHE_DIR,
+                      batch_size: int = TOKENIZE_BATCH_SIZE, stride: int = None, max_windows: int = DEFAULT_MAX_WINDOWS):
+    """
+    Tokenizes a dataset once with the fast tokenizer in batch mode and stores the result as
+    memory-mapped arrays, or reuses the cache of an earlier run with the same key.
+    :param data: List of tuples (solidity_code, labels).
+    :param tokenizer: Instance of SolidityTokenizer.
+    :param max_length: Maximum length of tokens per window.
+    :param cache_dir: Directory holding one subdirectory per cache key.
+    :param batch_size: Number of contracts encoded per tokenizer call.
+    :param stride: Step between windows, None for one truncated window per contract.
+    :param max_windows: Maximum number of windows per contract.
+    :return: TokenCache of the dataset.
+    """
+    cache_path = os.path.join(cache_dir, token_cache_key(data, tokenizer, max_length, stride, max_windows))
+    if os.path.exists(os.path.join(cache_path, "meta.json")):
+        logging.info(f"Using the token cache in {cache_path}")
+        return TokenCache(cache_path)
+
+    # Build in a temporary directory and rename it, so an interrupted build is never reused
+    temp_path = f"{cache_path}.tmp-{os.getpid()}"
+    shutil.rmtree(temp_path, ignore_errors=True)
+    os.makedirs(temp_path)
+
+    # Code-BERT's vocabulary fits in 16 bits, which halves the size of the cache
+    dtype = np.uint16 if len(tokenizer.tokenizer) <= np.iinfo(np.uint16).max + 1 else np.int32
+    lengths = []
+    window_counts = []
+
+    # The number of windows is only known once every contract is tokenized, so the padded
+    # rows are appended to a staging file first and then copied into the final array
+    staging_path = os.path.join(temp_path, "input_ids.staging")
+    with open(staging_path, "wb") as staging, Progress() as progress:
+        tokenize_task = progress.add_task("Tokenizing contracts...", total=len(data))
+
+        for start in range(0, len(data), batch_size):
+            codes = [solidity_code for solidity_code, _ in data[start:start + batch_size]]
+            if stride:
+                contracts = tokenizer.tokenize_windows(codes, max_length=max_length, stride=stride, max_windows=max_windows)
+            else:
+                contracts = [[ids] for ids in tokenizer.tokenize_batch(codes, max_length=max_length)]
+
+            rows = [ids for windows in contracts for ids in windows]
+            block = np.full((len(rows), max_length), tokenizer.tokenizer.pad_token_id, dtype=dtype)
+            for row, ids in enumerate(rows):
+                block[row, :len(ids)] = ids
+            staging.write(block.tobytes())
+            lengths.extend(len(ids) for ids in rows)
+            window_counts.extend(len(windows) for windows in contracts)
+            progress.update(tokenize_task, advance=len(codes))
+
+    total_windows = len(lengths)
+    input_ids = np.lib.format.open_memmap(os.path.join(temp_path, "input_ids.npy"), mode="w+", dtype=dtype,
+                                          shape=(total_windows, max_length))
+    if total_windows:
+        staged = np.memmap(staging_path, dtype=dtype, mode="r", shape=(total_windows, max_length))
+        for start in range(0, total_windows, COPY_ROWS):
+            input_ids[start:start + COPY_ROWS] = staged[start:start + COPY_ROWS]
+        del staged
+    input_ids.flush()
+    del input_ids
+    os.remove(staging_path)
+
+    np.save(os.path.join(temp_path, "lengths.npy"), np.array(lengths, dtype=np.int32))
+    np.save(os.path.join(temp_path, "window_offsets.npy"), np.concatenate([[0], np.cumsum(window_counts)]).astype(np.int64))
+    with open(os.path.join(temp_path, "meta.json"), "w") as f:
+        json.dump({"model_name": tokenizer.model_name, "max_length": max_length, "stride": stride,
+                   "max_windows": max_windows if stride else 1, "contracts": len(data), "windows": total_windows}, f)
+
+    try:
+        os.replace(temp_path, cache_path)
+    except OSError:
+        # Another run built the same cache in the meantime
+        shutil.rmtree(temp_path, ignore_errors=True)
+    logging.info(f"Tokenized {len(data)} contracts into {total_windows} windows in {cache_path}")
+    return TokenCache(cache_path)
+
+# Example usage in main.py
+# from token_cache import build_token_cache
+# token_cache = build_token_cache(train_data, tokenizer, max_length=512)
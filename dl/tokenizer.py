@@ -1,14 +1,20 @@
 # tokenizer.py
 
-from transformers import RobertaTokenizer
+import json
+import hashlib
+from transformers import RobertaTokenizerFast
+from windowing import DEFAULT_WINDOW_STRIDE, DEFAULT_MAX_WINDOWS, select_windows
 
 class SolidityTokenizer:
     def __init__(self, model_name: str = "microsoft/codebert-base"):
         """
         Initializes the Code-BERT tokenizer.
+        Uses the Rust-backed fast tokenizer, which produces the same tokens as RobertaTokenizer
+        and can encode many contracts per call.
         :param model_name: The pretrained Code-BERT model to use.
         """
-        self.tokenizer = RobertaTokenizer.from_pretrained(model_name)
+        self.model_name = model_name
+        self.tokenizer = RobertaTokenizerFast.from_pretrained(model_name)
 
     def tokenize_code(self, code: str, max_length: int = 512):
         """
@@ -24,3 +30,69 @@ class SolidityTokenizer:
             max_length=max_length, 
             return_tensors="pt"  # returns PyTorch tensors
         )
+
+    def tokenize_code_windows(self, code: str, max_length: int = 512, stride: int = DEFAULT_WINDOW_STRIDE,
+                              max_windows: int = DEFAULT_MAX_WINDOWS):
+        """
+        Tokenizes a piece of Solidity code into overlapping windows, see tokenize_windows.
+        :param code: Solidity code to tokenize.
+        :param max_length: Maximum length of tokens per window.
+        :param stride: Number of tokens between the starts of two consecutive windows.
+        :param max_windows: Maximum number of windows.
+        :return: Tokenized windows in tensor format (PyTorch), padded to max_length, one row per window.
+        """
+        windows = self.tokenize_windows([code], max_length=max_length, stride=stride, max_windows=max_windows)[0]
+        return self.tokenizer.pad({"input_ids": windows}, padding="max_length", max_length=max_length, return_tensors="pt")
+
+    def tokenize_batch(self, codes, max_length: int = 512):
+        """
+        Tokenizes a batch of Solidity contracts in one call, without padding.
+        :param codes: List of Solidity source strings.
+        :param max_length: Maximum length of tokens per contract, special tokens included.
+        :return: List of token id lists, one per contract.
+        """
+        return self.tokenizer(list(codes), truncation=True, max_length=max_length)["input_ids"]
+
+    def tokenize_windows(self, codes, max_length: int = 512, stride: int = DEFAULT_WINDOW_STRIDE,
+                         max_windows: int = DEFAULT_MAX_WINDOWS):
+        """
+        Tokenizes a batch of Solidity contracts into overlapping windows of at most max_length
+        tokens, without padding, so code past the first max_length tokens is not dropped.
+        :param codes: List of Solidity source strings.
+        :param max_length: Maximum length of tokens per window, special tokens included.
+        :param stride: Number of tokens between the starts of two consecutive windows.
+        :param max_windows: Maximum number of windows per contract, spread evenly over longer contracts.
+        :return: List with, for each contract, its list of window token id lists.
+        """
+        content_length = max_length - self.tokenizer.num_special_tokens_to_add()
+        if not 0 < stride <= content_length:
+            raise ValueError(f"stride must be between 1 and {content_length}, got {stride}")
+
+        # The fast tokenizer takes the overlap between windows rather than the step
+        encoding = self.tokenizer(
+            list(codes),
+            truncation=True,
+            max_length=max_length,
+            stride=content_length - stride,
+            return_overflowing_tokens=True,
+        )
+        windows = [[] for _ in codes]
+        for ids, contract in zip(encoding["input_ids"], encoding["overflow_to_sample_mapping"]):
+            windows[contract].append(ids)
+        return [[contract_windows[i] for i in select_windows(len(contract_windows), max_windows)]
+                for contract_windows in windows]
+
+    def fingerprint(self, max_length: int = 512):
+        """
+        Returns a short digest of everything that decides the token ids: the vocabulary,
+        merges, normalization and special tokens of the tokenizer, and max_length.
+        :param max_length: Maximum length of tokens per contract.
+        :return: Hex digest string.
+        """
+        # Truncation and padding settings are left out: encoding calls change them in place
+        state = json.loads(self.tokenizer.backend_tokenizer.to_str())
+        state.pop("truncation", None)
+        state.pop("padding", None)
+        digest = hashlib.sha256(json.dumps(state, sort_keys=True).encode("utf-8"))
+        digest.update(f"max_length={max_length}".encode("utf-8"))
+        return digest.hexdigest()[:16]
@@ -1,21 +1,24 @@
 # train.py
 
+import time
 import torch
 from torch.optim import AdamW
 from transformers import get_scheduler
 from rich.progress import Progress
+from windowing import pool_window_logits
 import logging
 
 # Configure logging with Rich for better readability
 logging.getLogger(__name__)
 
-def train_model(model, data_loader, epochs: int = 3, learning_rate: float = 5e-5):
+def train_model(model, data_loader, epochs: int = 3, learning_rate: float = 5e-5, pooling: str = "max"):
     """
     Trains the Code-BERT model on the tokenized Solidity dataset.
     :param model: The initialized Code-BERT model.
     :param data_loader: DataLoader for batching the tokenized dataset.
     :param epochs: Number of training epochs (default: 3).
     :param learning_rate: Learning rate for AdamW optimizer (default: 5e-5).
+    :param pooling: How the logits of a contract's windows are combined, "max" or "mean" (windowed batches only).
     """
     try:
         # Set up the optimizer and learning rate scheduler
@@ -42,6 +45,10 @@ def train_model(model, data_loader, epochs: int = 3, learning_rate: float = 5e-5
 
                 model.train()
                 total_loss = 0
+                samples = 0
+                real_tokens = 0
+                padded_tokens = 0
+                epoch_start = time.perf_counter()
                 
                 for batch_idx, (tokens, labels) in enumerate(data_loader):
                     # Log the structure of the first batch before squeezing for debugging purposes
@@ -50,6 +57,7 @@ def train_model(model, data_loader, epochs: int = 3, learning_rate: float = 5e-5
                         logging.info(f"🏷️ Labels: {labels}")
 
                     # Remove extra dimensions from tokenized inputs
+                    contract_index = tokens.pop("contract_index", None)
                     tokens = {k: v.squeeze(1).to(device) for k, v in tokens.items()}
                     labels = labels.to(device)
 
@@ -61,6 +69,10 @@ def train_model(model, data_loader, epochs: int = 3, learning_rate: float = 5e-5
                     outputs = model(**tokens)
                     logits = outputs.logits
 
+                    # Pool the logits of each contract's windows into one row per contract
+                    if contract_index is not None:
+                        logits = pool_window_logits(logits, contract_index, labels.size(0), pooling)
+
                     # Compute loss
                     loss = criterion(logits, labels.float())
                     total_loss += loss.item()
@@ -71,11 +83,21 @@ def train_model(model, data_loader, epochs: int = 3, learning_rate: float = 5e-5
                     optimizer.step()
                     lr_scheduler.step()
 
+                    # Count the tokens the model attended to against the padded input it was given
+                    samples += labels.size(0)
+                    real_tokens += int(tokens["attention_mask"].sum())
+                    padded_tokens += tokens["attention_mask"].numel()
+
                     # Update progress
                     progress.update(epoch_task, advance=1)
 
                 avg_loss = total_loss / len(data_loader)
+                elapsed = time.perf_counter() - epoch_start
                 logging.info(f"Epoch {epoch + 1} complete. Avg loss: {avg_loss:.4f}")
+                logging.info(
+                    f"Throughput: {samples / elapsed:.1f} samples/s, {real_tokens / elapsed:.0f} tokens/s, "
+                    f"{1 - real_tokens / max(padded_tokens, 1):.1%} of the input was padding."
+                )
 
         logging.info("✅ Training complete.")
     except Exception as e:
@@ -0,0 +1,39 @@
+# windowing.py
+
+# Default step between the starts of two windows, in tokens, and maximum number of windows per contract
+DEFAULT_WINDOW_STRIDE = 256
+DEFAULT_MAX_WINDOWS = 8
+
+# Ways of combining the logits of a contract's windows into the logits of the contract
+POOLING_MODES = ("max", "mean")
+
+def select_windows(num_windows: int, max_windows: int):
+    """
+    Picks which windows of a contract to keep when it has more than max_windows.
+    The kept windows are spread evenly from the first to the last, so the whole contract
+    stays covered at a predictable cost.
+    :param num_windows: Number of windows of the contract.
+    :param max_windows: Maximum number of windows to keep.
+    :return: Sorted list of window indices.
+    """
+    if num_windows <= max_windows:
+        return list(range(num_windows))
+    if max_windows == 1:
+        return [0]
+    return sorted({round(i * (num_windows - 1) / (max_windows - 1)) for i in range(max_windows)})
+
+def pool_window_logits(logits, contract_index, num_contracts: int, pooling: str = "max"):
+    """
+    Pools the logits of the windows in a batch back into one row per contract.
+    :param logits: Tensor of shape (windows, labels).
+    :param contract_index: Tensor of shape (windows,) giving the contract of each window in the batch.
+    :param num_contracts: Number of contracts in the batch.
+    :param pooling: "max" to flag a vulnerability seen in any window, "mean" to average the windows.
+    :return: Tensor of shape (contracts, labels).
+    """
+    if pooling not in POOLING_MODES:
+        raise ValueError(f"Unknown pooling {pooling}, expected one of {POOLING_MODES}")
+    index = contract_index.to(logits.device).unsqueeze(1).expand_as(logits)
+    pooled = logits.new_zeros(num_contracts, logits.size(1))
+    reduce = "amax" if pooling == "max" else "mean"
+    return pooled.scatter_reduce(0, index, logits, reduce=reduce, include_self=False)
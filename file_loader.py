@@ -1,25 +1,143 @@
 import os
+import mmap
+import hashlib
 import logging
 
 # Setup logging with rich handler
 log = logging.getLogger(__name__)
 
 # Module to discover and load .sol files
+def iter_sol_files(root_dir):
+    """
+    Recursively discover .sol files in the root directory, yielding each path as soon as it is found.
+
+    Uses os.scandir so that the file type comes from the directory entry and no
+    per-file stat call or full listing is needed before the first path is yielded.
+    """
+    log.info(f"Starting to scan directory: {root_dir}")
+    count = 0
+    pending_dirs = [root_dir]
+
+    while pending_dirs:
+        dirpath = pending_dirs.pop()
+        try:
+            with os.scandir(dirpath) as entries:
+                subdirs = []
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        subdirs.append(entry.path)
+                    elif entry.name.endswith('.sol') and entry.is_file():
+                        count += 1
+                        log.debug(f"Discovered Solidity file: {entry.path}")
+                        yield entry.path
+        except OSError as e:
+            log.error(f"Error scanning directory {dirpath}: {e}")
+            continue
+
+        # Visit subdirectories in listing order
+        pending_dirs.extend(reversed(subdirs))
+
+    log.info(f"Completed scanning. Found {count} Solidity files.")
+
 def discover_sol_files(root_dir):
     """Recursively discover all .sol files in the root directory."""
-    sol_files = []
-    log.info(f"Starting to scan directory: {root_dir}")
-    
-    # Use simple directory walk, logging file discovery
-    for dirpath, _, filenames in os.walk(root_dir):
-        for filename in filenames:
-            if filename.endswith('.sol'):
-                filepath = os.path.join(dirpath, filename)
-                sol_files.append(filepath)
-                log.debug(f"Discovered Solidity file: {filepath}")
-    
-    log.info(f"Completed scanning. Found {len(sol_files)} Solidity files.")
-    return sol_files
+    return list(iter_sol_files(root_dir))
+
+def shard_of(file_path, num_shards, root_dir):
+    """
+    Assign a Solidity file to one of num_shards shards by a stable hash of its path.
+
+    The path is taken relative to root_dir with forward slashes, so every machine assigns
+    a file to the same shard wherever the corpus is mounted and whatever the listing order.
+
+    Returns:
+    - (int): The shard index, from 0 to num_shards - 1.
+    """
+    relative_path = os.path.relpath(file_path, root_dir).replace(os.sep, "/")
+    digest = hashlib.sha256(relative_path.encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "big") % num_shards
+
+# Encodings tried in order for files that are not valid UTF-8. latin-1 maps every
+# byte, so the chain never fails; cp1252 goes first for its typographic quotes.
+FALLBACK_ENCODINGS = ("cp1252", "latin-1")
+
+def decode_sol_bytes(data, filepath=None):
+    """
+    Decode the raw bytes of a Solidity file, as UTF-8 if possible and with the fallback encodings otherwise.
+
+    Args:
+    - data (bytes): The raw content of the file.
+    - filepath (str | None): Path of the file, for logging.
+
+    Returns:
+    - (str): The decoded content.
+    """
+    try:
+        return data.decode('utf-8')
+    except UnicodeDecodeError:
+        pass
+    for encoding in FALLBACK_ENCODINGS:
+        try:
+            content = data.decode(encoding)
+        except UnicodeDecodeError:
+            continue
+        log.warning(f"{filepath or 'Content'} is not valid UTF-8, decoded as {encoding}")
+        return content
+
+def decode_sol_text(data, filepath=None):
+    """Decode the raw bytes of a Solidity file to the same text load_sol_file returns, newlines included."""
+    return decode_sol_bytes(data, filepath).replace('\r\n', '\n').replace('\r', '\n')
+
+def normalize_newlines(data):
+    """
+    Convert the CRLF and bare CR line endings of raw Solidity content to LF, as text mode
+    does, so comment removal, detection and hashing see the same lines in every load mode.
+
+    Args:
+    - data (bytes | mmap.mmap): The raw content of the file.
+
+    Returns:
+    - (bytes | mmap.mmap): The content with LF line endings; content without a CR is
+      returned as it is, without a copy.
+    """
+    if data.find(b'\r') == -1:
+        return data
+    return bytes(data).replace(b'\r\n', b'\n').replace(b'\r', b'\n')
+
+def iter_normalized_blocks(blocks):
+    """
+    Apply normalize_newlines to consecutive blocks of a file, keeping a CRLF split
+    between two blocks as a single newline.
+
+    Yields:
+    - (bytes): The blocks with LF line endings.
+    """
+    pending = b""
+    for block in blocks:
+        block = pending + block
+        pending = b""
+        if block.endswith(b'\r'):
+            block, pending = block[:-1], b'\r'
+        if block:
+            yield normalize_newlines(block)
+    if pending:
+        yield b'\n'
+
+def read_sol_bytes(filepath):
+    """
+    Read the raw bytes of a Solidity file, for callers that decode or label them elsewhere.
+
+    Returns:
+    - (bytes | None): The content, or None if the file could not be read.
+    """
+    try:
+        with open(filepath, 'rb') as file:
+            content = file.read()
+        log.info(f"Successfully read {filepath}")
+        return content
+    except OSError as e:
+        log.error(f"Error loading file {filepath}: {e}")
+        return None
 
 def load_sol_file(filepath):
     """Load and read the contents of a Solidity file."""
@@ -28,6 +146,36 @@ def load_sol_file(filepath):
             content = file.read()
         log.info(f"Successfully loaded {filepath}")
         return content
+    except UnicodeDecodeError:
+        # Rare enough that reading the file a second time costs nothing overall
+        try:
+            with open(filepath, 'rb') as file:
+                return decode_sol_text(file.read(), filepath)  # Same newlines as text mode
+        except (OSError, IOError) as e:
+            log.error(f"Error loading file {filepath}: {e}")
+            return None
     except (OSError, IOError) as e:
         log.error(f"Error loading file {filepath}: {e}")
         return None
+
+def map_sol_file(filepath):
+    """
+    Memory-map a Solidity file for reading, without decoding or copying its content.
+
+    The caller closes the returned map. Patterns compiled from bytes, hashlib and slicing
+    all work on it directly, and any encoding is accepted since nothing is decoded.
+
+    Returns:
+    - (mmap.mmap | bytes | None): The read-only map, b"" for an empty file (which cannot
+      be mapped), or None if the file could not be opened.
+    """
+    try:
+        with open(filepath, 'rb') as file:
+            if os.fstat(file.fileno()).st_size == 0:
+                return b""
+            content = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        log.info(f"Successfully mapped {filepath}")
+        return content
+    except (OSError, ValueError) as e:
+        log.error(f"Error mapping file {filepath}: {e}")
+        return None
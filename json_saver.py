@@ -1,19 +1,39 @@
 import os
 import json
 import logging
+import threading
+
+def write_json_atomic(output_file, data, indent=4):
+    """
+    Write data as JSON to output_file through a temporary file in the same directory and a
+    single rename, so an interrupted write never leaves a partial file behind: readers see
+    the previous content or the new one.
+    """
+    output_dir, file_name = os.path.split(output_file)
+    # Unique per process and thread, and created like the final file so it keeps the usual permissions
+    temp_path = os.path.join(output_dir, f".{file_name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        with open(temp_path, 'w') as f:
+            json.dump(data, f, indent=indent)
+        os.replace(temp_path, output_file)
+    except BaseException:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        raise
 
 def save_results_as_json(results, output_dir, file_name):
     """Save results as a single JSON file, with multiple vulnerability entries."""
     try:
         # Create the directory if it does not exist
         if not os.path.exists(output_dir):
-            os.makedirs(output_dir)
+            os.makedirs(output_dir, exist_ok=True)
             logging.info(f"Created directory: {output_dir}")
         
-        # Save the results in a single JSON file for each Solidity contract
+        # Save the results in a single JSON file for each Solidity contract, replacing any previous one atomically
         output_file = os.path.join(output_dir, f"{file_name}.json")
-        with open(output_file, 'w') as f:
-            json.dump(results, f, indent=4)
+        write_json_atomic(output_file, results)
         
         logging.info(f"Successfully saved results to {output_file}")
 
@@ -0,0 +1,248 @@
+import os
+import json
+import time
+import inspect
+import hashlib
+import logging
+
+from detector_engine import REGISTRY
+
+# Setup logging with rich handler
+log = logging.getLogger(__name__)
+
+# Name of the manifest file kept at the top of the output directory
+MANIFEST_NAME = ".label_manifest.json"
+
+# Name of the journal of the files completed by the current run, kept next to the manifest
+JOURNAL_NAME = ".label_journal.jsonl"
+
+# Name of the summary written by a sharded run (--shard i/N) next to its manifest, read by merge_shards.py
+SHARD_SUMMARY_NAME = ".shard_summary.json"
+
+# Seconds between two flushes of the journal to disk: an interrupted run loses at most this much work
+JOURNAL_FLUSH_SECONDS = 2.0
+
+# Modules whose source decides the labels; editing any of them invalidates the cache
+DETECTOR_MODULES = ("remove_comments.py", "detector_engine.py")
+
+# Further modules that decide the function labels written with --functions
+FUNCTION_MODULES = ("solidity_index.py",)
+
+
+def content_hash(sol_content):
+    """
+    Return the SHA-256 hex digest of Solidity source content.
+
+    Decoded content is hashed as UTF-8, so a UTF-8 file gets the same digest whether it
+    was loaded as text or memory-mapped as bytes (both with LF line endings).
+    """
+    if isinstance(sol_content, str):
+        sol_content = sol_content.encode("utf-8")
+    return hashlib.sha256(sol_content).hexdigest()
+
+
+def detector_fingerprint(modules=DETECTOR_MODULES):
+    """
+    Compute a fingerprint of the detector code: the given modules and the source file of
+    every registered check, so detectors registered from other modules also invalidate
+    the cache when they change.
+
+    Args:
+    - modules (tuple): File names of the modules, relative to this directory, that affect labels.
+
+    Returns:
+    - (str): A short hex digest that changes whenever one of the modules changes.
+    """
+    digest = hashlib.sha256()
+    base_dir = os.path.dirname(os.path.abspath(__file__))
+    paths = [os.path.join(base_dir, module) for module in modules]
+    for detector in REGISTRY.detectors:
+        source_file = os.path.abspath(inspect.getsourcefile(detector.check))
+        if source_file not in paths:
+            paths.append(source_file)
+    for path in paths:
+        with open(path, "rb") as f:
+            digest.update(os.path.relpath(path, base_dir).encode("utf-8"))
+            digest.update(f.read())
+    return digest.hexdigest()[:16]
+
+
+class LabelManifest:
+    """
+    Persistent record of the labeled files, keyed by path.
+
+    Each entry stores the content hash of the file together with its size and
+    modification time when it was labeled. The manifest is only valid for the
+    detector fingerprint it was written with.
+    """
+
+    def __init__(self, manifest_path, detector_version):
+        self.manifest_path = manifest_path
+        self.detector_version = detector_version
+        self.entries = {}
+        self.journal = None
+
+    def load(self):
+        """Load the manifest from disk, discarding it if it belongs to another detector version."""
+        if not os.path.exists(self.manifest_path):
+            log.info(f"No label manifest found at {self.manifest_path}, labeling every file.")
+            return
+
+        try:
+            with open(self.manifest_path, "r") as f:
+                manifest = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            log.error(f"Could not read label manifest {self.manifest_path}: {e}")
+            return
+
+        if manifest.get("detector_version") != self.detector_version:
+            log.warning("Detector version changed since the last run, labeling every file.")
+            return
+
+        self.entries = manifest.get("files", {})
+        log.info(f"Loaded label manifest with {len(self.entries)} entries.")
+
+    def save(self):
+        """Write the manifest to disk, replacing the previous one in a single rename."""
+        os.makedirs(os.path.dirname(self.manifest_path) or ".", exist_ok=True)
+        temp_path = f"{self.manifest_path}.tmp"
+        with open(temp_path, "w") as f:
+            json.dump({"detector_version": self.detector_version, "files": self.entries}, f)
+        os.replace(temp_path, self.manifest_path)
+        log.info(f"Saved label manifest with {len(self.entries)} entries to {self.manifest_path}")
+
+    def cached_digest(self, file_path):
+        """Return the content hash recorded for a file, or None if it was never labeled."""
+        entry = self.entries.get(file_path)
+        return entry["sha256"] if entry else None
+
+    def is_fresh(self, file_path, stat_result, output_file):
+        """
+        Check whether a file can be skipped without reading it: its size and
+        modification time are unchanged and its JSON result still exists.
+        """
+        entry = self.entries.get(file_path)
+        return (
+            entry is not None
+            and entry["size"] == stat_result.st_size
+            and entry["mtime_ns"] == stat_result.st_mtime_ns
+            and os.path.exists(output_file)
+        )
+
+    def record(self, file_path, digest, stat_result):
+        """Record a labeled (or verified unchanged) file, and journal it if a journal is attached."""
+        entry = {
+            "sha256": digest,
+            "size": stat_result.st_size,
+            "mtime_ns": stat_result.st_mtime_ns,
+        }
+        self.entries[file_path] = entry
+        if self.journal is not None:
+            self.journal.append(file_path, entry)
+
+    def prune(self, file_paths):
+        """
+        Drop the entries of files that no longer exist in the corpus.
+
+        Returns:
+        - (list): Paths of the dropped entries.
+        """
+        keep = set(file_paths)
+        dropped = [path for path in self.entries if path not in keep]
+        for file_path in dropped:
+            del self.entries[file_path]
+        return dropped
+
+
+class RunJournal:
+    """
+    Append-only record of the files completed by a run, one JSON line per file.
+
+    The manifest is only written when a run ends, so a run that is killed loses it. The
+    journal is written as the run goes and flushed to disk every few seconds; a run started
+    with --resume replays it into the manifest and skips the files it lists. The first line
+    holds the detector version, and a journal written by another version is ignored.
+    """
+
+    def __init__(self, journal_path, detector_version, flush_interval=JOURNAL_FLUSH_SECONDS):
+        self.journal_path = journal_path
+        self.detector_version = detector_version
+        self.flush_interval = flush_interval
+        self.file = None
+        self.last_flush = 0.0
+
+    def exists(self):
+        """Return True if a journal was left by an interrupted run."""
+        return os.path.exists(self.journal_path)
+
+    def read(self):
+        """
+        Read the entries of the journal left by an interrupted run.
+
+        Returns:
+        - (dict): {file_path: manifest entry} for the completed files, empty if there is no
+          journal or it belongs to another detector version. A line cut short by the
+          interruption is ignored.
+        """
+        entries = {}
+        try:
+            with open(self.journal_path, "r") as f:
+                header = json.loads(f.readline() or "{}")
+                if header.get("detector_version") != self.detector_version:
+                    log.warning("The journal was written by another detector version, ignoring it.")
+                    return entries
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+                    entries[record.pop("path")] = record
+        except FileNotFoundError:
+            return entries
+        except (OSError, json.JSONDecodeError) as e:
+            log.error(f"Could not read journal {self.journal_path}: {e}")
+        return entries
+
+    def open(self, entries=None):
+        """
+        Start the journal of this run, replacing any previous one in a single rename.
+
+        Args:
+        - entries (dict | None): Entries carried over from the interrupted run being resumed.
+        """
+        os.makedirs(os.path.dirname(self.journal_path) or ".", exist_ok=True)
+        temp_path = f"{self.journal_path}.tmp"
+        with open(temp_path, "w") as f:
+            f.write(json.dumps({"detector_version": self.detector_version}) + "\n")
+            for file_path, entry in (entries or {}).items():
+                f.write(json.dumps({"path": file_path, **entry}) + "\n")
+        os.replace(temp_path, self.journal_path)
+        self.file = open(self.journal_path, "a")
+        self.last_flush = time.monotonic()
+
+    def append(self, file_path, entry):
+        """Journal a completed file, flushing to disk if the last flush is older than flush_interval."""
+        self.file.write(json.dumps({"path": file_path, **entry}) + "\n")
+        if time.monotonic() - self.last_flush >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        """Write the buffered lines through to disk."""
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.last_flush = time.monotonic()
+
+    def close(self):
+        """Flush and close the journal, keeping it on disk for a later --resume."""
+        if self.file is not None:
+            self.flush()
+            self.file.close()
+            self.file = None
+
+    def remove(self):
+        """Delete the journal once the run is complete and the manifest holds its entries."""
+        self.close()
+        try:
+            os.remove(self.journal_path)
+        except FileNotFoundError:
+            pass
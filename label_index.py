@@ -0,0 +1,309 @@
+import os
+import sys
+import csv
+import json
+import time
+import sqlite3
+import logging
+import argparse
+from rich.logging import RichHandler
+
+from labeler import LABEL_KEYS, OUTPUT_DIRECTORY, output_location
+
+# Setup logging with rich handler
+log = logging.getLogger(__name__)
+
+# Name of the label index kept at the top of the output directory
+INDEX_NAME = "label_index.sqlite"
+
+# Rows buffered before they are written in one transaction, and seconds between two writes
+INDEX_BATCH_SIZE = 500
+INDEX_FLUSH_SECONDS = 2.0
+
+# Formats of a query export
+EXPORT_FORMATS = ("csv", "jsonl")
+
+# Columns of the labels table besides the label columns
+KEY_COLUMNS = ("path", "sha256")
+META_COLUMNS = ("detector_version", "labeled_at")
+
+
+def default_index_path(output_directory=OUTPUT_DIRECTORY):
+    """Return the path of the label index of an output directory."""
+    return os.path.join(output_directory, INDEX_NAME)
+
+
+class LabelIndex:
+    """
+    SQLite index of the labeled contracts, one row per file.
+
+    Each row holds the path of the contract relative to the corpus root, its content hash,
+    one 0/1 column per detector, the detector version and the time it was labeled. Every
+    label column is indexed, so filters such as "reentrancy but not delegatecall" are
+    answered without opening the JSON results. Rows are buffered and written in batches,
+    one transaction per batch, and the database runs in WAL mode so it can be queried
+    while a run updates it.
+    """
+
+    def __init__(self, index_path, detector_version, root_directory=None, batch_size=INDEX_BATCH_SIZE,
+                 flush_interval=INDEX_FLUSH_SECONDS):
+        self.index_path = index_path
+        self.detector_version = detector_version
+        self.root_directory = root_directory
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.pending = {}
+        self.removed = set()
+        self.last_flush = time.monotonic()
+
+        os.makedirs(os.path.dirname(index_path) or ".", exist_ok=True)
+        self.connection = sqlite3.connect(index_path)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.create_schema()
+
+    def create_schema(self):
+        """Create the tables and indexes, adding a column for any detector registered since the index was created."""
+        with self.connection:
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS labels (path TEXT PRIMARY KEY, sha256 TEXT NOT NULL, "
+                + "".join(f"{key} INTEGER NOT NULL DEFAULT 0, " for key in LABEL_KEYS)
+                + "detector_version TEXT NOT NULL, labeled_at REAL NOT NULL)"
+            )
+            self.connection.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+
+            existing = {row[1] for row in self.connection.execute("PRAGMA table_info(labels)")}
+            for key in LABEL_KEYS:
+                if key not in existing:
+                    self.connection.execute(f"ALTER TABLE labels ADD COLUMN {key} INTEGER NOT NULL DEFAULT 0")
+            for key in (*LABEL_KEYS, "sha256"):
+                self.connection.execute(f"CREATE INDEX IF NOT EXISTS labels_{key} ON labels ({key})")
+
+            if self.root_directory is not None:
+                self.connection.execute(
+                    "INSERT OR REPLACE INTO meta (key, value) VALUES ('root_directory', ?)", (self.root_directory,)
+                )
+
+    def relative_path(self, file_path):
+        """Return the path of a file relative to the corpus root, as stored in the index."""
+        return os.path.relpath(file_path, self.root_directory) if self.root_directory else file_path
+
+    def add(self, file_path, digest, labels, labeled_at=None):
+        """
+        Buffer the labels of a file, writing the buffer when it is full or old enough.
+
+        Args:
+        - file_path (str): Path to the Solidity file.
+        - digest (str): SHA-256 digest of the file content.
+        - labels (tuple): The boolean labels, ordered as LABEL_KEYS.
+        - labeled_at (float | None): Time of labeling, now if None.
+        """
+        path = self.relative_path(file_path)
+        self.removed.discard(path)
+        self.pending[path] = (
+            (path, digest) + tuple(int(label) for label in labels[:len(LABEL_KEYS)])
+            + (self.detector_version, labeled_at or time.time())
+        )
+        self.maybe_flush()
+
+    def remove(self, file_path):
+        """Drop a file from the index, for instance one that no longer has usable labels."""
+        path = self.relative_path(file_path)
+        self.pending.pop(path, None)
+        self.removed.add(path)
+        self.maybe_flush()
+
+    def maybe_flush(self):
+        """Write the buffer if it holds batch_size changes or its oldest change is flush_interval seconds old."""
+        if len(self.pending) + len(self.removed) >= self.batch_size or time.monotonic() - self.last_flush >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        """Write the buffered rows and removals in a single transaction."""
+        if self.pending or self.removed:
+            columns = KEY_COLUMNS + tuple(LABEL_KEYS) + META_COLUMNS
+            with self.connection:
+                self.connection.executemany(
+                    f"INSERT OR REPLACE INTO labels ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})",
+                    self.pending.values(),
+                )
+                self.connection.executemany("DELETE FROM labels WHERE path = ?", ((path,) for path in self.removed))
+            self.pending.clear()
+            self.removed.clear()
+        self.last_flush = time.monotonic()
+
+    def sync(self, manifest_entries, output_directory=OUTPUT_DIRECTORY):
+        """
+        Make the index hold exactly the files of the manifest.
+
+        Files labeled by the run are already indexed. This drops the rows of files the
+        manifest no longer lists, and fills in the files it lists with another hash or
+        version than their row, such as an existing output tree indexed for the first
+        time, from their JSON results.
+
+        Args:
+        - manifest_entries (dict): {file_path: manifest entry} of a manifest written with the same detector version.
+        - output_directory (str): Directory of the JSON results.
+
+        Returns:
+        - (tuple): (added, removed) numbers of rows.
+        """
+        self.flush()
+        rows = {
+            path: (digest, version)
+            for path, digest, version in self.connection.execute("SELECT path, sha256, detector_version FROM labels")
+        }
+        listed = {self.relative_path(file_path): file_path for file_path in manifest_entries}
+
+        for path in rows.keys() - listed.keys():
+            self.removed.add(path)
+        removed = len(self.removed)
+
+        added = 0
+        for path, file_path in listed.items():
+            digest = manifest_entries[file_path]["sha256"]
+            if rows.get(path) == (digest, self.detector_version):
+                continue
+            output_dir, file_name = output_location(file_path, self.root_directory, output_directory)
+            try:
+                with open(os.path.join(output_dir, f"{file_name}.json"), "r") as f:
+                    results = json.load(f)
+                labels = tuple(results[key] for key in LABEL_KEYS)
+            except (OSError, KeyError, json.JSONDecodeError) as e:
+                log.error(f"Could not index {file_path}: {e}")
+                continue
+            if all(isinstance(label, bool) for label in labels):
+                self.pending[path] = (path, digest) + tuple(map(int, labels)) + (self.detector_version, time.time())
+                added += 1
+        self.flush()
+        if added or removed:
+            log.info(f"Label index synced with the manifest: {added} rows added, {removed} removed.")
+        return added, removed
+
+    def close(self):
+        """Write the buffered rows and close the database."""
+        if self.connection is not None:
+            self.flush()
+            self.connection.close()
+            self.connection = None
+
+
+def build_query(flags=(), no_flags=(), path_like=None, columns="*"):
+    """
+    Build the SQL query of the contracts matching a filter.
+
+    Args:
+    - flags (iterable): Labels that must be positive.
+    - no_flags (iterable): Labels that must be negative.
+    - path_like (str | None): SQL LIKE pattern the relative path must match.
+    - columns (str): The selected columns.
+
+    Returns:
+    - (tuple): (sql, parameters).
+    """
+    unknown = [key for key in (*flags, *no_flags) if key not in LABEL_KEYS]
+    if unknown:
+        raise ValueError(f"Unknown labels {unknown}, expected some of {LABEL_KEYS}")
+
+    conditions = [f"{key} = 1" for key in flags] + [f"{key} = 0" for key in no_flags]
+    parameters = []
+    if path_like is not None:
+        conditions.append("path LIKE ?")
+        parameters.append(path_like)
+    where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+    return f"SELECT {columns} FROM labels{where}", parameters
+
+
+def query_index(index_path, flags=(), no_flags=(), path_like=None, limit=None):
+    """
+    Yield the rows of the index matching a filter, as dictionaries ordered by path.
+
+    Args:
+    - index_path (str): Path to the SQLite label index.
+    - flags, no_flags, path_like: The filter, see build_query.
+    - limit (int | None): Maximum number of rows.
+    """
+    sql, parameters = build_query(flags, no_flags, path_like)
+    sql += " ORDER BY path"
+    if limit is not None:
+        sql += f" LIMIT {int(limit)}"
+    connection = sqlite3.connect(f"file:{index_path}?mode=ro", uri=True)
+    connection.row_factory = sqlite3.Row
+    try:
+        for row in connection.execute(sql, parameters):
+            row = dict(row)
+            for key in LABEL_KEYS:
+                row[key] = bool(row[key])
+            yield row
+    finally:
+        connection.close()
+
+
+def count_index(index_path, flags=(), no_flags=(), path_like=None):
+    """
+    Count the contracts matching a filter, and the positives of each label among them.
+
+    Returns:
+    - (dict): {"contracts": n, "positives": {label: n}}.
+    """
+    columns = "COUNT(*), " + ", ".join(f"COALESCE(SUM({key}), 0)" for key in LABEL_KEYS)
+    sql, parameters = build_query(flags, no_flags, path_like, columns)
+    connection = sqlite3.connect(f"file:{index_path}?mode=ro", uri=True)
+    try:
+        total, *positives = connection.execute(sql, parameters).fetchone()
+    finally:
+        connection.close()
+    return {"contracts": total, "positives": dict(zip(LABEL_KEYS, positives))}
+
+
+def export_rows(rows, export_file, export_format):
+    """Write query rows to a CSV or JSONL file and return the number of rows written."""
+    columns = [*KEY_COLUMNS, *LABEL_KEYS, *META_COLUMNS]
+    written = 0
+    with open(export_file, "w", newline="") as f:
+        if export_format == "csv":
+            writer = csv.DictWriter(f, fieldnames=columns)
+            writer.writeheader()
+            for row in rows:
+                writer.writerow(row)
+                written += 1
+        else:
+            for row in rows:
+                f.write(json.dumps(row) + "\n")
+                written += 1
+    return written
+
+
+# Example usage: python label_index.py --flag reentrancy --no-flag delegatecall --count
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Query the SQLite label index maintained by main.py.")
+    parser.add_argument('--index', default=default_index_path(),
+                        help=f"Path to the label index (default: {default_index_path()}).")
+    parser.add_argument('--flag', action='append', default=[], choices=LABEL_KEYS,
+                        help="Only contracts with this label positive; may be repeated.")
+    parser.add_argument('--no-flag', action='append', default=[], choices=LABEL_KEYS,
+                        help="Only contracts with this label negative; may be repeated.")
+    parser.add_argument('--path-like', default=None, help="SQL LIKE pattern of the relative path, e.g. 'defi/%%'.")
+    parser.add_argument('--count', action='store_true',
+                        help="Print the number of matching contracts and the positives of each label among them.")
+    parser.add_argument('--export', default=None, metavar="FILE", help="Write the matching rows to FILE instead of printing their paths.")
+    parser.add_argument('--format', choices=EXPORT_FORMATS, default=None,
+                        help="Format of the export (default: from the file extension, else csv).")
+    parser.add_argument('--limit', type=int, default=None, help="Maximum number of rows printed or exported.")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s", handlers=[RichHandler()])
+    if not os.path.exists(args.index):
+        log.error(f"No label index at {args.index}; run main.py first.")
+        sys.exit(2)
+
+    if args.count:
+        print(json.dumps(count_index(args.index, args.flag, args.no_flag, args.path_like), indent=4))
+    elif args.export:
+        export_format = args.format or ("jsonl" if args.export.endswith(".jsonl") else "csv")
+        rows = query_index(args.index, args.flag, args.no_flag, args.path_like, args.limit)
+        written = export_rows(rows, args.export, export_format)
+        log.info(f"Exported {written} rows to {args.export}")
+    else:
+        for row in query_index(args.index, args.flag, args.no_flag, args.path_like, args.limit):
+            print(row["path"])
@@ -0,0 +1,366 @@
+import os
+import time
+import logging
+from collections import namedtuple
+
+from file_loader import load_sol_file, map_sol_file, normalize_newlines, decode_sol_bytes, decode_sol_text
+from remove_comments import remove_comments, strip_comments, original_offset
+from detector_engine import REGISTRY, TIMEOUT_LABEL, LabelKeys, detect_all, detect_functions, scan_tokens
+from solidity_index import index_source
+from label_cache import content_hash
+from streaming_detection import DEFAULT_WINDOW_SIZE, DEFAULT_OVERLAP, hash_file, detect_stream
+from profiler import FileTimings
+
+# Setup logging with rich handler
+log = logging.getLogger(__name__)
+
+# Default input and output trees of the labeling pass
+ROOT_DIRECTORY = "datast"
+OUTPUT_DIRECTORY = "json_out"
+
+# How label_file reads a file: decoded to str, or memory-mapped and labeled as raw bytes
+LOAD_MODES = ("text", "mmap")
+
+# Order of the labels in the compact tuples exchanged with worker processes: one per
+# registered detector, so a new detector adds its key to the JSON output and the export.
+# The keys are read from the registry when used, so detectors registered after this
+# module is imported are included.
+LABEL_KEYS = LabelKeys(REGISTRY)
+
+# How label_file loads and labels a file, passed as one value to threads and worker processes:
+# - with_source: also return the cleaned source code, for columnar export
+# - file_timeout, detector_timeout: time budgets in seconds, None for no budget
+# - load_mode: one of LOAD_MODES
+# - stream_threshold: size in bytes above which files are streamed, None to never stream
+# - function_scope: also label each function of the file
+LabelOptions = namedtuple(
+    "LabelOptions",
+    ["with_source", "file_timeout", "detector_timeout", "load_mode", "stream_threshold", "function_scope"],
+    defaults=(False, None, None, "text", None, False),
+)
+DEFAULT_OPTIONS = LabelOptions()
+
+# Labels of the contents already labeled by this process, keyed by content hash. Each
+# worker process keeps its own table; threads share the one of their process.
+labels_by_hash = {}
+MAX_LABELS_BY_HASH = 500_000
+
+
+class ReusedLabels(tuple):
+    """
+    Labels taken from labels_by_hash instead of running the detectors. The type travels
+    with the labels when a worker process sends them back, so the parent can count the
+    labeling passes the tables actually saved.
+    """
+
+
+def remember_labels(digest, labels):
+    """Remember the labels of a content hash, evicting the oldest entry when the table is full."""
+    if len(labels_by_hash) >= MAX_LABELS_BY_HASH:
+        labels_by_hash.pop(next(iter(labels_by_hash)), None)
+    labels_by_hash[digest] = labels
+
+
+def timed(timings, stage, function, *args):
+    """Call function(*args), appending (stage, seconds) to timings unless timings is None."""
+    if timings is None:
+        return function(*args)
+    start = time.perf_counter()
+    result = function(*args)
+    timings.append((stage, time.perf_counter() - start))
+    return result
+
+
+def label_content(sol_content, with_source=False, timings=None, detector_timeout=None, deadline=None,
+                  function_scope=False):
+    """
+    Remove comments from Solidity content and run all vulnerability detections.
+
+    Args:
+    - sol_content (str): The content of the Solidity source code.
+    - with_source (bool): Also return the cleaned source code.
+    - timings (list | None): If given, (stage, seconds) pairs are appended for profiling.
+    - detector_timeout (float | None): Time budget of each detector in seconds.
+    - deadline (float | None): time.perf_counter() value by which the file must be labeled.
+    - function_scope (bool): Also label each function, see label_functions.
+
+    Returns:
+    - (tuple): The detection labels, ordered as LABEL_KEYS and followed by the function
+      findings if function_scope is set, or a (labels, cleaned_content) tuple if with_source is set.
+    """
+    if function_scope:
+        cleaned_content, offset_map = timed(timings, "remove_comments", strip_comments, sol_content)
+    else:
+        cleaned_content = timed(timings, "remove_comments", remove_comments, sol_content)
+
+    # All registered detectors after one token scan, with labels identical to the individual detect_* functions
+    if function_scope:
+        # The function detections reuse the tokens of the file
+        tokens = timed(timings, "detect.scan", scan_tokens, cleaned_content)
+        labels = detect_all(cleaned_content, timings, detector_timeout, deadline, tokens)
+        labels += (label_functions(sol_content, cleaned_content, offset_map, tokens, timings, detector_timeout,
+                                   deadline),)
+    else:
+        labels = detect_all(cleaned_content, timings, detector_timeout, deadline)
+    return (labels, cleaned_content) if with_source else labels
+
+
+def label_functions(sol_content, cleaned_content, offset_map, tokens, timings=None, detector_timeout=None,
+                    deadline=None):
+    """
+    Index the functions of a source and run the detections on each of them.
+
+    Unlike the file-level labels, an onlyOwner modifier only clears the function it is
+    applied to, and each detector only looks at the functions containing its trigger.
+    tokens are the tokens of cleaned_content, as scanned for the file-level labels.
+
+    Returns:
+    - (tuple): (contract, function, line, labels) tuples for the functions with a positive or
+      timed-out label, where line is the line of the declaration in the original source.
+    """
+    index = timed(timings, "index", index_source, cleaned_content)
+    findings = timed(timings, "detect.functions", detect_functions, cleaned_content, index, tokens, detector_timeout,
+                     deadline)
+
+    # Findings are in source order, so the line numbers are counted in one pass
+    results = []
+    line, counted_to = 1, 0
+    for span, labels in findings:
+        offset = original_offset(offset_map, span.start)
+        line += sol_content.count("\n", counted_to, offset)
+        counted_to = offset
+        results.append((span.contract, span.name, line, labels))
+    return tuple(results)
+
+
+def labels_to_results(labels):
+    """Expand a compact label tuple into the per-contract JSON dictionary."""
+    results = dict(zip(LABEL_KEYS, labels))
+    if len(labels) > len(LABEL_KEYS):
+        results["functions"] = [
+            {"contract": contract, "function": function, "line": line, **dict(zip(LABEL_KEYS, function_labels))}
+            for contract, function, line, function_labels in labels[len(LABEL_KEYS)]
+        ]
+    return results
+
+
+def is_quarantined(labels):
+    """Return True if a detector ran out of its time budget on the labeled content."""
+    return labels is not None and TIMEOUT_LABEL in labels
+
+
+def label_streamed(file_path, cached_digest=None, timings=None, detector_timeout=None, deadline=None):
+    """
+    Label a large Solidity file in fixed-size windows, without holding its content in memory.
+
+    The file is read twice: once to hash it, which is enough for an unchanged file or a
+    duplicate, and once to strip comments and run the detectors window by window.
+
+    Returns:
+    - (tuple | None): A (digest, labels, None) tuple as described in label_file, or None if
+      the file could not be read.
+    """
+    digest = timed(timings, "hash", hash_file, file_path)
+    if digest is None:
+        return None
+    if digest == cached_digest:
+        return digest, None, None
+
+    labels = labels_by_hash.get(digest)
+    if labels is None:
+        labels = timed(timings, "stream", detect_stream, file_path, DEFAULT_WINDOW_SIZE, DEFAULT_OVERLAP,
+                       detector_timeout, deadline)
+        if not is_quarantined(labels):
+            remember_labels(digest, labels)
+    return digest, labels, None
+
+
+def file_deadline(options):
+    """Return the time.perf_counter() value by which a file starting now must be labeled, or None."""
+    return time.perf_counter() + options.file_timeout if options.file_timeout is not None else None
+
+
+def label_file(file_path, cached_digest=None, options=DEFAULT_OPTIONS, timings=None):
+    """
+    Load a Solidity file and label it, unless its content is unchanged.
+
+    Byte-identical copies of a content already labeled by this process reuse its
+    labels instead of running remove_comments and the detectors again.
+
+    In mmap mode the file is memory-mapped and comment removal and detection run on
+    bytes, so the decode and the full copy of the content are skipped and files in any
+    encoding are labeled. Only the exported source is decoded, and only files with CR
+    line endings are copied, to normalize them to LF as text mode does.
+
+    Files larger than options.stream_threshold are labeled in windows with label_streamed,
+    like mmap mode on bytes, unless the cleaned source or the function labels are needed.
+    Function labels are computed on text, so they also make mmap mode load text.
+
+    Args:
+    - file_path (str): Path to the Solidity file.
+    - cached_digest (str | None): Content hash recorded by a previous run, if any.
+    - options (LabelOptions): How to load and label the file.
+    - timings (list | None): If given, (stage, seconds) pairs are appended for profiling.
+
+    Returns:
+    - (tuple | None): A (digest, labels, cleaned_content) tuple, or None if the file could
+      not be loaded. labels is None when the digest equals cached_digest, in which case
+      remove_comments and the detectors are skipped. cleaned_content is None unless
+      options.with_source is set. Detectors that ran out of time are labeled TIMEOUT_LABEL.
+    """
+    deadline = file_deadline(options)
+    needs_text = options.with_source or options.function_scope
+    if options.stream_threshold is not None and not needs_text:
+        try:
+            if os.path.getsize(file_path) > options.stream_threshold:
+                return label_streamed(file_path, cached_digest, timings, options.detector_timeout, deadline)
+        except OSError as e:
+            log.error(f"Error loading file {file_path}: {e}")
+            return None
+
+    if options.load_mode == "mmap" and not options.function_scope:
+        sol_content = timed(timings, "load", map_sol_file, file_path)
+        if sol_content is None:
+            return None
+        try:
+            # Line endings are normalized as in text mode; files with CRs are copied for it
+            digest, labels, cleaned_content = label_loaded(normalize_newlines(sol_content), cached_digest, options,
+                                                           timings, deadline)
+        finally:
+            if not isinstance(sol_content, bytes):
+                sol_content.close()
+        if cleaned_content is not None:
+            cleaned_content = decode_sol_bytes(cleaned_content, file_path)
+        return digest, labels, cleaned_content
+
+    sol_content = timed(timings, "load", load_sol_file, file_path)
+    if sol_content is None:
+        return None
+    return label_loaded(sol_content, cached_digest, options, timings, deadline)
+
+
+def label_bytes(file_path, data, cached_digest=None, options=DEFAULT_OPTIONS, timings=None):
+    """
+    Label the raw content of a Solidity file read by the caller, as label_file labels the file.
+
+    In mmap mode the bytes are labeled as they are, newlines normalized; otherwise they are
+    decoded to the text load_sol_file would return, so digests and labels match label_file in both modes.
+
+    Returns:
+    - (tuple): A (digest, labels, cleaned_content) tuple as described in label_file.
+    """
+    deadline = file_deadline(options)
+    if options.load_mode == "mmap" and not options.function_scope:
+        digest, labels, cleaned_content = label_loaded(normalize_newlines(data), cached_digest, options, timings,
+                                                       deadline)
+        if cleaned_content is not None:
+            cleaned_content = decode_sol_bytes(cleaned_content, file_path)
+        return digest, labels, cleaned_content
+
+    sol_content = timed(timings, "decode", decode_sol_text, data, file_path)
+    return label_loaded(sol_content, cached_digest, options, timings, deadline)
+
+
+def label_loaded(sol_content, cached_digest=None, options=DEFAULT_OPTIONS, timings=None, deadline=None):
+    """
+    Hash and label loaded Solidity content, as described in label_file.
+
+    Returns:
+    - (tuple): A (digest, labels, cleaned_content) tuple, with cleaned_content of the same
+      type as sol_content (bytes for mapped files).
+    """
+    digest = timed(timings, "hash", content_hash, sol_content)
+    if digest == cached_digest:
+        return digest, None, None
+
+    labels = labels_by_hash.get(digest)
+    if labels is not None:
+        # Duplicate content: only the columnar export still needs the cleaned source
+        cleaned_content = timed(timings, "remove_comments", remove_comments, sol_content) if options.with_source else None
+        return digest, ReusedLabels(labels), cleaned_content
+
+    labels = label_content(sol_content, options.with_source, timings, options.detector_timeout, deadline,
+                           options.function_scope)
+    labels, cleaned_content = labels if options.with_source else (labels, None)
+
+    # A timeout says nothing about the content, so a later copy gets another chance
+    if not is_quarantined(labels):
+        remember_labels(digest, labels)
+    return digest, labels, cleaned_content
+
+
+def label_chunk(tasks, options=DEFAULT_OPTIONS, profile=False):
+    """
+    Label a chunk of Solidity files inside a worker process.
+
+    Only compact (file_path, outcome, timings) tuples are sent back so the parent
+    process can own progress reporting, profiling and output writing.
+
+    Args:
+    - tasks (list): (file_path, cached_digest) tuples for the files in the chunk.
+    - options (LabelOptions): How to load and label the files.
+    - profile (bool): Also send back the (stage, seconds) timings of each file.
+
+    Returns:
+    - (list): A list of (file_path, outcome, timings) tuples, where outcome is the result
+      of label_file, or None for files that could not be loaded or processed, and
+      timings is None unless profile is set.
+    """
+    chunk_results = []
+    for file_path, cached_digest in tasks:
+        timings = FileTimings() if profile else None
+        try:
+            outcome = label_file(file_path, cached_digest, options, timings)
+        except Exception as e:
+            log.error(f"Error processing file {file_path}: {e}")
+            outcome = None
+        chunk_results.append((file_path, outcome, timings))
+    return chunk_results
+
+
+def label_read(task, options=DEFAULT_OPTIONS, profile=False):
+    """
+    Label one file whose content was read by another stage, inside a worker thread or process.
+
+    Args:
+    - task (tuple): (file_path, data, cached_digest), where data is the raw content of the
+      file, or None for a file to be loaded here (a file too large to read whole, see
+      label_file).
+    - options (LabelOptions): How to load and label the file.
+    - profile (bool): Also send back the (stage, seconds) timings of the file.
+
+    Returns:
+    - (tuple): A (file_path, outcome, timings) tuple, as in label_chunk.
+    """
+    file_path, data, cached_digest = task
+    timings = FileTimings() if profile else None
+    try:
+        if data is None:
+            outcome = label_file(file_path, cached_digest, options, timings)
+        else:
+            outcome = label_bytes(file_path, data, cached_digest, options, timings)
+    except Exception as e:
+        log.error(f"Error processing file {file_path}: {e}")
+        outcome = None
+    return file_path, outcome, timings
+
+
+def init_worker(quiet_mode):
+    """
+    Initializer for worker processes.
+
+    Workers only forward warnings and errors so that per-file detector logging
+    from many processes does not flood the parent's console.
+    """
+    logging.getLogger().setLevel(logging.ERROR if quiet_mode else logging.WARNING)
+
+
+def output_location(file_path, root_directory=ROOT_DIRECTORY, output_directory=OUTPUT_DIRECTORY):
+    """
+    Map a Solidity file to the directory and file name of its JSON result,
+    recreating the original directory structure in the output directory.
+    """
+    relative_path = os.path.relpath(file_path, root_directory)  # Get the relative path from the root directory
+    output_dir = os.path.join(output_directory, os.path.dirname(relative_path))  # Recreate the directory structure
+    file_name = os.path.splitext(os.path.basename(file_path))[0]  # Use the contract file name without extension
+    return output_dir, file_name
@@ -1,28 +1,115 @@
 import argparse
 import logging
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, wait, FIRST_COMPLETED
+from collections import namedtuple
+import asyncio
+from functools import partial
+from itertools import islice
 from rich.progress import Progress, SpinnerColumn, BarColumn, TimeElapsedColumn
 from rich.logging import RichHandler
 import threading
+import time
+import json
 import os
 
-from file_loader import discover_sol_files, load_sol_file
-from remove_comments import remove_comments
-from timestamp_dependence import detect_timestamp_dependence
-from reentrance_detection import detect_reentrancy_vulnerability
-from integer_overflow_underflow import detect_integer_overflow_underflow
-from delegatecall_detection import detect_delegatecall_vulnerability
-from json_saver import save_results_as_json
+from file_loader import iter_sol_files, read_sol_bytes, shard_of
+from labeler import (
+    ROOT_DIRECTORY,
+    OUTPUT_DIRECTORY,
+    LOAD_MODES,
+    LabelOptions,
+    label_file,
+    label_chunk,
+    label_read,
+    labels_to_results,
+    is_quarantined,
+    init_worker,
+    ReusedLabels,
+    output_location,
+)
+from label_cache import (
+    MANIFEST_NAME,
+    JOURNAL_NAME,
+    SHARD_SUMMARY_NAME,
+    DETECTOR_MODULES,
+    FUNCTION_MODULES,
+    LabelManifest,
+    RunJournal,
+    detector_fingerprint,
+)
+from json_saver import save_results_as_json, write_json_atomic
+from columnar_export import SHARD_DIRECTORY, DEFAULT_ROWS_PER_SHARD, SHARD_EXTENSIONS, ShardWriter
+from profiler import PROFILE_REPORT, DEFAULT_SLOWEST, FileTimings, StageProfiler, time_handlers
+from streaming_detection import DEFAULT_STREAM_THRESHOLD
+from run_events import RUN_SUMMARY, RunEvents
+from label_index import LabelIndex, default_index_path
+from watch_mode import DEFAULT_POLL_INTERVAL, watch_corpus
+from async_pipeline import (
+    DEFAULT_READERS,
+    DEFAULT_WRITERS,
+    DEFAULT_QUEUE_SIZE,
+    DEFAULT_WRITE_BATCH,
+    StageSettings,
+    run_pipeline,
+    io_threads,
+)
 
 # Thread lock for progress updates to ensure thread safety
 progress_lock = threading.Lock()
 
-def setup_logger(quiet_mode):
+# Number of files sent to a worker process per task in process mode
+DEFAULT_CHUNK_SIZE = 64
+
+# Default number of submitted tasks per worker before submission waits for results
+IN_FLIGHT_PER_WORKER = 4
+
+# Default time budgets in seconds; a file that runs out of time is labeled "timeout" and quarantined
+DEFAULT_FILE_TIMEOUT = 60.0
+DEFAULT_DETECTOR_TIMEOUT = 20.0
+
+# File listing the quarantined files of the last run, kept in the output directory and dotted
+# like the manifest so that it cannot clash with the labels of a contract named quarantine.sol
+QUARANTINE_FILE = ".quarantine.json"
+
+# Settings of a labeling run, set once from the command line:
+# - quiet_mode, verbose: console verbosity
+# - executor: "thread", "process" or "async"; analyze_executor: pool of the analysis stage in async mode
+# - num_workers, chunk_size, max_in_flight: worker pool size, files per process task, pending tasks
+#   (None for the CPU count and IN_FLIGHT_PER_WORKER per worker)
+# - readers, writers, queue_size, write_batch: async pipeline settings, see StageSettings
+# - use_cache: skip the files the label manifest shows as unchanged; resume: also skip the
+#   files completed by an interrupted run
+# - export_format, export_dir, rows_per_shard: columnar export, export_format None for none
+# - profile_report, profile_top: profiling report, profile_report None for no profiling
+# - file_timeout, detector_timeout, load_mode, stream_threshold, function_scope: see LabelOptions
+#   (a budget of 0 disables the timeout)
+# - quarantine_file, summary_file: files of the quarantine list and of the run summary, None
+#   for QUARANTINE_FILE and RUN_SUMMARY in output_directory; events_file: per-file events, None for none
+# - shard: (index, count) of the slice of the corpus to label, None for all of it
+# - root_directory, output_directory: input and output trees
+# - watch, poll_interval: keep polling the corpus for changes, see watch_mode
+# - use_index: maintain the SQLite label index
+RunConfig = namedtuple(
+    "RunConfig",
+    ["quiet_mode", "verbose", "executor", "analyze_executor", "num_workers", "chunk_size", "max_in_flight",
+     "readers", "writers", "queue_size", "write_batch", "use_cache", "resume", "export_format", "export_dir",
+     "rows_per_shard", "profile_report", "profile_top", "file_timeout", "detector_timeout", "load_mode",
+     "stream_threshold", "function_scope", "quarantine_file", "summary_file", "events_file", "shard",
+     "root_directory", "output_directory", "watch", "poll_interval", "use_index"],
+    defaults=(False, False, "thread", "process", None, DEFAULT_CHUNK_SIZE, None,
+              DEFAULT_READERS, DEFAULT_WRITERS, DEFAULT_QUEUE_SIZE, DEFAULT_WRITE_BATCH, True, False, None, SHARD_DIRECTORY,
+              DEFAULT_ROWS_PER_SHARD, None, DEFAULT_SLOWEST, DEFAULT_FILE_TIMEOUT, DEFAULT_DETECTOR_TIMEOUT, "text",
+              None, False, None, None, None, None,
+              ROOT_DIRECTORY, OUTPUT_DIRECTORY, False, DEFAULT_POLL_INTERVAL, True),
+)
+
+def setup_logger(quiet_mode, verbose=False):
     """
     Setup the root logger to adjust verbosity based on quiet mode.
+    Per-file detail is only logged in verbose mode; run outcomes go through RunEvents.
     """
-    # Determine the logging level based on quiet mode
-    level = logging.ERROR if quiet_mode else logging.DEBUG
+    # Determine the logging level based on quiet and verbose modes
+    level = logging.ERROR if quiet_mode else logging.DEBUG if verbose else logging.WARNING
 
     # Configure the root logger
     logging.basicConfig(
@@ -41,41 +128,171 @@ def setup_logger(quiet_mode):
 
     return logger
 
-def process_file(file_path, progress_task, progress, logger):
+def save_labels(file_path, labels, timings=None, root_directory=ROOT_DIRECTORY, output_directory=OUTPUT_DIRECTORY):
     """
-    Process a single Solidity file, remove comments, and run all vulnerability detections.
+    Save the labels of a Solidity file as JSON, mirroring its location under the output directory.
     """
-    try:
-        # Load the file content
-        sol_content = load_sol_file(file_path)
-        if sol_content is None:
-            logger.warning(f"Could not load file: {file_path}")
-            return None  # Skip if the file could not be loaded
+    start = time.perf_counter()
+    output_dir, file_name = output_location(file_path, root_directory, output_directory)
+    save_results_as_json(labels_to_results(labels), output_dir, file_name)
+    if timings is not None:
+        timings.append(("save_json", time.perf_counter() - start))
+
+def output_file_for(file_path, root_directory=ROOT_DIRECTORY, output_directory=OUTPUT_DIRECTORY):
+    """Return the path of the JSON result of a Solidity file."""
+    output_dir, file_name = output_location(file_path, root_directory, output_directory)
+    return os.path.join(output_dir, f"{file_name}.json")
+
+def remove_results(file_paths, logger, root_directory=ROOT_DIRECTORY, output_directory=OUTPUT_DIRECTORY):
+    """Remove the JSON results of Solidity files that were deleted from the corpus."""
+    for file_path in file_paths:
+        try:
+            os.remove(output_file_for(file_path, root_directory, output_directory))
+        except FileNotFoundError:
+            continue
+        except OSError as e:
+            logger.error(f"Could not remove the result of deleted file {file_path}: {e}")
+
+def plan_files(sol_files, manifest, stats, counts, logger, root_directory=ROOT_DIRECTORY, output_directory=OUTPUT_DIRECTORY):
+    """
+    Stat discovered files as they arrive and skip the ones the manifest shows as unchanged.
 
-        # Remove comments from the file
-        cleaned_content = remove_comments(sol_content)
+    Args:
+    - sol_files (iterable): Paths of the discovered Solidity files.
+    - manifest (LabelManifest): Manifest of the previous runs.
+    - stats (dict): Filled with {file_path: os.stat_result}, taken before each queued file is read.
+    - counts (dict): Run counters; "discovered", "skipped" and "queued" are updated here.
 
-        # Detect vulnerabilities
-        timestamp_label = detect_timestamp_dependence(cleaned_content)
-        reentrancy_label = detect_reentrancy_vulnerability(cleaned_content)
-        integer_overflow_label = detect_integer_overflow_underflow(cleaned_content)
-        delegatecall_label = detect_delegatecall_vulnerability(cleaned_content)
+    Yields:
+    - (tuple): (file_path, cached_digest) for each file that has to be read.
+    """
+    for file_path in sol_files:
+        counts["discovered"] += 1
+        try:
+            stat_result = os.stat(file_path)
+        except OSError as e:
+            logger.error(f"Could not stat file {file_path}: {e}")
+            continue
+
+        output_file = output_file_for(file_path, root_directory, output_directory)
+        if manifest.is_fresh(file_path, stat_result, output_file):
+            counts["skipped"] += 1
+            continue
+
+        stats[file_path] = stat_result
+        # Only trust the recorded hash if the JSON result is still on disk
+        cached_digest = manifest.cached_digest(file_path) if os.path.exists(output_file) else None
+        counts["queued"] += 1
+        yield file_path, cached_digest
+
+def record_outcome(file_path, outcome, manifest, stats, events, seen_digests, shard_writer=None, quarantine=None,
+                   root_directory=ROOT_DIRECTORY, index=None):
+    """
+    Record a labeled or verified-unchanged file in the manifest and the run events,
+    and add newly labeled files to the label index and the columnar export if they are active.
+    seen_digests collects the content hashes read in this run to count exact duplicates, and
+    labels a worker took from its table of labeled contents are counted as reused.
+    Files with a timed-out detector are appended to quarantine instead: they are left out
+    of the manifest, so the next run retries them, and out of the label index and the columnar export.
+    """
+    if outcome is None:
+        stats.pop(file_path, None)
+        events.file_outcome(file_path, "failed")
+        return
+
+    digest, labels, cleaned_content = outcome
+    if is_quarantined(labels):
+        stats.pop(file_path, None)
+        events.file_outcome(file_path, "quarantined", digest, labels)
+        if quarantine is not None:
+            timed_out = [key for key, label in labels_to_results(labels).items() if not isinstance(label, bool)]
+            quarantine.append({"path": file_path, "sha256": digest, "timed_out": timed_out})
+        if index is not None:
+            index.remove(file_path)
+        return
 
-        # Combine results into one dictionary
-        results = {
-            "timestamp_dependence": timestamp_label,
-            "reentrancy": reentrancy_label,
-            "integer_overflow": integer_overflow_label,
-            "delegatecall": delegatecall_label
-        }
+    manifest.record(file_path, digest, stats.pop(file_path))
+    events.file_outcome(file_path, "labeled" if labels is not None else "unchanged", digest, labels)
 
-        # Recreate original directory structure in the output directory
-        relative_path = os.path.relpath(file_path, "datast")  # Get the relative path from "datast"
-        output_dir = os.path.join("json_out", os.path.dirname(relative_path))  # Recreate the directory structure
-        file_name = os.path.splitext(os.path.basename(file_path))[0]  # Use the contract file name without extension
+    if digest in seen_digests:
+        events.counts["duplicates"] += 1
+    else:
+        seen_digests.add(digest)
+    if isinstance(labels, ReusedLabels):
+        events.counts["reused"] += 1
+
+    if index is not None and labels is not None:
+        index.add(file_path, digest, labels)
+
+    if shard_writer is not None and labels is not None:
+        shard_writer.add(os.path.relpath(file_path, root_directory), digest, cleaned_content, labels)
+
+def write_quarantine(quarantine, quarantine_file=QUARANTINE_FILE, retried=None):
+    """
+    Write the list of quarantined files, sorted by path. A pass over the whole corpus
+    replaces the list of the previous run; a pass over given paths (retried) only replaces
+    their entries and keeps the files quarantined by earlier passes.
+    """
+    entries = list(quarantine)
+    if retried is not None and os.path.exists(quarantine_file):
+        try:
+            with open(quarantine_file) as f:
+                entries += [entry for entry in json.load(f) if entry["path"] not in retried]
+        except (OSError, ValueError, TypeError, KeyError) as e:
+            logging.getLogger(__name__).warning(f"Could not read the quarantine list {quarantine_file}, replacing it: {e}")
+    write_json_atomic(quarantine_file, sorted(entries, key=lambda entry: entry["path"]))
+
+def parse_shard(value):
+    """Parse a --shard value "i/N" into (i, N), with shards numbered from 0 to N - 1."""
+    try:
+        index, count = (int(part) for part in value.split("/"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected i/N, got {value!r}")
+    if count < 1 or not 0 <= index < count:
+        raise argparse.ArgumentTypeError(f"shard index must be in 0..N-1, got {value!r}")
+    return index, count
+
+def write_shard_summary(shard, detector_version, events, quarantine, completed, root_directory=ROOT_DIRECTORY,
+                        output_directory=OUTPUT_DIRECTORY):
+    """
+    Write the summary of a sharded run next to its manifest, for merge_shards.py: which
+    shard of how many this output holds, whether the run completed, and its counters.
+    """
+    index, count = shard
+    write_json_atomic(os.path.join(output_directory, SHARD_SUMMARY_NAME), {
+        "shard": index,
+        "num_shards": count,
+        "root_directory": root_directory,
+        "detector_version": detector_version,
+        "completed": completed,
+        "counts": events.counts,
+        "positives": events.positives,
+        "timeouts": events.timeouts,
+        "quarantined": sorted(entry["path"] for entry in quarantine),
+    })
+
+def process_file(file_path, cached_digest, progress_task, progress, logger, options, profiler=None, save=save_labels):
+    """
+    Process a single Solidity file, remove comments, and run all vulnerability detections.
+    Files whose content hash equals cached_digest are not cleaned, labeled or rewritten.
+    """
+    timings = FileTimings() if profiler is not None else None
+    try:
+        # Load the file, remove comments and detect vulnerabilities
+        outcome = label_file(file_path, cached_digest, options, timings)
+        if outcome is None:
+            logger.warning(f"Could not load file: {file_path}")
+            return None  # Skip if the file could not be loaded
 
         # Save the consolidated JSON result for each contract
-        save_results_as_json(results, output_dir, file_name)
+        _, labels, _ = outcome
+        if labels is not None:
+            save(file_path, labels, timings)
+            if is_quarantined(labels):
+                logger.warning(f"Time budget exceeded, quarantining file: {file_path}")
+
+        if profiler is not None:
+            profiler.add_file(file_path, timings)
 
         # Update progress in a thread-safe manner
         with progress_lock:
@@ -85,15 +302,216 @@ def process_file(file_path, progress_task, progress, logger):
         logger.error(f"Error processing file {file_path}: {e}")
         return None
 
-    return file_path
+    return outcome
 
-def main(quiet_mode):
-    root_directory = "datast"
+def chunked(items, chunk_size):
+    """Lazily split an iterable into consecutive lists of at most chunk_size items."""
+    iterator = iter(items)
+    while chunk := list(islice(iterator, chunk_size)):
+        yield chunk
 
-    # Setup the logger based on the quiet mode flag
-    logger = setup_logger(quiet_mode)
-    
-    num_threads = os.cpu_count() if os.cpu_count() else 4  # Automatically detect the number of threads based on CPU cores
+def submit_bounded(executor, fn, items, max_in_flight):
+    """
+    Submit fn(item) for each item while keeping at most max_in_flight tasks pending.
+
+    Items are pulled from the iterable only when a slot is free, so discovery feeds
+    the workers as it goes and memory does not grow with the corpus size.
+
+    Yields:
+    - (tuple): (future, item) for each completed task.
+    """
+    in_flight = {}
+    for item in items:
+        if len(in_flight) >= max_in_flight:
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield future, in_flight.pop(future)
+        in_flight[executor.submit(fn, item)] = item
+
+    while in_flight:
+        done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+        for future in done:
+            yield future, in_flight.pop(future)
+
+def run_threads(tasks, num_workers, max_in_flight, progress, process_task, logger, on_outcome, options, profiler=None,
+                save=save_labels):
+    """
+    Label files with a thread pool. Suited to small runs, where process startup would dominate.
+    """
+    def run_task(task):
+        file, cached_digest = task
+        # Pass the logger to each thread
+        return process_file(file, cached_digest, process_task, progress, logger, options, profiler, save)
+
+    with ThreadPoolExecutor(max_workers=num_workers) as executor:
+        for future, (file, _) in submit_bounded(executor, run_task, tasks, max_in_flight):
+            try:
+                outcome = future.result()
+                on_outcome(file, outcome)
+            except Exception as e:
+                logger.error(f"Error occurred while processing {file}: {e}")
+
+def run_processes(tasks, num_workers, chunk_size, max_in_flight, quiet_mode, progress, process_task, logger, on_outcome,
+                  options, profiler=None, save=save_labels):
+    """
+    Label files with a process pool, sending chunks of paths to the workers.
+    Workers return compact label tuples; progress reporting, profiling and JSON output stay in this process.
+    """
+    worker = partial(label_chunk, options=options, profile=profiler is not None)
+    with ProcessPoolExecutor(max_workers=num_workers, initializer=init_worker, initargs=(quiet_mode,)) as executor:
+        for future, chunk in submit_bounded(executor, worker, chunked(tasks, chunk_size), max_in_flight):
+            try:
+                chunk_results = future.result()
+            except Exception as e:
+                logger.error(f"Error occurred while processing a chunk starting at {chunk[0][0]}: {e}")
+                for file, _ in chunk:
+                    on_outcome(file, None)
+                progress.advance(process_task, len(chunk))
+                continue
+
+            for file, outcome, timings in chunk_results:
+                if outcome is None:
+                    logger.warning(f"Could not load file: {file}")
+                else:
+                    _, labels, _ = outcome
+                    if labels is not None:
+                        save(file, labels, timings)
+                        if is_quarantined(labels):
+                            logger.warning(f"Time budget exceeded, quarantining file: {file}")
+                if profiler is not None:
+                    profiler.add_file(file, timings)
+                on_outcome(file, outcome)
+                progress.advance(process_task)
+
+def run_async(tasks, num_workers, analyze_executor, settings, quiet_mode, progress, process_task, logger, on_outcome,
+              options, profiler=None, save=save_labels):
+    """
+    Label files with an asyncio pipeline: reader threads, an analysis pool and batched JSON writes.
+
+    Reads and writes run in their own thread pool, so on slow or network filesystems the
+    blocking I/O overlaps with detection instead of holding analysis slots. The analysis
+    stage is a process pool, or a thread pool for small runs.
+    """
+    read_seconds = {}
+
+    def read(task):
+        file_path, cached_digest = task
+        start = time.perf_counter()
+        data = None
+        try:
+            # Files to be streamed are left to label_file; so are unreadable ones, which it reports
+            if options.stream_threshold is None or os.path.getsize(file_path) <= options.stream_threshold:
+                data = read_sol_bytes(file_path)
+        except OSError:
+            pass
+        read_seconds[file_path] = time.perf_counter() - start
+        return file_path, data, cached_digest
+
+    def write(batch):
+        for file, outcome, timings in batch:
+            if outcome is not None and outcome[1] is not None:
+                save(file, outcome[1], timings)
+
+    def on_written(result):
+        file, outcome, timings = result
+        if outcome is None:
+            logger.warning(f"Could not load file: {file}")
+        elif is_quarantined(outcome[1]):
+            logger.warning(f"Time budget exceeded, quarantining file: {file}")
+        read_time = read_seconds.pop(file, None)
+        if profiler is not None:
+            timings.insert(0, ("read", read_time))
+            profiler.add_file(file, timings)
+        on_outcome(file, outcome)
+        progress.advance(process_task)
+
+    analyze = partial(label_read, options=options, profile=profiler is not None)
+    if analyze_executor == "process":
+        cpu_executor = ProcessPoolExecutor(max_workers=num_workers, initializer=init_worker, initargs=(quiet_mode,))
+    else:
+        cpu_executor = ThreadPoolExecutor(max_workers=num_workers)
+    with cpu_executor, ThreadPoolExecutor(max_workers=io_threads(settings)) as io_executor:
+        asyncio.run(run_pipeline(tasks, read, analyze, write, on_written, io_executor, cpu_executor, settings))
+
+def resolve_config(config):
+    """
+    Fill in the settings of a run that depend on others: the worker counts, the disabled
+    time budgets, and the quarantine and summary files, kept in the output directory by
+    default so that runs over different output directories do not overwrite each other's.
+    """
+    num_workers = config.num_workers or os.cpu_count() or 4  # Automatically detect the number of workers based on CPU cores
+    return config._replace(
+        num_workers=num_workers,
+        max_in_flight=config.max_in_flight or num_workers * IN_FLIGHT_PER_WORKER,
+        # A budget of 0 disables the corresponding timeout
+        file_timeout=config.file_timeout or None,
+        detector_timeout=config.detector_timeout or None,
+        quarantine_file=config.quarantine_file or os.path.join(config.output_directory, QUARANTINE_FILE),
+        summary_file=config.summary_file or os.path.join(config.output_directory, RUN_SUMMARY),
+    )
+
+def run_detector_version(config):
+    """Return the detector fingerprint the results of a run are cached under."""
+    # Results with function labels differ from plain ones, so they are cached under their own version
+    if config.function_scope:
+        return "functions-" + detector_fingerprint(DETECTOR_MODULES + FUNCTION_MODULES)
+    return detector_fingerprint()
+
+def run_pass(config, logger, paths=None, profiler=None, shard_writer=None, write_summary=True, detector_version=None):
+    """
+    Label the corpus, or only the given paths, skipping the files the manifest shows as unchanged.
+
+    Args:
+    - config (RunConfig): Settings of the run, as returned by resolve_config.
+    - logger (logging.Logger): Logger of the run.
+    - paths (list | None): Paths of the files to label, None for the whole corpus.
+    - profiler (StageProfiler | None): Collects the stage timings if given.
+    - shard_writer (ShardWriter | None): Receives the labeled contracts for columnar export if given.
+    - write_summary (bool): Write the run summary to config.summary_file.
+    - detector_version (str | None): Fingerprint the results are cached under, computed
+      from the detector code if omitted; watch mode keeps the one of its first pass.
+
+    Returns:
+    - (dict): The summary of the pass, see RunEvents.summary.
+    """
+    # The manifest is saved and the label index synced with it at the end of the pass, so a
+    # pass over a few paths that did not load it would drop every other file from both
+    if paths is not None and not config.use_cache:
+        raise ValueError("A pass over given paths needs the label manifest; run it with use_cache set.")
+
+    output_directory = config.output_directory
+    root_directory = config.root_directory
+    shard = config.shard
+    options = LabelOptions(
+        with_source=shard_writer is not None,
+        file_timeout=config.file_timeout,
+        detector_timeout=config.detector_timeout,
+        load_mode=config.load_mode,
+        stream_threshold=config.stream_threshold,
+        function_scope=config.function_scope,
+    )
+    detector_version = detector_version or run_detector_version(config)
+    save = partial(save_labels, root_directory=root_directory, output_directory=output_directory)
+
+    # Load the manifest of previously labeled files, unless a full relabel was requested
+    manifest = LabelManifest(os.path.join(output_directory, MANIFEST_NAME), detector_version)
+    if config.use_cache:
+        manifest.load()
+
+    # Every completed file is journaled as the run goes, so an interrupted run can be resumed
+    journal = RunJournal(os.path.join(output_directory, JOURNAL_NAME), detector_version)
+    resumed = {}
+    if config.resume:
+        resumed = journal.read()
+        manifest.entries.update(resumed)
+        logger.warning(f"Resuming an interrupted run: {len(resumed)} completed files are skipped if unchanged.")
+    elif journal.exists():
+        logger.warning(f"Found the journal of an interrupted run in {output_directory}; pass --resume to skip its completed files.")
+    journal.open(resumed)
+    manifest.journal = journal
+
+    # Labels are also indexed in SQLite as the run goes, for queries across the corpus
+    index = LabelIndex(default_index_path(output_directory), detector_version, root_directory) if config.use_index else None
 
     # Setup the progress bar
     with Progress(
@@ -103,42 +521,259 @@ def main(quiet_mode):
         TimeElapsedColumn(),
         transient=True
     ) as progress:
-        
-        # Task 1: Discover all .sol files in the dataset directory
-        logger.warning("Discovering Solidity files...")
+
+        # Discovery streams paths to the workers; the totals are filled in once it finishes
+        logger.warning("Discovering and processing Solidity files...")
         discovery_task = progress.add_task("[blue]Discovering Solidity files...", total=None)
-        sol_files = discover_sol_files(root_directory)
-        progress.update(discovery_task, completed=100)
-        logger.warning(f"Discovered {len(sol_files)} Solidity files.")
-
-        # Task 2: Multithreading to process all files
-        logger.warning(f"Processing Solidity files with {num_threads} threads...")
-        process_task = progress.add_task("[blue]Processing Solidity files...", total=len(sol_files))
-        
-        with ThreadPoolExecutor(max_workers=num_threads) as executor:
-            # Pass the logger to each thread
-            futures = {
-                executor.submit(process_file, file, process_task, progress, logger): file
-                for file in sol_files
-            }
-            
-            for future in as_completed(futures):
-                file = futures[future]
-                try:
-                    result = future.result()
-                    if result:
-                        logger.info(f"Completed processing for {file}")
-                except Exception as e:
-                    logger.error(f"Error occurred while processing {file}: {e}")
-
-        logger.warning("Processing complete. Results have been saved to the json_out directory.")
+        process_task = progress.add_task("[blue]Processing Solidity files...", total=None)
+        # Outcomes are counted in memory; per-file events only go to events_file if one is given
+        events = RunEvents(config.events_file)
+        counts = events.counts
+        stats = {}
+        quarantine = []
+        seen_digests = set()
+        discovered_files = set()
+        discovery_complete = False
+
+        def discovered_paths():
+            for file_path in iter_sol_files(root_directory) if paths is None else paths:
+                # A sharded run only sees its own slice of the corpus, manifest pruning included
+                if shard is not None and shard_of(file_path, shard[1], root_directory) != shard[0]:
+                    continue
+                discovered_files.add(file_path)
+                progress.advance(discovery_task)
+                yield file_path
+
+        def discovered_tasks():
+            nonlocal discovery_complete
+            # Skip files whose size and modification time match the manifest
+            yield from plan_files(discovered_paths(), manifest, stats, counts, logger, root_directory, output_directory)
+
+            discovery_complete = True
+            progress.update(discovery_task, total=counts["discovered"], completed=counts["discovered"])
+            progress.update(process_task, total=counts["queued"])
+            in_shard = f" in shard {shard[0]}/{shard[1]}" if shard is not None else ""
+            logger.warning(
+                f"Discovered {counts['discovered']} Solidity files{in_shard}, "
+                f"skipping {counts['skipped']} unchanged files recorded in the label manifest."
+            )
+
+        def on_outcome(file_path, outcome):
+            record_outcome(file_path, outcome, manifest, stats, events, seen_digests, shard_writer, quarantine,
+                           root_directory, index)
+
+        num_workers = config.num_workers
+        completed = False
+        try:
+            if config.executor == "async":
+                logger.warning(f"Processing Solidity files with an async pipeline: {config.readers} readers, "
+                               f"{num_workers} {config.analyze_executor} workers, {config.writers} writers...")
+                settings = StageSettings(config.readers, config.max_in_flight, config.writers, config.queue_size,
+                                         config.write_batch)
+                run_async(discovered_tasks(), num_workers, config.analyze_executor, settings, config.quiet_mode,
+                          progress, process_task, logger, on_outcome, options, profiler, save)
+            elif config.executor == "process":
+                logger.warning(f"Processing Solidity files with {num_workers} processes (chunks of {config.chunk_size} files)...")
+                run_processes(discovered_tasks(), num_workers, config.chunk_size, config.max_in_flight, config.quiet_mode,
+                              progress, process_task, logger, on_outcome, options, profiler, save)
+            else:
+                logger.warning(f"Processing Solidity files with {num_workers} threads...")
+                run_threads(discovered_tasks(), num_workers, config.max_in_flight, progress, process_task, logger,
+                            on_outcome, options, profiler, save)
+            completed = True
+        finally:
+            # Keep the work done so far even if the run is interrupted; the journal is only
+            # dropped once the run is complete, since a killed run never gets here.
+            # A pass over given paths has not seen the rest of the corpus, so it prunes nothing.
+            # The results of deleted files go with their entries, keeping the output tree in
+            # line with the corpus.
+            if discovery_complete and paths is None:
+                deleted = manifest.prune(discovered_files)
+                if deleted:
+                    logger.warning(f"Removing the results of {len(deleted)} deleted files.")
+                    remove_results(deleted, logger, root_directory, output_directory)
+            manifest.save()
+            if completed:
+                journal.remove()
+            else:
+                journal.close()
+            if index is not None:
+                # Once complete, the index is brought in line with the manifest, unchanged files included
+                if completed:
+                    index.sync(manifest.entries, output_directory)
+                index.close()
+            write_quarantine(quarantine, config.quarantine_file, discovered_files if paths is not None else None)
+            if shard is not None:
+                write_shard_summary(shard, detector_version, events, quarantine, completed, root_directory,
+                                    output_directory)
+            if write_summary:
+                events.write_summary(config.summary_file)
+            events.close()
+            if shard_writer is not None:
+                shard_writer.close()
+
+        logger.warning(
+            f"Processing complete: {counts['labeled']} labeled, {counts['skipped'] + counts['unchanged']} unchanged, "
+            f"{counts['failed']} failed. Results have been saved to the {output_directory} directory."
+        )
+        logger.warning(
+            "Positive labels among the files labeled in this run: "
+            + ", ".join(f"{key}={count}" for key, count in events.positives.items()) + "."
+        )
+        if counts["quarantined"]:
+            logger.warning(
+                f"{counts['quarantined']} files exceeded their time budget and were labeled \"timeout\"; "
+                f"they are listed in {config.quarantine_file} and will be retried on the next run."
+            )
+
+        # Each worker keeps its own table of labeled contents, so a duplicate only skips the
+        # detectors when the worker that reads it has labeled the same content before
+        read_files = counts["labeled"] + counts["unchanged"]
+        if read_files:
+            unique_contents = read_files - counts["duplicates"]
+            logger.warning(
+                f"Deduplication: {unique_contents} unique contents in {read_files} files read, "
+                f"{counts['duplicates']} duplicates (dedup ratio {read_files / unique_contents:.2f}x); "
+                f"{counts['reused']} labeling passes saved by the workers' label tables."
+            )
+
+    if profiler is not None:
+        profiler.write_report(config.profile_report)
+    return events.summary()
+
+def next_watch_config(config):
+    """
+    Settings of the passes after the first one in watch mode. Only the first pass resumes an
+    interrupted run, and --force only relabels the corpus on the first pass: the later passes
+    load the manifest, which they save and sync the label index with, so a pass over a few
+    paths must not start from an empty one.
+    """
+    return config._replace(resume=False, use_cache=True)
+
+def main(config=RunConfig()):
+    """
+    Label the corpus once, or keep it labeled in watch mode.
+
+    Returns:
+    - (dict | None): The summary of the run, None in watch mode.
+    """
+    config = resolve_config(config)
+
+    # Setup the logger based on the quiet mode flag
+    logger = setup_logger(config.quiet_mode, config.verbose)
+
+    # Time every stage of every file, including log handling, when profiling
+    profiler = None
+    if config.profile_report:
+        profiler = StageProfiler(slowest=config.profile_top)
+        time_handlers(logger, profiler)
+
+    # A columnar export needs the cleaned source of every contract, so it relabels the whole corpus
+    shard_writer = None
+    if config.export_format:
+        shard_writer = ShardWriter(config.export_dir, config.export_format, config.rows_per_shard)
+        config = config._replace(use_cache=False)
+        logger.warning(f"Exporting {config.export_format} shards to {config.export_dir}; the label manifest is ignored for this run.")
+
+    if not config.watch:
+        return run_pass(config, logger, profiler=profiler, shard_writer=shard_writer)
+
+    # Watch mode: one full pass, then passes over the new and modified files only.
+    # The watcher keeps the cumulative summary file; the passes do not write their own.
+    if shard_writer is not None:
+        raise ValueError("Watch mode cannot be combined with a columnar export, which rewrites every shard.")
+
+    detector_version = run_detector_version(config)
+
+    def watch_pass(paths):
+        nonlocal config
+        pass_summary = run_pass(config, logger, paths, profiler, write_summary=False, detector_version=detector_version)
+        config = next_watch_config(config)
+        return pass_summary
+
+    watch_corpus(watch_pass, config.root_directory, config.output_directory, config.summary_file,
+                 config.quarantine_file, config.poll_interval)
 
 if __name__ == "__main__":
     # Setup argument parser
     parser = argparse.ArgumentParser(description="Solidity vulnerability detection script.")
-    parser.add_argument('-q', '--quiet', action='store_true', help="Suppress log output except for warnings and errors.")
-    
+    parser.add_argument('-q', '--quiet', action='store_true', help="Suppress log output except for errors.")
+    parser.add_argument('-v', '--verbose', action='store_true', help="Also log per-file debug and info detail to the console.")
+    parser.add_argument('--executor', choices=["thread", "process", "async"], default="thread",
+                        help="Run detection in a thread pool (small runs), in a process pool that uses every core (large runs), "
+                             "or in an async pipeline with separate read, analysis and write stages (slow filesystems).")
+    parser.add_argument('--root', default=ROOT_DIRECTORY, help=f"Root directory of the Solidity corpus (default: {ROOT_DIRECTORY}).")
+    parser.add_argument('--output-dir', default=OUTPUT_DIRECTORY,
+                        help=f"Directory of the JSON results and the label manifest (default: {OUTPUT_DIRECTORY}).")
+    parser.add_argument('--watch', action='store_true',
+                        help="Keep running: poll the corpus for new or modified files, label them and keep the summary file up to date.")
+    parser.add_argument('--poll-interval', type=float, default=DEFAULT_POLL_INTERVAL,
+                        help=f"Seconds between two polls of the corpus in watch mode (default: {DEFAULT_POLL_INTERVAL:g}).")
+    parser.add_argument('-j', '--workers', type=int, default=None, help="Number of worker threads or processes (default: CPU count).")
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE,
+                        help="Number of files sent to a worker process per task in process mode.")
+    parser.add_argument('--max-in-flight', type=int, default=None,
+                        help="Maximum number of submitted tasks (files in thread and async mode, chunks in process mode) "
+                             f"waiting for results (default: {IN_FLIGHT_PER_WORKER} per worker).")
+    parser.add_argument('--analyze-executor', choices=["process", "thread"], default="process",
+                        help="Pool of the analysis stage in async mode.")
+    parser.add_argument('--readers', type=int, default=DEFAULT_READERS,
+                        help=f"Number of files read at the same time in async mode (default: {DEFAULT_READERS}).")
+    parser.add_argument('--writers', type=int, default=DEFAULT_WRITERS,
+                        help=f"Number of JSON batches written at the same time in async mode (default: {DEFAULT_WRITERS}).")
+    parser.add_argument('--queue-size', type=int, default=DEFAULT_QUEUE_SIZE,
+                        help=f"Maximum number of files waiting between two stages in async mode (default: {DEFAULT_QUEUE_SIZE}).")
+    parser.add_argument('--write-batch', type=int, default=DEFAULT_WRITE_BATCH,
+                        help=f"Maximum number of JSON results written per batch in async mode (default: {DEFAULT_WRITE_BATCH}).")
+    parser.add_argument('--no-index', action='store_true',
+                        help="Do not maintain the SQLite label index in the output directory (query it with label_index.py).")
+    parser.add_argument('--force', action='store_true', help="Ignore the label manifest and relabel every file.")
+    parser.add_argument('--shard', type=parse_shard, default=None, metavar="i/N",
+                        help="Only label the files of shard i of N (0 <= i < N), split by a stable hash of their path, "
+                             "so N machines can label disjoint slices of a shared corpus; combine them with merge_shards.py.")
+    parser.add_argument('--resume', action='store_true',
+                        help="Skip the files completed by an interrupted run, as listed in its journal, even with --force.")
+    parser.add_argument('--load', choices=LOAD_MODES, default="text",
+                        help="Decode files to text, or memory-map them and label the raw bytes (no decode or copy, any encoding).")
+    parser.add_argument('--stream', nargs='?', type=int, const=DEFAULT_STREAM_THRESHOLD, default=None, metavar="BYTES",
+                        help="Label files larger than BYTES in fixed-size windows with flat memory use "
+                             f"(default: {DEFAULT_STREAM_THRESHOLD} bytes). Ignored for files exported with --export.")
+    parser.add_argument('--functions', action='store_true',
+                        help="Also label each function, with modifiers applied per function, in a \"functions\" list of each JSON result.")
+    parser.add_argument('--file-timeout', type=float, default=DEFAULT_FILE_TIMEOUT,
+                        help=f"Time budget of each file in seconds, 0 to disable (default: {DEFAULT_FILE_TIMEOUT:g}).")
+    parser.add_argument('--detector-timeout', type=float, default=DEFAULT_DETECTOR_TIMEOUT,
+                        help=f"Time budget of each detector in seconds, 0 to disable (default: {DEFAULT_DETECTOR_TIMEOUT:g}).")
+    parser.add_argument('--quarantine', default=None,
+                        help=f"File listing the files that exceeded their time budget (default: {QUARANTINE_FILE} in the output directory).")
+    parser.add_argument('--summary', default=None,
+                        help="File of the aggregate run summary: outcomes, positives per vulnerability, errors "
+                             f"(default: {RUN_SUMMARY} in the output directory).")
+    parser.add_argument('--events', default=None, metavar="JSONL",
+                        help="Write one JSON event per file read (path, status, hash, labels) to this buffered JSONL file.")
+    parser.add_argument('--profile', nargs='?', const=PROFILE_REPORT, default=None, metavar="REPORT",
+                        help=f"Time every stage of every file and write a JSON and console report (default: {PROFILE_REPORT}).")
+    parser.add_argument('--profile-top', type=int, default=DEFAULT_SLOWEST, help="Number of slowest files reported per stage.")
+    parser.add_argument('--export', choices=sorted(SHARD_EXTENSIONS), default=None,
+                        help="Also write path, content hash, cleaned source and labels as sharded Parquet or Arrow IPC files.")
+    parser.add_argument('--export-dir', default=SHARD_DIRECTORY, help=f"Directory of the exported shards (default: {SHARD_DIRECTORY}).")
+    parser.add_argument('--shard-rows', type=int, default=DEFAULT_ROWS_PER_SHARD, help="Maximum number of contracts per shard.")
+
     args = parser.parse_args()
-    
-    # Run the main function with the quiet mode flag
-    main(quiet_mode=args.quiet)
+    if args.resume and args.export:
+        parser.error("--resume cannot be combined with --export, which rewrites every shard.")
+    if args.watch and args.export:
+        parser.error("--watch cannot be combined with --export, which rewrites every shard.")
+
+    # Run the main function with the selected options
+    main(RunConfig(
+        quiet_mode=args.quiet, verbose=args.verbose, executor=args.executor, analyze_executor=args.analyze_executor,
+        num_workers=args.workers, chunk_size=args.chunk_size, max_in_flight=args.max_in_flight, readers=args.readers,
+        writers=args.writers, queue_size=args.queue_size, write_batch=args.write_batch, use_cache=not args.force,
+        resume=args.resume, export_format=args.export, export_dir=args.export_dir, rows_per_shard=args.shard_rows,
+        profile_report=args.profile, profile_top=args.profile_top, file_timeout=args.file_timeout,
+        detector_timeout=args.detector_timeout, load_mode=args.load, stream_threshold=args.stream,
+        function_scope=args.functions, quarantine_file=args.quarantine, summary_file=args.summary,
+        events_file=args.events, shard=args.shard, root_directory=args.root, output_directory=args.output_dir,
+        watch=args.watch, poll_interval=args.poll_interval, use_index=not args.no_index,
+    ))
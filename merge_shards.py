@@ -0,0 +1,243 @@
+import os
+import sys
+import json
+import shutil
+import logging
+import argparse
+from rich.logging import RichHandler
+
+from file_loader import iter_sol_files, shard_of
+from labeler import OUTPUT_DIRECTORY, output_location
+from label_cache import MANIFEST_NAME, SHARD_SUMMARY_NAME, LabelManifest
+from label_index import LabelIndex, default_index_path
+from json_saver import write_json_atomic
+
+# Setup logging with rich handler
+log = logging.getLogger(__name__)
+
+# Name of the summary of the merged run, written at the top of the merged output directory
+MERGE_SUMMARY_NAME = ".merge_summary.json"
+
+
+def load_shard(shard_dir):
+    """
+    Load the summary and manifest written by a `main.py --shard i/N` run.
+
+    Args:
+    - shard_dir (str): The output directory of the sharded run.
+
+    Returns:
+    - (dict | None): {"dir", "summary", "entries"}, or None if the directory holds no shard summary.
+    """
+    try:
+        with open(os.path.join(shard_dir, SHARD_SUMMARY_NAME), "r") as f:
+            summary = json.load(f)
+    except (OSError, json.JSONDecodeError) as e:
+        log.error(f"{shard_dir} is not the output of a sharded run: {e}")
+        return None
+
+    entries = {}
+    try:
+        with open(os.path.join(shard_dir, MANIFEST_NAME), "r") as f:
+            manifest = json.load(f)
+        if manifest.get("detector_version") == summary["detector_version"]:
+            entries = manifest.get("files", {})
+    except (OSError, json.JSONDecodeError) as e:
+        log.error(f"Could not read the manifest of {shard_dir}: {e}")
+    return {"dir": shard_dir, "summary": summary, "entries": entries}
+
+
+def corpus_path(file_path, root_directory):
+    """
+    Return the path of a file relative to the corpus root, with forward slashes: the path
+    shard_of hashes, which names the same file on every node whatever its mount point.
+    """
+    return os.path.relpath(file_path, root_directory).replace(os.sep, "/")
+
+
+def check_coverage(shards, corpus_files=None, root_directory=None):
+    """
+    Check that the shards cover the corpus exactly once. Files are compared by their path
+    relative to the root each shard ran on, so shards labeled on nodes that mount the
+    corpus at different roots are checked against each other.
+
+    Args:
+    - shards (list): Loaded shards, see load_shard.
+    - corpus_files (iterable | None): Paths of the whole corpus, to find the files no shard
+      labeled; only the shards are cross-checked if None.
+    - root_directory (str | None): The corpus root of corpus_files.
+
+    Returns:
+    - (dict): The coverage report, with paths relative to the corpus root. Every list is
+      empty for a complete, disjoint merge.
+    """
+    num_shards = {shard["summary"]["num_shards"] for shard in shards}
+    versions = {shard["summary"]["detector_version"] for shard in shards}
+    count = max(num_shards) if num_shards else 0
+    indices = [shard["summary"]["shard"] for shard in shards]
+
+    owners = {}
+    misassigned = []
+    quarantined = set()
+    for shard in shards:
+        summary = shard["summary"]
+        quarantined.update(corpus_path(file_path, summary["root_directory"]) for file_path in summary["quarantined"])
+        for file_path in shard["entries"]:
+            relative_path = corpus_path(file_path, summary["root_directory"])
+            owners.setdefault(relative_path, []).append(summary["shard"])
+            if shard_of(file_path, summary["num_shards"], summary["root_directory"]) != summary["shard"]:
+                misassigned.append(relative_path)
+
+    missing = []
+    if corpus_files is not None:
+        corpus_paths = (corpus_path(file_path, root_directory) for file_path in corpus_files)
+        missing = sorted(path for path in corpus_paths if path not in owners and path not in quarantined)
+
+    return {
+        "num_shards": sorted(num_shards),
+        "detector_versions": sorted(versions),
+        "missing_shards": sorted(set(range(count)) - set(indices)),
+        "duplicate_shards": sorted({index for index in indices if indices.count(index) > 1}),
+        "incomplete_shards": sorted(shard["summary"]["shard"] for shard in shards if not shard["summary"]["completed"]),
+        "overlapping": {path: owner for path, owner in sorted(owners.items()) if len(owner) > 1},
+        "misassigned": sorted(misassigned),
+        "missing": missing,
+        "quarantined": sorted(quarantined),
+    }
+
+
+def coverage_problems(report):
+    """Return a line per coverage problem of a report, empty if the merge is complete and disjoint."""
+    problems = []
+    if len(report["num_shards"]) > 1:
+        problems.append(f"Shards were split with different shard counts: {report['num_shards']}")
+    if len(report["detector_versions"]) > 1:
+        problems.append(f"Shards were labeled with different detector versions: {report['detector_versions']}")
+    for key, description in (
+        ("missing_shards", "shards missing"),
+        ("duplicate_shards", "shards given more than once"),
+        ("incomplete_shards", "shards whose run did not complete"),
+        ("overlapping", "files labeled by more than one shard"),
+        ("misassigned", "files labeled by a shard they do not belong to"),
+        ("missing", "corpus files labeled by no shard"),
+    ):
+        if report[key]:
+            problems.append(f"{len(report[key])} {description}")
+    return problems
+
+
+def merge_shards(shard_dirs, output_dir=OUTPUT_DIRECTORY, root_directory=None):
+    """
+    Combine the JSON results and manifests of sharded runs into one output tree, and index it.
+
+    Results are copied to the location main.py gives them, so the merged tree and its
+    manifest look like those of a single run over root_directory: manifest entries are
+    moved from the root each shard ran on to root_directory. A file labeled by several
+    shards is taken from the lowest shard index.
+
+    Args:
+    - shard_dirs (list): Output directories of the sharded runs.
+    - output_dir (str): The merged output directory.
+    - root_directory (str | None): The corpus root on this machine, which the merged
+      manifest and index refer to and where files labeled by no shard are looked for;
+      defaults to the root recorded by the first shard.
+
+    Returns:
+    - (dict): The merge summary: summed counters, number of copied results and the coverage report.
+    """
+    shards = [shard for shard in map(load_shard, shard_dirs) if shard is not None]
+    shards.sort(key=lambda shard: shard["summary"]["shard"])
+    if len(shards) < len(shard_dirs):
+        raise ValueError("Some directories are not the output of a sharded run.")
+    if not shards:
+        raise ValueError("No shards to merge.")
+
+    if root_directory is None:
+        root_directory = shards[0]["summary"]["root_directory"]
+    corpus_files = list(iter_sol_files(root_directory)) if os.path.isdir(root_directory) else None
+    if corpus_files is None:
+        log.warning(f"Corpus {root_directory} not found, only cross-checking the shards.")
+    report = check_coverage(shards, corpus_files, root_directory)
+
+    manifest = LabelManifest(os.path.join(output_dir, MANIFEST_NAME), shards[0]["summary"]["detector_version"])
+    counts, positives, timeouts = {}, {}, {}
+    copied = 0
+    missing_results = []
+    for shard in shards:
+        summary = shard["summary"]
+        for total, shard_counts in ((counts, summary["counts"]), (positives, summary.get("positives", {})),
+                                    (timeouts, summary.get("timeouts", {}))):
+            for key, value in shard_counts.items():
+                total[key] = total.get(key, 0) + value
+
+        for file_path, entry in shard["entries"].items():
+            relative_path = corpus_path(file_path, summary["root_directory"])
+            merged_path = os.path.join(root_directory, *relative_path.split("/"))
+            if merged_path in manifest.entries:
+                continue
+            source_dir, file_name = output_location(file_path, summary["root_directory"], shard["dir"])
+            target_dir, _ = output_location(merged_path, root_directory, output_dir)
+            source = os.path.join(source_dir, f"{file_name}.json")
+            target = os.path.join(target_dir, f"{file_name}.json")
+            if not os.path.exists(source):
+                missing_results.append(relative_path)
+                continue
+            if os.path.abspath(source) != os.path.abspath(target):
+                os.makedirs(target_dir, exist_ok=True)
+                shutil.copyfile(source, target)
+            manifest.entries[merged_path] = entry
+            copied += 1
+
+    manifest.save()
+
+    # Index the merged results, reading the rows of each shard back from its JSON files
+    index = LabelIndex(default_index_path(output_dir), manifest.detector_version, root_directory)
+    index.sync(manifest.entries, output_dir)
+    index.close()
+
+    report["missing_results"] = sorted(missing_results)
+    merge_summary = {
+        "shards": [shard["dir"] for shard in shards],
+        "counts": counts,
+        "positives": positives,
+        "timeouts": timeouts,
+        "results": copied,
+        "coverage": report,
+    }
+    write_json_atomic(os.path.join(output_dir, MERGE_SUMMARY_NAME), merge_summary)
+    log.info(f"Merged {copied} results from {len(shards)} shards into {output_dir}")
+    return merge_summary
+
+
+# Example usage: python merge_shards.py node0/json_out node1/json_out node2/json_out --output json_out
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Merge the outputs of `main.py --shard i/N` runs and check their coverage.")
+    parser.add_argument('shard_dirs', nargs='+', help="Output directories of the sharded runs.")
+    parser.add_argument('--output', default=OUTPUT_DIRECTORY, help=f"Merged output directory (default: {OUTPUT_DIRECTORY}).")
+    parser.add_argument('--root', default=None,
+                        help="Corpus root on this machine, for the merged manifest and to find files labeled by no shard "
+                             "(default: the root recorded by the first shard).")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s", handlers=[RichHandler()])
+    try:
+        summary = merge_shards(args.shard_dirs, args.output, args.root)
+    except ValueError as e:
+        log.error(str(e))
+        sys.exit(2)
+
+    counts = summary["counts"]
+    log.info(
+        f"{counts.get('labeled', 0)} labeled, {counts.get('skipped', 0) + counts.get('unchanged', 0)} unchanged, "
+        f"{counts.get('failed', 0)} failed, {counts.get('quarantined', 0)} quarantined across the shards."
+    )
+    log.info("Positive labels: " + ", ".join(f"{key}={count}" for key, count in summary["positives"].items()))
+    problems = coverage_problems(summary["coverage"])
+    if summary["coverage"]["missing_results"]:
+        problems.append(f"{len(summary['coverage']['missing_results'])} manifest entries without a JSON result")
+    for problem in problems:
+        log.error(problem)
+    if problems:
+        log.error(f"Coverage check failed, see {os.path.join(args.output, MERGE_SUMMARY_NAME)} for the files concerned.")
+        sys.exit(1)
+    log.info("Coverage check passed: every file is labeled by exactly one shard.")
@@ -0,0 +1,203 @@
+import os
+import json
+import heapq
+import logging
+import threading
+import time
+from array import array
+
+# Setup logging with rich handler
+log = logging.getLogger(__name__)
+
+# Default file of the JSON profile report and number of slowest files kept per stage
+PROFILE_REPORT = "profile_report.json"
+DEFAULT_SLOWEST = 5
+
+
+def percentile(sorted_values, fraction):
+    """Return the nearest-rank percentile of an already sorted sequence."""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+def log2_histogram(values):
+    """Bucket durations by powers of two of microseconds: {"<=1us": n, "<=2us": n, ...}."""
+    histogram = {}
+    for value in values:
+        bucket = 1
+        micros = value * 1e6
+        while bucket < micros:
+            bucket *= 2
+        histogram[bucket] = histogram.get(bucket, 0) + 1
+    return {f"<={bucket}us": histogram[bucket] for bucket in sorted(histogram)}
+
+
+def worker_name():
+    """Name of the calling worker: its process id and thread name."""
+    return f"{os.getpid()}/{threading.current_thread().name}"
+
+
+class FileTimings(list):
+    """
+    The (stage, seconds) pairs measured while processing one file, tagged with the
+    worker that measured them. The tag travels with the list when a worker process
+    sends it back, so the parent can aggregate the timings per worker.
+    """
+
+    def __init__(self, *args):
+        super().__init__(*args)
+        self.worker = worker_name()
+
+
+class StageProfiler:
+    """
+    Collect per-stage latencies of a labeling run, aggregated per worker.
+
+    Workers time the stages of each file into a FileTimings list and hand it over once
+    per file with add_file, so the lock is taken once per file. Each worker's samples
+    are kept apart and only merged into the per-stage figures when the report is made.
+    """
+
+    def __init__(self, slowest=DEFAULT_SLOWEST):
+        self.slowest = slowest
+        self.samples = {}  # worker -> stage -> array of durations in seconds
+        self.files = {}  # worker -> number of files
+        self.slowest_files = {}  # stage -> min-heap of (seconds, file_path)
+        self.lock = threading.Lock()
+        self.started = time.perf_counter()
+
+    def add(self, stage, seconds, file_path=None, worker=None):
+        """Record one duration for a stage, by default for the calling worker."""
+        with self.lock:
+            self._add(worker or worker_name(), stage, seconds, file_path)
+
+    def add_file(self, file_path, timings):
+        """Record the (stage, seconds) pairs measured while processing one file, for the worker that measured them."""
+        worker = getattr(timings, "worker", None) or worker_name()
+        with self.lock:
+            self.files[worker] = self.files.get(worker, 0) + 1
+            for stage, seconds in timings:
+                self._add(worker, stage, seconds, file_path)
+
+    def _add(self, worker, stage, seconds, file_path):
+        self.samples.setdefault(worker, {}).setdefault(stage, array("d")).append(seconds)
+        if file_path is None:
+            return
+        heap = self.slowest_files.setdefault(stage, [])
+        if len(heap) < self.slowest:
+            heapq.heappush(heap, (seconds, file_path))
+        elif seconds > heap[0][0]:
+            heapq.heapreplace(heap, (seconds, file_path))
+
+    def summary(self):
+        """
+        Summarize the collected samples.
+
+        Returns:
+        - (dict): Wall time of the run; for each stage, the count, total, mean, p50, p95
+          and max in milliseconds over all workers, a log2 histogram and the slowest files;
+          and for each worker, its number of files and the count and total of each stage.
+        """
+        with self.lock:
+            merged = {}
+            workers = {}
+            for worker, samples in sorted(self.samples.items()):
+                workers[worker] = {
+                    "files": self.files.get(worker, 0),
+                    "stages": {
+                        stage: {"count": len(values), "total_ms": sum(values) * 1e3}
+                        for stage, values in samples.items()
+                    },
+                }
+                for stage, values in samples.items():
+                    merged.setdefault(stage, array("d")).extend(values)
+
+            stages = {}
+            for stage, values in merged.items():
+                ordered = sorted(values)
+                total = sum(ordered)
+                stages[stage] = {
+                    "count": len(ordered),
+                    "total_ms": total * 1e3,
+                    "mean_ms": total / len(ordered) * 1e3,
+                    "p50_ms": percentile(ordered, 0.50) * 1e3,
+                    "p95_ms": percentile(ordered, 0.95) * 1e3,
+                    "max_ms": ordered[-1] * 1e3,
+                    "histogram": log2_histogram(ordered),
+                    "slowest_files": [
+                        {"file": file_path, "ms": seconds * 1e3}
+                        for seconds, file_path in sorted(self.slowest_files.get(stage, []), reverse=True)
+                    ],
+                }
+        return {"wall_time_s": time.perf_counter() - self.started, "stages": stages, "workers": workers}
+
+    def write_report(self, report_path=PROFILE_REPORT, console=None):
+        """
+        Write the summary as JSON and print a per-stage table with the slowest files.
+
+        Args:
+        - report_path (str): Path of the JSON report.
+        - console (rich.console.Console | None): Console to print to; a new one is created if omitted.
+        """
+        from rich.console import Console
+        from rich.table import Table
+
+        summary = self.summary()
+        with open(report_path, "w") as f:
+            json.dump(summary, f, indent=4)
+
+        table = Table(title=f"Stage latencies (wall time {summary['wall_time_s']:.2f}s)")
+        table.add_column("Stage", no_wrap=True)
+        for column in ("Count", "Total s", "Mean ms", "p50 ms", "p95 ms", "Max ms"):
+            table.add_column(column, justify="right")
+
+        ordered_stages = sorted(summary["stages"].items(), key=lambda item: -item[1]["total_ms"])
+        for stage, stats in ordered_stages:
+            table.add_row(
+                stage,
+                str(stats["count"]),
+                f"{stats['total_ms'] / 1e3:.3f}",
+                f"{stats['mean_ms']:.3f}",
+                f"{stats['p50_ms']:.3f}",
+                f"{stats['p95_ms']:.3f}",
+                f"{stats['max_ms']:.3f}",
+            )
+
+        worker_table = Table(title="Per-worker totals")
+        worker_table.add_column("Worker", no_wrap=True)
+        for column in ("Files", "Total s", "Mean ms/file"):
+            worker_table.add_column(column, justify="right")
+        for worker, stats in summary["workers"].items():
+            total_ms = sum(stage["total_ms"] for stage in stats["stages"].values())
+            files = stats["files"]
+            worker_table.add_row(worker, str(files), f"{total_ms / 1e3:.3f}", f"{total_ms / files:.3f}" if files else "-")
+
+        console = console or Console()
+        console.print(table)
+        console.print(worker_table)
+
+        # Slowest files of each stage
+        for stage, stats in ordered_stages:
+            if stats["slowest_files"]:
+                console.print(f"[bold]{stage}[/bold] slowest files:")
+                for entry in stats["slowest_files"]:
+                    console.print(f"  {entry['ms']:10.3f} ms  {entry['file']}", highlight=False)
+
+        console.print(f"Profile report written to {report_path}")
+
+
+def time_handlers(logger, profiler, stage="logging"):
+    """Wrap the handlers of a logger so the time spent formatting and emitting records is profiled."""
+    for handler in logger.handlers:
+        handle = handler.handle
+
+        def timed_handle(record, handle=handle):
+            start = time.perf_counter()
+            try:
+                return handle(record)
+            finally:
+                profiler.add(stage, time.perf_counter() - start)
+
+        handler.handle = timed_handle
@@ -1,64 +1,194 @@
 import re
+import bisect
 import logging
 
 # Setup logging with rich handler
 log = logging.getLogger(__name__)
 
+# Run of code up to the next comment: anything but quotes and slashes, whole string
+# literals (including hex"..." and unicode"..."; an unterminated literal ends at the line end),
+# and slashes that do not start a comment. The alternatives start with different
+# characters, so the run is matched in linear time without backtracking.
+CODE_PIECE = (
+    r'''[^"'/]+'''
+    r'''|"[^"\\\n]*(?:\\.[^"\\\n]*)*"?'''
+    r'''|'[^'\\\n]*(?:\\.[^'\\\n]*)*'?'''
+    r'''|/(?![/*])'''
+)
+CODE_RUN = re.compile(f"(?:{CODE_PIECE})*", re.DOTALL)
+
+# The same lexer for raw bytes and memory-mapped files: (code run, line comment start,
+# newline, block comment end, empty value) for each content type
+CODE_RUN_BYTES = re.compile(CODE_RUN.pattern.encode('ascii'), re.DOTALL)
+LEXER_TOKENS = {
+    str: (CODE_RUN, '//', '\n', '*/', ''),
+    bytes: (CODE_RUN_BYTES, b'//', b'\n', b'*/', b''),
+}
+
+# A single piece of a code run in raw bytes, for callers that need to know where the
+# string literals of a run are
+CODE_PIECE_BYTES = re.compile(CODE_PIECE.encode('ascii'), re.DOTALL)
+
+# Regex used before the lexer; it also strips `//` inside string literals
+COMMENT_PATTERN = re.compile(r'//.*?$|/\*.*?\*/', re.DOTALL | re.MULTILINE)
+
+
+def strip_comments(sol_content):
+    """
+    Remove single-line (//) and multi-line (/* */) comments from Solidity content in a single pass.
+
+    String and hex literals are kept intact, so `//` or `/*` inside them is not treated as a
+    comment. Line comments keep their terminating newline; an unterminated block comment
+    runs to the end of the file.
+
+    Args:
+    - sol_content (str | bytes | mmap.mmap): The content of the Solidity source code, decoded or raw.
+
+    Returns:
+    - (str | bytes): The Solidity source code with comments removed, as str for str content
+      and as bytes otherwise.
+    - (list): Offset map of (cleaned_offset, original_offset) pairs, one for each kept
+      segment of the source, for use with original_offset().
+    """
+    cleaned_content, offset_map, _ = lex_comments(sol_content)
+    return cleaned_content, offset_map
+
+
+def lex_comments(sol_content, in_block_comment=False):
+    """
+    Lexer behind strip_comments, which can also resume inside a block comment.
+
+    Args:
+    - sol_content (str | bytes | mmap.mmap): The content of the Solidity source code.
+    - in_block_comment (bool): The content starts inside a block comment opened earlier.
+
+    Returns:
+    - (str | bytes): The content with comments removed.
+    - (list): Offset map of (cleaned_offset, original_offset) pairs.
+    - (bool): True if the content ends inside an unterminated block comment.
+    """
+    code_run, line_start, newline, block_end, empty = LEXER_TOKENS[str if isinstance(sol_content, str) else bytes]
+    pieces = []
+    offset_map = []
+    cleaned_length = 0
+    content_length = len(sol_content)
+    position = 0
+
+    if in_block_comment:
+        comment_end = sol_content.find(block_end)
+        if comment_end == -1:
+            return empty, offset_map, True
+        position = comment_end + 2
+
+    while position < content_length:
+        # Keep the code (and string literals) up to the next comment
+        code_end = code_run.match(sol_content, position).end()
+        if code_end > position:
+            offset_map.append((cleaned_length, position))
+            pieces.append(sol_content[position:code_end])
+            cleaned_length += code_end - position
+        if code_end >= content_length:
+            break
+
+        # Skip the comment itself
+        if sol_content[code_end:code_end + 2] == line_start:
+            comment_end = sol_content.find(newline, code_end + 2)
+            position = content_length if comment_end == -1 else comment_end
+        else:
+            comment_end = sol_content.find(block_end, code_end + 2)
+            if comment_end == -1:
+                return empty.join(pieces), offset_map, True
+            position = comment_end + 2
+
+    return empty.join(pieces), offset_map, False
+
+
+def original_offset(offset_map, cleaned_offset):
+    """
+    Map an offset in the cleaned source back to the original source.
+
+    Args:
+    - offset_map (list): The offset map returned by strip_comments.
+    - cleaned_offset (int): Offset in the cleaned source code.
+
+    Returns:
+    - (int): The corresponding offset in the original source code.
+    """
+    index = bisect.bisect_right(offset_map, (cleaned_offset, float("inf"))) - 1
+    if index < 0:
+        return cleaned_offset
+    segment_cleaned, segment_original = offset_map[index]
+    return segment_original + cleaned_offset - segment_cleaned
+
+
 def remove_comments(sol_content):
     """
     Remove single-line (//) and multi-line (/* */) comments from Solidity content.
-    
+
     Args:
-    - sol_content (str): The content of the Solidity source code.
-    
+    - sol_content (str | bytes | mmap.mmap): The content of the Solidity source code.
+
     Returns:
-    - (str): The Solidity source code with comments removed.
+    - (str | bytes): The Solidity source code with comments removed.
     """
-    
-    # Regex pattern to match single-line comments (//...) and multi-line comments (/*...*/)
-    comment_pattern = re.compile(r'//.*?$|/\*.*?\*/', re.DOTALL | re.MULTILINE)
-    
-    # Remove comments from the Solidity content
-    cleaned_content = re.sub(comment_pattern, '', sol_content)
-    
+
+    # Remove comments with the single-pass lexer, leaving string literals intact
+    cleaned_content, _ = strip_comments(sol_content)
+
     # Log the removal operation
     log.info("Comments removed from Solidity file.")
-    
+
     return cleaned_content
 
 
+def remove_comments_regex(sol_content):
+    """
+    Remove comments with the regex used before the lexer. Kept for benchmarking;
+    unlike remove_comments it also strips `//` and `/*` inside string literals.
+    """
+    return COMMENT_PATTERN.sub('', sol_content)
+
+
 def remove_comments_from_all_files(sol_files_content):
     """
     Remove comments from all Solidity files in the provided dictionary.
-    
+
     Args:
     - sol_files_content (dict): A dictionary of {file_path: content}.
-    
+
     Returns:
     - cleaned_files_content (dict): A dictionary of {file_path: cleaned_content}, where comments are removed.
     """
     cleaned_files_content = {}
-    
+
     for file_path, content in sol_files_content.items():
         log.info(f"Processing file to remove comments: {file_path}")
         cleaned_content = remove_comments(content)
         cleaned_files_content[file_path] = cleaned_content
-    
+
     return cleaned_files_content
 
 
-# Example usage:
+# Example usage: benchmark the lexer against the regex on multi-megabyte flattened files
 if __name__ == "__main__":
-    from file_loader import discover_sol_files, load_all_sol_files
-    
-    # Discover Solidity files
-    root_directory = "datast"
-    sol_files = discover_sol_files(root_directory)
-    
-    # Load contents of Solidity files
-    sol_files_content = load_all_sol_files(sol_files)
-    
-    # Remove comments from all files
-    cleaned_sol_files_content = remove_comments_from_all_files(sol_files_content)
-    
-    # Now cleaned_sol_files_content contains Solidity files with comments removed
+    import sys
+    import time
+    from file_loader import discover_sol_files, load_sol_file
+
+    # Discover Solidity files and concatenate them into large flattened sources
+    root_directory = sys.argv[1] if len(sys.argv) > 1 else "datast"
+    target_size = int(sys.argv[2]) if len(sys.argv) > 2 else 4 * 1024 * 1024
+    logging.disable(logging.CRITICAL)
+
+    contents = [load_sol_file(path) for path in discover_sol_files(root_directory)]
+    corpus = "\n".join(content for content in contents if content)
+    if not corpus:
+        sys.exit(f"No Solidity files found in {root_directory}")
+    flattened = corpus * max(1, target_size // len(corpus))
+
+    for name, strip in (("regex", remove_comments_regex), ("lexer", remove_comments)):
+        start = time.perf_counter()
+        cleaned = strip(flattened)
+        elapsed = time.perf_counter() - start
+        print(f"{name}: {len(flattened) / 1e6:.1f} MB in {elapsed:.3f}s "
+              f"({len(flattened) / 1e6 / elapsed:.1f} MB/s), {len(cleaned) / 1e6:.1f} MB kept")
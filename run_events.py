@@ -0,0 +1,94 @@
+import json
+import time
+import logging
+
+from labeler import LABEL_KEYS
+from json_saver import write_json_atomic
+
+# Setup logging with rich handler
+log = logging.getLogger(__name__)
+
+# Default name of the aggregate summary of the last run in the output directory
+RUN_SUMMARY = ".run_summary.json"
+
+# Write buffer of the per-file event sink; events reach the disk in blocks of this size
+EVENT_BUFFER_SIZE = 1 << 20
+
+# Number of failed and quarantined files listed by path in the summary
+MAX_LISTED_FILES = 100
+
+# Outcome of a file that was read in this run
+FILE_STATUSES = ("labeled", "unchanged", "failed", "quarantined")
+
+
+class RunEvents:
+    """
+    Structured outcomes of a labeling run.
+
+    Each file outcome updates in-memory counters: per status, and per detector for the
+    files labeled in this run. The aggregate is written once at the end, instead of several
+    formatted console lines per file. Per-file events are opt-in and go to a buffered
+    JSONL file, one object per line.
+    """
+
+    def __init__(self, events_file=None):
+        self.counts = {"discovered": 0, "skipped": 0, "queued": 0, "labeled": 0, "unchanged": 0, "failed": 0,
+                       "duplicates": 0, "reused": 0, "quarantined": 0}
+        self.positives = dict.fromkeys(LABEL_KEYS, 0)
+        self.timeouts = dict.fromkeys(LABEL_KEYS, 0)
+        self.listed = {"failed": [], "quarantined": []}
+        self.started = time.time()
+        self.events_file = events_file
+        self.sink = open(events_file, "w", buffering=EVENT_BUFFER_SIZE) if events_file else None
+
+    def file_outcome(self, file_path, status, digest=None, labels=None):
+        """
+        Record the outcome of a file that was read.
+
+        Args:
+        - file_path (str): Path to the Solidity file.
+        - status (str): One of FILE_STATUSES.
+        - digest (str | None): Content hash of the file, None if it could not be loaded.
+        - labels (tuple | None): The labels ordered as LABEL_KEYS, None unless the file was labeled in this run.
+        """
+        self.counts[status] += 1
+        if status in self.listed and len(self.listed[status]) < MAX_LISTED_FILES:
+            self.listed[status].append(file_path)
+        if labels is not None:
+            for key, label in zip(LABEL_KEYS, labels):
+                if label is True:
+                    self.positives[key] += 1
+                elif label is not False:
+                    self.timeouts[key] += 1
+
+        if self.sink is not None:
+            event = {"path": file_path, "status": status, "sha256": digest}
+            if labels is not None:
+                event.update(zip(LABEL_KEYS, labels))
+            self.sink.write(json.dumps(event) + "\n")
+
+    def summary(self):
+        """
+        Return the aggregate of the run. positives and timeouts only count the files labeled
+        in this run, since unchanged and skipped files are not relabeled.
+        """
+        return {
+            "elapsed_s": round(time.time() - self.started, 3),
+            "counts": dict(self.counts),
+            "positives": dict(self.positives),
+            "timeouts": dict(self.timeouts),
+            "failed_files": list(self.listed["failed"]),
+            "quarantined_files": list(self.listed["quarantined"]),
+        }
+
+    def write_summary(self, summary_file=RUN_SUMMARY):
+        """Write the aggregate of the run as JSON, replacing the summary of the previous run."""
+        write_json_atomic(summary_file, self.summary())
+        log.info(f"Run summary written to {summary_file}")
+
+    def close(self):
+        """Flush and close the per-file event sink, if any."""
+        if self.sink is not None:
+            self.sink.close()
+            self.sink = None
+            log.info(f"Per-file events written to {self.events_file}")
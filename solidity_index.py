@@ -0,0 +1,171 @@
+import re
+import bisect
+import logging
+from collections import namedtuple
+
+# Setup logging with rich handler
+log = logging.getLogger(__name__)
+
+# A contract-level or callable declaration. start is the offset of its keyword, body_start
+# the offset of its opening brace and end the offset just after its closing brace.
+# modifiers holds the modifier invocations in the header of a callable (empty for contracts).
+Span = namedtuple("Span", ["kind", "name", "contract", "start", "body_start", "end", "modifiers"])
+
+# Braces, parentheses and semicolons outside string literals; string literals are matched
+# whole so that the punctuation inside them is skipped
+STRUCTURE_TOKEN = re.compile(r'''"(?:[^"\\\n]|\\.)*"?|'(?:[^'\\\n]|\\.)*'?|[{}();]''')
+
+# Declaration keywords and the name that follows. The pattern starts with plain literals so
+# the scan stays fast; the word boundary before the keyword is checked on each match, and
+# keywords used as member names (x.receive()) are skipped. `function` may be unnamed (pre-0.6 fallback).
+DECLARATION = re.compile(r'(contract|library|interface|function|modifier|constructor|fallback|receive)\b\s*(\w*)')
+CONTRACT_KINDS = frozenset(("contract", "library", "interface"))
+
+# Header words of a callable that are not modifier invocations
+CALLABLE_KEYWORDS = frozenset((
+    "public", "private", "internal", "external", "view", "pure", "payable", "nonpayable",
+    "constant", "virtual", "override", "returns",
+))
+IDENTIFIER = re.compile(r'[A-Za-z_$][\w$]*')
+PARENTHESIZED = re.compile(r'\([^()]*\)')
+
+
+class SourceIndex:
+    """
+    Spans of the contracts, functions and modifiers of one cleaned Solidity source.
+
+    Built once per file by index_source; detectors then look at the text of the
+    callables they care about instead of the whole file.
+    """
+
+    def __init__(self, contracts, callables):
+        self.contracts = contracts
+        self.callables = callables
+
+    @property
+    def functions(self):
+        """Callables other than modifiers: functions, constructors, fallback and receive functions."""
+        return [span for span in self.callables if span.kind != "modifier"]
+
+    @property
+    def modifiers(self):
+        """Modifier definitions."""
+        return [span for span in self.callables if span.kind == "modifier"]
+
+    def enclosing_contract(self, offset):
+        """Return the name of the innermost contract whose body contains offset, or None."""
+        name = None
+        for contract in self.contracts:
+            if contract.body_start < offset < contract.end:
+                name = contract.name
+        return name
+
+
+def match_pairs(tokens, opening, closing):
+    """Map the offset of each balanced opening token to the offset of its closing token."""
+    pairs = {}
+    stack = []
+    for offset, token in tokens:
+        if token == opening:
+            stack.append(offset)
+        elif token == closing and stack:
+            pairs[stack.pop()] = offset
+    return pairs
+
+
+def find_body(tokens, offsets, parens, braces, position):
+    """
+    Find the body of a declaration whose keyword ends at position.
+
+    Returns:
+    - (tuple | None): (parameters_end, body_start, end) offsets, where parameters_end is the
+      offset after the first parenthesized group of the header (position if there is none),
+      or None if the header ends with a semicolon (an interface function or a function type)
+      or is unbalanced.
+    """
+    index = bisect.bisect_left(offsets, position)
+    parameters_end = None
+    while index < len(tokens):
+        offset, token = tokens[index]
+        if token == "(":
+            close = parens.get(offset)
+            if close is None:
+                return None
+            if parameters_end is None:
+                parameters_end = close + 1
+            index = bisect.bisect_right(offsets, close)
+            continue
+        if token == "{":
+            close = braces.get(offset)
+            return None if close is None else (parameters_end or position, offset, close + 1)
+        return None  # ";", or a stray "}" or ")"
+    return None
+
+
+def header_modifiers(header):
+    """Return the modifier invocations of a callable header, e.g. ["onlyOwner"] for `public onlyOwner returns (bool)`."""
+    previous = None
+    while previous != header:
+        previous, header = header, PARENTHESIZED.sub(" ", header)
+    return [word for word in IDENTIFIER.findall(header) if word not in CALLABLE_KEYWORDS]
+
+
+def index_source(sol_content):
+    """
+    Index the contracts, functions and modifiers of cleaned Solidity content.
+
+    The indexer only looks at declaration keywords, balanced braces and parentheses, so it
+    tolerates code that does not compile. Braces inside string literals are ignored.
+
+    Args:
+    - sol_content (str): The Solidity source code with comments removed.
+
+    Returns:
+    - (SourceIndex): The spans of the declarations, in source order.
+    """
+    tokens = []
+    strings = []
+    for match in STRUCTURE_TOKEN.finditer(sol_content):
+        token = match.group()
+        if len(token) == 1 and token not in "\"'":
+            tokens.append((match.start(), token))
+        else:
+            strings.append(match.span())
+    offsets = [offset for offset, _ in tokens]
+    string_starts = [start for start, _ in strings]
+    braces = match_pairs(tokens, "{", "}")
+    parens = match_pairs(tokens, "(", ")")
+
+    def in_string(offset):
+        index = bisect.bisect_right(string_starts, offset) - 1
+        return index >= 0 and offset < strings[index][1]
+
+    contracts = []
+    callables = []
+    for match in DECLARATION.finditer(sol_content):
+        start = match.start()
+        if start and (sol_content[start - 1].isalnum() or sol_content[start - 1] in "_$.") or in_string(start):
+            continue
+        kind, name = match.group(1), match.group(2)
+        if kind in CONTRACT_KINDS and not name:
+            continue
+        body = find_body(tokens, offsets, parens, braces, match.end())
+        if body is None:
+            continue
+        parameters_end, body_start, end = body
+        if kind in CONTRACT_KINDS:
+            contracts.append(Span(kind, name, None, start, body_start, end, ()))
+            continue
+
+        modifiers = () if kind == "modifier" else tuple(header_modifiers(sol_content[parameters_end:body_start]))
+        # Unnamed functions are pre-0.6 fallback functions
+        name = name or ("fallback" if kind == "function" else kind)
+        callables.append((kind, name, start, body_start, end, modifiers))
+
+    # Assign the callables to their contracts once every contract span is known
+    index = SourceIndex(contracts, [])
+    for kind, name, start, body_start, end, modifiers in callables:
+        index.callables.append(Span(kind, name, index.enclosing_contract(start), start, body_start, end, modifiers))
+
+    log.debug(f"Indexed {len(contracts)} contracts and {len(index.callables)} functions and modifiers.")
+    return index
@@ -0,0 +1,270 @@
+import re
+import hashlib
+import logging
+from functools import partial
+
+from remove_comments import CODE_PIECE_BYTES, lex_comments
+from file_loader import iter_normalized_blocks
+from detector_engine import StreamSummary, detect_all
+
+# Setup logging with rich handler
+log = logging.getLogger(__name__)
+
+# Raw bytes read per window, and cleaned bytes of each window searched again with the next
+# one so that matches crossing a window boundary are found
+DEFAULT_WINDOW_SIZE = 1 << 20
+DEFAULT_OVERLAP = 64 << 10
+
+# Files larger than this are streamed when streaming is enabled without a threshold
+DEFAULT_STREAM_THRESHOLD = 16 << 20
+
+# Windows of raw source without a usable newline grow by one block at a time until code_cut
+# finds a cut, up to this many blocks
+MAX_WINDOW_GROWTH = 8
+
+# Bytes after which code_cut may end a window, and bytes that start no code to cut in
+CODE_CUT_BYTES = (b';', b' ', b'\t', b'\n')
+QUOTE_OR_SLASH = b'"\'/'
+
+# Non-word bytes after which a search buffer may end or its overlap may start
+CUT_BYTES = (b'\n', b';', b' ')
+NON_WORD = re.compile(rb'\W')
+
+
+def line_cut(block, previous=b'\n'):
+    """
+    Find where a window of raw source may end: just after the last newline that does not
+    end a line with a trailing backslash, which may continue a string literal.
+
+    Args:
+    - block (bytes): Raw bytes read from the file.
+    - previous (bytes): The byte before the block.
+
+    Returns:
+    - (int): Offset just after that newline, or 0 if the block has none.
+    """
+    index = block.rfind(b'\n')
+    while index != -1:
+        before = block[index - 1:index] if index else previous
+        if before != b'\\':
+            return index + 1
+        index = block.rfind(b'\n', 0, index)
+    return 0
+
+
+def code_cut(window, in_block_comment=False):
+    """
+    Find where a window of raw source without a usable newline may end, by lexing it from
+    its start state: just after the last `;` or whitespace byte in code, outside comments
+    and string literals, or at its end if it ends inside a block comment. Either way the
+    lexer is in the same state at the cut as when lexing the whole file.
+
+    Args:
+    - window (bytes): Raw bytes of the window, with LF line endings.
+    - in_block_comment (bool): The window starts inside a block comment.
+
+    Returns:
+    - (int): Offset of the cut, or 0 if the window has none.
+    - (bool): True if the cut is at the start of a line comment that runs past the window;
+      the comment can then be dropped up to its newline.
+    """
+    length = len(window)
+    position = 0
+    cut = 0
+    if in_block_comment:
+        comment_end = window.find(b'*/')
+        if comment_end == -1:
+            # A trailing `*` may be closed by the next block
+            return (0 if window.endswith(b'*') else length), False
+        position = comment_end + 2
+
+    while position < length:
+        piece = CODE_PIECE_BYTES.match(window, position)
+        if piece:
+            end = piece.end()
+            if window[position] not in QUOTE_OR_SLASH:
+                last = max(window.rfind(cut_byte, position, end) for cut_byte in CODE_CUT_BYTES)
+                if last != -1:
+                    cut = last + 1
+            elif end >= length:
+                # A string literal or slash at the end may continue in the next block
+                break
+            position = end
+        elif window.startswith(b'//', position):
+            newline = window.find(b'\n', position + 2)
+            if newline == -1:
+                return position, True
+            position = newline
+        else:
+            comment_end = window.find(b'*/', position + 2)
+            if comment_end == -1:
+                return (cut if window.endswith(b'*') else length), False
+            position = comment_end + 2
+    return cut, False
+
+
+def iter_cleaned_windows(blocks, window_size=DEFAULT_WINDOW_SIZE):
+    """
+    Cut consecutive blocks of raw source into windows and remove comments window by window,
+    carrying an open block comment over to the next window.
+
+    A window ends just after a newline that does not end a line with a trailing backslash.
+    At such a cut the lexer is either in code or inside a block comment, so lexing window
+    by window gives the same result as lexing the whole file. Minified and single-line
+    sources have no such newline: their windows are cut with code_cut instead, and the
+    content of a line comment that runs past a window is dropped up to its newline.
+
+    Memory use stays within MAX_WINDOW_GROWTH windows. Only a single string literal or
+    token longer than that is cut where the limit is reached, and the lexer may then read
+    the rest of it as code.
+
+    Args:
+    - blocks (iterable): Consecutive blocks of the raw file content, with LF line endings.
+    - window_size (int): Size of the blocks, which sets the memory limit.
+
+    Yields:
+    - (bytes): The cleaned content of each window.
+    """
+    in_block_comment = False
+    skip_line_comment = False
+    parts = []
+    for block in blocks:
+        if skip_line_comment:
+            newline = block.find(b'\n')
+            if newline == -1:
+                continue
+            block = block[newline:]
+            skip_line_comment = False
+
+        cut = line_cut(block, parts[-1][-1:] if parts else b'\n')
+        if cut:
+            window = b"".join([*parts, block[:cut]])
+            parts = [block[cut:]] if cut < len(block) else []
+        else:
+            pending = b"".join([*parts, block])
+            cut, skip_line_comment = code_cut(pending, in_block_comment)
+            if skip_line_comment:
+                # The comment's text is not needed, only where it ends
+                window, parts = pending[:cut], [b'//']
+            elif cut:
+                window, parts = pending[:cut], [pending[cut:]] if cut < len(pending) else []
+            elif len(pending) < MAX_WINDOW_GROWTH * window_size:
+                parts = [pending]
+                continue
+            else:
+                log.warning(f"No safe cut in {len(pending)} bytes of source, cutting a window inside a literal or token.")
+                window, parts = pending, []
+
+        cleaned, _, in_block_comment = lex_comments(window, in_block_comment)
+        yield cleaned
+
+    if parts:
+        yield lex_comments(b"".join(parts), in_block_comment)[0]
+
+
+def overlap_tail(buffer, overlap):
+    """Return the last overlap bytes of a search buffer, starting just after a non-word byte."""
+    if len(buffer) <= overlap:
+        return buffer
+    match = NON_WORD.search(buffer, len(buffer) - overlap)
+    return buffer[match.end():] if match else b""
+
+
+def iter_search_buffers(cleaned_windows, overlap=DEFAULT_OVERLAP):
+    """
+    Regroup cleaned windows into search buffers that start and end just after a non-word
+    byte, each beginning with up to overlap bytes of the previous buffer.
+
+    Yields:
+    - (bytes): Search buffers covering the cleaned content.
+    """
+    tail = b""
+    pending = []
+    for cleaned in cleaned_windows:
+        cut = max(cleaned.rfind(cut_byte) for cut_byte in CUT_BYTES) + 1
+        if not cut:
+            pending.append(cleaned)
+            continue
+        buffer = b"".join([tail, *pending, cleaned[:cut]])
+        pending = [cleaned[cut:]]
+        yield buffer
+        tail = overlap_tail(buffer, overlap)
+
+    # The end of the file is a real end, so the rest is searched as it is
+    rest = b"".join(pending)
+    if rest:
+        yield tail + rest
+
+
+def hash_file(file_path, block_size=DEFAULT_WINDOW_SIZE):
+    """
+    Compute the SHA-256 hex digest of a file without loading it whole, line endings
+    normalized to LF. It equals content_hash of the file content for UTF-8 files.
+
+    Returns:
+    - (str | None): The digest, or None if the file could not be read.
+    """
+    digest = hashlib.sha256()
+    try:
+        with open(file_path, 'rb') as file:
+            for block in iter_normalized_blocks(iter(partial(file.read, block_size), b"")):
+                digest.update(block)
+    except OSError as e:
+        log.error(f"Error hashing file {file_path}: {e}")
+        return None
+    return digest.hexdigest()
+
+
+def detect_stream(file_path, window_size=DEFAULT_WINDOW_SIZE, overlap=DEFAULT_OVERLAP, detector_timeout=None,
+                  deadline=None):
+    """
+    Remove comments and run all vulnerability detections on a file in fixed-size windows.
+
+    Memory use is a few windows whatever the file size, see iter_cleaned_windows for the
+    limit on minified sources. The labels match whole-file
+    detection on the raw bytes (load mode "mmap") as long as no single match of a
+    confirmation pattern spans more than overlap bytes of cleaned source.
+
+    Args:
+    - file_path (str): Path to the Solidity file.
+    - window_size (int): Raw bytes read per window.
+    - overlap (int): Cleaned bytes of each window searched again with the next one.
+    - detector_timeout (float | None): Time budget of each pattern search in seconds.
+    - deadline (float | None): time.perf_counter() value by which the file must be labeled.
+
+    Returns:
+    - (tuple): The detection labels, ordered as detector_engine.REGISTRY.names.
+    """
+    summary = StreamSummary()
+    with open(file_path, 'rb') as file:
+        blocks = iter_normalized_blocks(iter(partial(file.read, window_size), b""))
+        buffers = iter_search_buffers(iter_cleaned_windows(blocks, window_size), overlap)
+        for buffer in buffers:
+            summary.scan(buffer, deadline, detector_timeout)
+
+    log.info(f"Streamed {file_path} in windows of {window_size} bytes.")
+    return detect_all(summary, detector_timeout=detector_timeout, deadline=deadline)
+
+
+# Example usage: check that streamed labels match whole-file labels, with small windows to stress the boundaries
+if __name__ == "__main__":
+    import sys
+    from file_loader import discover_sol_files, map_sol_file, normalize_newlines
+    from remove_comments import remove_comments
+
+    root_directory = sys.argv[1] if len(sys.argv) > 1 else "datast"
+    window_size = int(sys.argv[2]) if len(sys.argv) > 2 else 4096
+    logging.disable(logging.CRITICAL)
+
+    sol_files = discover_sol_files(root_directory)
+    mismatches = 0
+    for path in sol_files:
+        content = map_sol_file(path)
+        whole = detect_all(remove_comments(normalize_newlines(content)))
+        if not isinstance(content, bytes):
+            content.close()
+        streamed = detect_stream(path, window_size=window_size)
+        if whole != streamed:
+            mismatches += 1
+            print(f"Mismatch in {path}: whole-file {whole}, streamed {streamed}")
+    print(f"Files: {len(sol_files)}, window size: {window_size}, label mismatches: {mismatches}")
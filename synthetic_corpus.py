@@ -0,0 +1,163 @@
+import os
+import math
+import random
+import logging
+
+# Setup logging with rich handler
+log = logging.getLogger(__name__)
+
+# Probability that a generated function contains each construct the detectors look for
+DEFAULT_DENSITY = {
+    "call_value": 0.05,
+    "delegatecall": 0.03,
+    "timestamp": 0.10,
+    "arithmetic": 0.50,
+}
+
+# Number of files per generated subdirectory, mimicking the nested layout of datast
+FILES_PER_DIRECTORY = 250
+
+PRAGMAS = ("pragma solidity ^0.4.24;", "pragma solidity ^0.5.0;", "pragma solidity >=0.6.0 <0.8.0;")
+TYPES = ("uint256", "uint", "int256", "address", "bool", "bytes32")
+
+
+def identifier(rng, prefix):
+    """Return a random identifier with a recognizable prefix."""
+    return f"{prefix}{rng.randrange(1000)}"
+
+
+def comment_block(rng):
+    """Return a line or NatSpec block comment, sometimes containing code-like text."""
+    choice = rng.random()
+    if choice < 0.4:
+        return f"    // {rng.choice(('TODO', 'NOTE', 'see https://example.org/docs', 'x = y - z;'))}"
+    if choice < 0.8:
+        return "    /**\n     * @dev Internal helper.\n     * @param amount The amount, e.g. balance - fee.\n     */"
+    return "    /* block.timestamp call.value delegatecall */"
+
+
+def function_body(rng, density):
+    """Return the statements of one function, with constructs drawn according to density."""
+    lines = []
+    amount, balance = identifier(rng, "amount"), identifier(rng, "balance")
+
+    if rng.random() < density["arithmetic"]:
+        operator = rng.choice(("+", "-", "*"))
+        lines.append(f"        {balance} = {balance} {operator} {amount};")
+        if rng.random() < 0.3:
+            lines.append(f"        require({balance} >= {amount} {operator} 1);")
+    if rng.random() < density["timestamp"]:
+        lines.append(rng.choice((
+            f"        uint {identifier(rng, 'start')} = block.timestamp;",
+            "        if (block.timestamp > deadline) { revert(); }",
+            "        return block.timestamp % 2 == 0;",
+            "        emit Tick(block.timestamp);",
+        )))
+    if rng.random() < density["call_value"]:
+        value = "0" if rng.random() < 0.1 else amount
+        lines.append(f"        require(msg.sender.call.value({value})());")
+    if rng.random() < density["delegatecall"]:
+        lines.append(f"        require({identifier(rng, 'target')}.delegatecall(msg.data));")
+
+    lines.append(f'        emit Log("{identifier(rng, "event")}", "https://example.org/{rng.randrange(100)}");')
+    return lines
+
+
+def generate_contract(rng, target_size, density, comment_ratio=0.2):
+    """
+    Generate a Solidity contract of roughly target_size characters.
+
+    Args:
+    - rng (random.Random): Random generator, seeded by the caller for reproducibility.
+    - target_size (int): Approximate size of the source in characters.
+    - density (dict): Probability per function of each construct, keyed like DEFAULT_DENSITY.
+    - comment_ratio (float): Probability of a comment before each function.
+
+    Returns:
+    - (str): The Solidity source code.
+    """
+    name = identifier(rng, "Contract")
+    lines = [rng.choice(PRAGMAS), ""]
+    if rng.random() < 0.2:
+        lines += ["library SafeMath {", "    function add(uint a, uint b) internal pure returns (uint) { return a + b; }", "}", ""]
+    lines += [f"contract {name} {{", "    address owner;", "    uint deadline;", "    event Log(string tag, string url);"]
+    if rng.random() < 0.3:
+        lines += ["    modifier onlyOwner { require(msg.sender == owner); _; }"]
+
+    size = sum(len(line) + 1 for line in lines)
+    while size < target_size:
+        function_lines = []
+        if rng.random() < comment_ratio:
+            function_lines.append(comment_block(rng))
+        function_lines.append(f"    {rng.choice(TYPES)} {identifier(rng, 'state')};")
+        function_lines.append(f"    function {identifier(rng, 'run')}(uint {identifier(rng, 'arg')}) public {{")
+        function_lines += function_body(rng, density)
+        function_lines.append("    }")
+        lines += function_lines
+        size += sum(len(line) + 1 for line in function_lines)
+
+    lines.append("}")
+    return "\n".join(lines) + "\n"
+
+
+def generate_corpus(output_dir, num_files=1000, seed=0, median_size=8_000, size_sigma=1.0,
+                    max_size=2_000_000, density=None, comment_ratio=0.2):
+    """
+    Generate a reproducible synthetic Solidity corpus.
+
+    File sizes follow a log-normal distribution around median_size, which gives the long
+    tail of large flattened contracts seen in verified-contract corpora.
+
+    Args:
+    - output_dir (str): Directory to write the corpus to, in subdirectories of FILES_PER_DIRECTORY files.
+    - num_files (int): Number of contracts to generate.
+    - seed (int): Seed of the random generator; the same arguments give the same corpus.
+    - median_size (int): Median file size in characters.
+    - size_sigma (float): Standard deviation of the log of the file size.
+    - max_size (int): Upper bound of the file size in characters.
+    - density (dict | None): Probability per function of each construct; defaults to DEFAULT_DENSITY.
+    - comment_ratio (float): Probability of a comment before each function.
+
+    Returns:
+    - (int): Total size of the generated corpus in bytes.
+    """
+    rng = random.Random(seed)
+    density = {**DEFAULT_DENSITY, **(density or {})}
+    total_bytes = 0
+
+    for index in range(num_files):
+        target_size = min(max_size, int(rng.lognormvariate(math.log(median_size), size_sigma)))
+        source = generate_contract(rng, target_size, density, comment_ratio)
+
+        directory = os.path.join(output_dir, f"batch_{index // FILES_PER_DIRECTORY:04d}")
+        os.makedirs(directory, exist_ok=True)
+        with open(os.path.join(directory, f"contract_{index:06d}.sol"), "w", encoding="utf-8") as f:
+            f.write(source)
+        total_bytes += len(source.encode("utf-8"))
+
+    log.info(f"Generated {num_files} contracts ({total_bytes / 1e6:.1f} MB) in {output_dir}")
+    return total_bytes
+
+
+# Example usage: python synthetic_corpus.py bench_corpus --files 5000 --seed 1
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Generate a reproducible synthetic Solidity corpus.")
+    parser.add_argument("output_dir", help="Directory to write the corpus to.")
+    parser.add_argument("--files", type=int, default=1000, help="Number of contracts to generate.")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed.")
+    parser.add_argument("--median-size", type=int, default=8_000, help="Median contract size in characters.")
+    parser.add_argument("--size-sigma", type=float, default=1.0, help="Spread of the log-normal size distribution.")
+    parser.add_argument("--max-size", type=int, default=2_000_000, help="Maximum contract size in characters.")
+    for key, value in DEFAULT_DENSITY.items():
+        parser.add_argument(f"--{key.replace('_', '-')}-density", type=float, default=value,
+                            help=f"Probability per function of a {key} construct (default: {value}).")
+    parser.add_argument("--comment-ratio", type=float, default=0.2, help="Probability of a comment before each function.")
+    args = parser.parse_args()
+
+    total_bytes = generate_corpus(
+        args.output_dir, args.files, args.seed, args.median_size, args.size_sigma, args.max_size,
+        {key: getattr(args, f"{key}_density") for key in DEFAULT_DENSITY}, args.comment_ratio,
+    )
+    print(f"Generated {args.files} contracts ({total_bytes / 1e6:.1f} MB) in {args.output_dir}")
@@ -0,0 +1,94 @@
+import regex
+import pytest
+
+import labeler
+from detector_engine import REGISTRY, register_detector, search
+from label_cache import detector_fingerprint
+from labeler import LABEL_KEYS, LabelOptions, label_file, labels_to_results
+
+SELFDESTRUCT_CALL = regex.compile(r'\bselfdestruct\s*\(')
+
+VULNERABLE = """pragma solidity ^0.4.24;
+contract Wallet {
+    // selfdestruct(owner) in a comment is not a call
+    function kill(address owner) public {
+        selfdestruct(owner);
+    }
+}
+"""
+
+COMMENTED_OUT = """pragma solidity ^0.4.24;
+contract Wallet {
+    function kill(address owner) public {
+        // selfdestruct(owner);
+    }
+}
+"""
+
+LOAD_OPTIONS = {
+    "text": LabelOptions(),
+    "mmap": LabelOptions(load_mode="mmap"),
+    "stream": LabelOptions(stream_threshold=0),
+}
+
+
+@pytest.fixture
+def fifth_detector():
+    """Register a detector from outside detector_engine, and remove it after the test."""
+    saved = (list(REGISTRY.detectors), dict(REGISTRY.keywords), dict(REGISTRY.pattern_triggers),
+             dict(REGISTRY.bytes_patterns))
+    fingerprint = detector_fingerprint()
+
+    @register_detector("selfdestruct", triggers=("selfdestruct",), keywords=("onlyOwner",),
+                       patterns={SELFDESTRUCT_CALL: ("selfdestruct",)})
+    def check_selfdestruct(sol_content, tokens, deadline=None):
+        return bool(search(SELFDESTRUCT_CALL, sol_content, deadline)) and "onlyOwner" not in tokens
+
+    labeler.labels_by_hash.clear()
+    yield fingerprint
+
+    REGISTRY.detectors[:] = saved[0]
+    for table, entries in zip((REGISTRY.keywords, REGISTRY.pattern_triggers, REGISTRY.bytes_patterns), saved[1:]):
+        table.clear()
+        table.update(entries)
+    REGISTRY.scanners.clear()
+    labeler.labels_by_hash.clear()
+
+
+@pytest.mark.parametrize("mode", sorted(LOAD_OPTIONS))
+@pytest.mark.parametrize("source, expected", [(VULNERABLE, True), (COMMENTED_OUT, False)])
+def test_registered_detector_labels_in_every_load_mode(fifth_detector, tmp_path, mode, source, expected):
+    sol_file = tmp_path / "Wallet.sol"
+    sol_file.write_text(source)
+
+    digest, labels, _ = label_file(str(sol_file), options=LOAD_OPTIONS[mode])
+
+    assert tuple(LABEL_KEYS) == ("timestamp_dependence", "reentrancy", "integer_overflow", "delegatecall", "selfdestruct")
+    assert len(labels) == len(LABEL_KEYS)
+    assert labels_to_results(labels) == {
+        "timestamp_dependence": False,
+        "reentrancy": False,
+        "integer_overflow": False,
+        "delegatecall": False,
+        "selfdestruct": expected,
+    }
+
+
+def test_registered_detector_with_function_labels(fifth_detector, tmp_path):
+    sol_file = tmp_path / "Wallet.sol"
+    sol_file.write_text(VULNERABLE)
+
+    _, labels, _ = label_file(str(sol_file), options=LabelOptions(function_scope=True))
+
+    results = labels_to_results(labels)
+    assert results["selfdestruct"] is True
+    assert [(entry["function"], entry["selfdestruct"]) for entry in results["functions"]] == [("kill", True)]
+
+
+def test_registered_detector_changes_the_fingerprint(fifth_detector):
+    assert detector_fingerprint() != fifth_detector
+
+
+def test_undeclared_pattern_is_rejected():
+    with pytest.raises(ValueError):
+        search(regex.compile(r'\bundeclared\b'), b"undeclared")
@@ -0,0 +1,23 @@
+from labeler import LABEL_KEYS, label_content, labels_to_results
+
+GUARDED = """pragma solidity ^0.4.24;
+contract Proxy {
+    address owner;
+    modifier onlyOwner() { require(msg.sender == owner); _; }
+    function forward(address target) public onlyOwner {
+        target.delegatecall(msg.data);
+    }
+    function forwardAll(address target) public {
+        target.delegatecall(msg.data);
+    }
+}
+"""
+
+
+def test_modifier_only_guards_its_function():
+    results = labels_to_results(label_content(GUARDED, function_scope=True))
+    # At file level the onlyOwner definition clears every delegatecall
+    assert results["delegatecall"] is False
+    flagged = [(finding["function"], finding["delegatecall"]) for finding in results["functions"]]
+    assert flagged == [("forwardAll", True)]
+    assert set(results["functions"][0]) == {"contract", "function", "line", *LABEL_KEYS}
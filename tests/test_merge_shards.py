@@ -0,0 +1,91 @@
+import json
+import os
+import shutil
+import sqlite3
+
+import pytest
+
+import main
+from file_loader import iter_sol_files
+from label_cache import MANIFEST_NAME
+from label_index import default_index_path
+from merge_shards import coverage_problems, merge_shards
+
+CONTRACT = """pragma solidity ^0.4.24;
+contract Vault{index} {{
+    mapping(address => uint) balances;
+    function withdraw() public {{
+        require(now > {index});
+        msg.sender.call.value(balances[msg.sender])();
+        balances[msg.sender] = 0;
+    }}
+}}
+"""
+
+
+def label_shard(root_directory, output_directory, shard):
+    config = main.resolve_config(main.RunConfig(quiet_mode=True, shard=shard, root_directory=str(root_directory),
+                                                output_directory=str(output_directory)))
+    return main.run_pass(config, main.setup_logger(True))
+
+
+@pytest.fixture
+def corpus(tmp_path):
+    """A small corpus, with a subdirectory, and two copies of it mounted at different roots."""
+    corpus = tmp_path / "corpus"
+    for index in range(12):
+        directory = corpus / "sub" if index % 3 == 0 else corpus
+        directory.mkdir(parents=True, exist_ok=True)
+        (directory / f"{index}.sol").write_text(CONTRACT.format(index=index))
+    node0 = tmp_path / "node0" / "mnt" / "corpus"
+    node1 = tmp_path / "node1" / "data"
+    shutil.copytree(corpus, node0, copy_function=shutil.copy2)
+    shutil.copytree(corpus, node1, copy_function=shutil.copy2)
+    return corpus, node0, node1
+
+
+def test_shards_labeled_under_different_roots_merge(tmp_path, corpus):
+    corpus, node0, node1 = corpus
+    label_shard(node0, tmp_path / "out0", (0, 2))
+    label_shard(node1, tmp_path / "out1", (1, 2))
+
+    merged = tmp_path / "merged"
+    summary = merge_shards([str(tmp_path / "out0"), str(tmp_path / "out1")], str(merged), str(corpus))
+
+    assert coverage_problems(summary["coverage"]) == []
+    assert summary["results"] == 12
+    manifest = json.loads((merged / MANIFEST_NAME).read_text())["files"]
+    assert sorted(manifest) == sorted(iter_sol_files(str(corpus)))
+    assert (merged / "sub" / "0.json").exists()
+
+    connection = sqlite3.connect(default_index_path(str(merged)))
+    paths = sorted(row[0] for row in connection.execute("SELECT path FROM labels"))
+    connection.close()
+    assert paths == sorted(os.path.relpath(path, corpus) for path in manifest)
+
+    # A plain run over the merged tree finds every file already labeled
+    config = main.resolve_config(main.RunConfig(quiet_mode=True, root_directory=str(corpus),
+                                                output_directory=str(merged)))
+    counts = main.run_pass(config, main.setup_logger(True))["counts"]
+    assert counts["labeled"] == 0
+    assert len(json.loads((merged / MANIFEST_NAME).read_text())["files"]) == 12
+
+
+def test_same_file_under_two_roots_overlaps(tmp_path, corpus):
+    corpus, node0, node1 = corpus
+    label_shard(node0, tmp_path / "out0", (0, 2))
+    label_shard(node1, tmp_path / "out1", (1, 2))
+    # Shard 1 also labels the files of shard 0, from its own mount point
+    label_shard(node1, tmp_path / "extra", (0, 2))
+    summary_path = tmp_path / "extra" / ".shard_summary.json"
+    summary = json.loads(summary_path.read_text())
+    summary["shard"] = 1
+    summary_path.write_text(json.dumps(summary))
+
+    summary = merge_shards([str(tmp_path / "out0"), str(tmp_path / "out1"), str(tmp_path / "extra")],
+                           str(tmp_path / "merged"), str(corpus))
+
+    coverage = summary["coverage"]
+    assert coverage["missing"] == []
+    assert coverage["overlapping"] and all(owners == [0, 1] for owners in coverage["overlapping"].values())
+    assert sorted(coverage["misassigned"]) == sorted(coverage["overlapping"])
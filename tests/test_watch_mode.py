@@ -0,0 +1,64 @@
+import json
+
+import main
+from json_saver import write_json_atomic
+from watch_mode import schedule_retries, watch_corpus
+
+CONTRACT = """pragma solidity ^0.4.24;
+contract Clock{index} {{
+    function open() public view returns (bool) {{
+        return now > {index};
+    }}
+}}
+"""
+
+
+def test_quarantined_files_are_retried(tmp_path):
+    corpus = tmp_path / "corpus"
+    corpus.mkdir()
+    for index in range(3):
+        (corpus / f"{index}.sol").write_text(CONTRACT.format(index=index))
+    slow = str(corpus / "1.sol")
+    quarantine_file = str(tmp_path / ".quarantine.json")
+    passes = []
+
+    def run_pass(paths):
+        # 1.sol times out on its first two attempts
+        passes.append(paths)
+        attempts = sum(1 for labeled in passes if labeled is None or slow in labeled)
+        write_json_atomic(quarantine_file, [{"path": slow, "sha256": "", "timed_out": []}] if attempts < 3 else [])
+        return {"counts": {}, "positives": {}, "timeouts": {}}
+
+    watch_corpus(run_pass, str(corpus), str(tmp_path / "out"), str(tmp_path / "summary.json"), quarantine_file,
+                 poll_interval=0.01, max_polls=20)
+
+    assert passes[0] is None
+    assert passes[1:] == [[slow], [slow]]
+    assert json.loads((tmp_path / "summary.json").read_text())["quarantined_files"] == 0
+
+
+def test_retries_back_off():
+    retries = {}
+    schedule_retries(retries, {"a.sol", "b.sol"}, None, 5.0, 100.0)
+    assert retries == {"a.sol": (1, 105.0), "b.sol": (1, 105.0)}
+    schedule_retries(retries, {"a.sol", "b.sol"}, {"a.sol"}, 5.0, 200.0)
+    assert retries == {"a.sol": (2, 210.0), "b.sol": (1, 105.0)}
+    schedule_retries(retries, {"b.sol"}, {"a.sol", "b.sol"}, 5.0, 300.0)
+    assert retries == {"b.sol": (2, 310.0)}
+
+
+def test_full_pass_removes_results_of_deleted_files(tmp_path):
+    corpus = tmp_path / "corpus"
+    corpus.mkdir()
+    for index in range(3):
+        (corpus / f"{index}.sol").write_text(CONTRACT.format(index=index))
+    output = tmp_path / "out"
+    config = main.resolve_config(main.RunConfig(quiet_mode=True, root_directory=str(corpus),
+                                                output_directory=str(output)))
+    main.run_pass(config, main.setup_logger(True))
+    assert (output / "2.json").exists()
+
+    (corpus / "2.sol").unlink()
+    main.run_pass(config, main.setup_logger(True))
+    assert not (output / "2.json").exists()
+    assert (output / "0.json").exists() and (output / "1.json").exists()
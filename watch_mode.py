@@ -0,0 +1,174 @@
+import os
+import json
+import time
+import logging
+
+from file_loader import iter_sol_files
+from json_saver import write_json_atomic
+
+# Setup logging with rich handler
+log = logging.getLogger(__name__)
+
+# Seconds between two polls of the corpus
+DEFAULT_POLL_INTERVAL = 5.0
+
+# Longest wait in seconds before a quarantined file is retried; the wait doubles from one
+# poll interval with every retry that times out again
+MAX_RETRY_INTERVAL = 3600.0
+
+
+def snapshot(root_directory):
+    """
+    Record the size and modification time of every Solidity file under root_directory.
+
+    Returns:
+    - (dict): {file_path: (size, mtime_ns)}. Files that vanish while they are listed are left out.
+    """
+    files = {}
+    for file_path in iter_sol_files(root_directory):
+        try:
+            stat_result = os.stat(file_path)
+        except OSError:
+            continue
+        files[file_path] = (stat_result.st_size, stat_result.st_mtime_ns)
+    return files
+
+
+def settled_changes(labeled, previous, current):
+    """
+    Compare two snapshots with the state the files were last labeled in.
+
+    A new or modified file is only ready once its size and modification time are the same
+    on two polls in a row, so a contract that is still being copied is not labeled half-written.
+
+    Args:
+    - labeled (dict): Snapshot entries of the files as they were last labeled.
+    - previous (dict): The previous poll.
+    - current (dict): The current poll.
+
+    Returns:
+    - (tuple): (ready, pending, deleted) lists of paths.
+    """
+    changed = [path for path, state in current.items() if labeled.get(path) != state]
+    ready = [path for path in changed if previous.get(path) == current[path]]
+    pending = [path for path in changed if previous.get(path) != current[path]]
+    deleted = [path for path in labeled if path not in current]
+    return ready, pending, deleted
+
+
+def quarantined_paths(quarantine_file):
+    """Return the paths listed in the quarantine file, none if it is missing or unreadable."""
+    try:
+        with open(quarantine_file, "r") as f:
+            return {entry["path"] for entry in json.load(f)}
+    except (OSError, ValueError, TypeError, KeyError) as e:
+        log.debug(f"No quarantine list read from {quarantine_file}: {e}")
+        return set()
+
+
+def schedule_retries(retries, quarantined, retried, poll_interval, now):
+    """
+    Update the retry schedule of the quarantined files after a pass.
+
+    Args:
+    - retries (dict): {file_path: (attempts, retry_at)}, updated in place.
+    - quarantined (set): Paths quarantined after the pass.
+    - retried (set | None): Paths the pass labeled, None for the whole corpus.
+    - poll_interval (float): Seconds between two polls, the first wait.
+    - now (float): time.time() at the end of the pass.
+    """
+    for path in [path for path in retries if path not in quarantined]:
+        del retries[path]
+    for path in quarantined:
+        if path in retries and retried is not None and path not in retried:
+            continue
+        attempts = retries[path][0] + 1 if path in retries else 1
+        retries[path] = (attempts, now + min(poll_interval * 2 ** (attempts - 1), MAX_RETRY_INTERVAL))
+
+
+def add_totals(totals, pass_summary):
+    """Add the counters of a pass summary to the cumulative totals of the watcher."""
+    for key in ("counts", "positives", "timeouts"):
+        for name, value in pass_summary[key].items():
+            totals[key][name] = totals[key].get(name, 0) + value
+
+
+def watch_corpus(run_pass, root_directory, output_directory, summary_file, quarantine_file,
+                 poll_interval=DEFAULT_POLL_INTERVAL, max_polls=None):
+    """
+    Keep the output tree of a corpus up to date until interrupted.
+
+    A full pass runs first. The corpus is then polled every poll_interval seconds with one
+    stat per file and nothing else, so an idle watcher costs a directory walk per interval.
+    New and modified files are labeled once they have settled; a deleted file triggers a
+    full pass, which drops it from the manifest and its result from the output tree.
+    Quarantined files are retried after one poll interval, then after twice as long each
+    time they time out again, up to MAX_RETRY_INTERVAL. The summary file is rewritten after
+    every pass with the cumulative counters and the summary of the last pass.
+
+    Args:
+    - run_pass (function): run_pass(paths) labels the given paths, or the whole corpus if
+      paths is None, and returns the summary of the pass (see RunEvents.summary).
+    - root_directory (str): Root directory of the Solidity corpus.
+    - output_directory (str): Directory of the JSON results, for the summary.
+    - summary_file (str): File of the cumulative summary.
+    - quarantine_file (str): File listing the quarantined files, kept up to date by run_pass.
+    - poll_interval (float): Seconds between two polls.
+    - max_polls (int | None): Stop after this many polls, None to run until interrupted.
+    """
+    totals = {"counts": {}, "positives": {}, "timeouts": {}}
+    started = time.time()
+    passes = 0
+    retries = {}
+
+    def label(paths):
+        nonlocal passes
+        pass_summary = run_pass(paths)
+        passes += 1
+        add_totals(totals, pass_summary)
+        schedule_retries(retries, quarantined_paths(quarantine_file), None if paths is None else set(paths),
+                         poll_interval, time.time())
+        write_json_atomic(summary_file, {
+            "root_directory": root_directory,
+            "output_directory": output_directory,
+            "started": started,
+            "updated": time.time(),
+            "passes": passes,
+            "watched_files": len(labeled),
+            "pending_files": len(pending),
+            "quarantined_files": len(retries),
+            "totals": totals,
+            "last_pass": pass_summary,
+        })
+
+    # Files modified during a pass differ from this snapshot and are picked up by the next polls
+    previous = snapshot(root_directory)
+    labeled = dict(previous)
+    pending = []
+    label(None)
+    log.warning(f"Watching {root_directory} every {poll_interval:g}s, press Ctrl-C to stop.")
+
+    polls = 0
+    try:
+        while max_polls is None or polls < max_polls:
+            time.sleep(poll_interval)
+            polls += 1
+            current = snapshot(root_directory)
+            # A quarantined file that is due for a retry counts as changed until it is labeled again
+            now = time.time()
+            for path, (_, retry_at) in retries.items():
+                if retry_at <= now:
+                    labeled.pop(path, None)
+            ready, pending, deleted = settled_changes(labeled, previous, current)
+            previous = current
+
+            if deleted:
+                log.warning(f"{len(deleted)} files were deleted, running a full pass.")
+                labeled = {path: state for path, state in current.items() if path not in pending}
+                label(None)
+            elif ready:
+                log.warning(f"Labeling {len(ready)} new or modified files.")
+                labeled = {**labeled, **{path: current[path] for path in ready}}
+                label(sorted(ready))
+    except KeyboardInterrupt:
+        log.warning("Watch mode stopped.")